@@ -6,121 +6,92 @@
 #          contiver quebras de linha (\n), inserir um marcador "BreakLine"
 #          na linha anterior ao conteudo liberado para facil localizacao (Ctrl+F),
 #          e garantir que haja uma nova linha DEPOIS do conteudo liberado.
-# VERSAO FINAL BASEADA NO FUNCIONAMENTO CONFIRMADO.
+# LOGICA: dpa_parsing/breaklines.py (este script so faz a ponte com o editor).
+# METRICAS: uma linha "METRICS {...}" por execucao (dpa_parsing/instrument.py);
+#           a lista de blocos removidos so com VERBOSE = True.
 # AMBIENTE: Python 2.7 / Notepad++ / PythonScript
 # =============================================================================
 from Npp import *
-import re
+import os
+import sys
 import traceback
 
-# --- Funcao Auxiliar de Decodificacao ---
-def decode_to_unicode(byte_string):
-    """Tenta decodificar bytes para unicode (UTF-8 primeiro, depois Latin-1)."""
-    try:
-        return byte_string.decode('utf-8')
-    except UnicodeDecodeError:
-        # Log conciso apenas se precisar depurar encoding
-        # console.write(u"WARNING: Falha UTF-8, tentando Latin-1...\n")
-        try:
-            return byte_string.decode('latin-1')
-        except Exception as e:
-            console.write(u"ERROR: Falha critica ao decodificar: {}\n".format(unicode(e)))
-            return u""
+# --- Motor dpa_parsing fica na mesma pasta deste script ---
+try: _SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+except NameError: _SCRIPT_DIR = None
+if _SCRIPT_DIR and _SCRIPT_DIR not in sys.path: sys.path.insert(0, _SCRIPT_DIR)
+
+from dpa_parsing.breaklines import insert_breakline_markers
+from dpa_parsing.common import decode_to_unicode, to_npp
+from dpa_parsing.instrument import Recorder
+
+# True lista cada bloco removido no console (em memoria ate o fim, um unico write)
+VERBOSE = False
+# Arquivo JSON Lines que recebe o registro METRICS de cada execucao (None = so console)
+METRICS_LOG = None
 
 # --- Funcao Principal ---
-def insert_breakline_marker_v1_4_final(): # Nome final
+def insert_breakline_marker_v1_4_final():
     console.show()
     console.clear()
     console.write(u"--- Iniciando Script: Inserir Marcador 'BreakLine' e Remover Tags Multi-linha (v1.4 Final) ---\n")
+    recorder = Recorder(u"Break-LevelX", verbose=VERBOSE)
 
     try:
         # 1. Leitura e Decodificacao
-        editor_content_bytes = editor.getText()
-        if not editor_content_bytes:
-            notepad.messageBox("Documento vazio.".encode('utf-8'), "Aviso", MESSAGEBOXFLAGS.ICONWARNING)
+        editor_content_raw = editor.getText()
+        if not editor_content_raw:
+            notepad.messageBox(to_npp(u"Documento vazio."), to_npp(u"Aviso"), MESSAGEBOXFLAGS.ICONWARNING)
             return
 
-        editor_content_unicode = decode_to_unicode(editor_content_bytes)
+        editor_content_unicode = decode_to_unicode(editor_content_raw)
         if not editor_content_unicode:
-            notepad.messageBox(u"Nao foi possivel decodificar o conteudo.".encode('utf-8'), "Erro", MESSAGEBOXFLAGS.ICONERROR)
+            notepad.messageBox(to_npp(u"Nao foi possivel decodificar o conteudo."), to_npp(u"Erro"), MESSAGEBOXFLAGS.ICONERROR)
             return
         console.write(u"INFO: Texto original lido e decodificado.\n")
 
-        # 2. Regex
-        pattern_unicode = ur"(\{\{level(\d+)\}\})(.*?)(\{\{-level\2\}\})"
-        compiled_pattern = re.compile(pattern_unicode, re.DOTALL | re.UNICODE)
-
-        # 3. Iterar com finditer e Construir Novo Texto
-        last_end = 0
-        modified_parts = []
-        marker_inserted_count = 0 # Contador para marcadores/remocoes
-
+        # 2. Procurar e processar blocos {{levelX}}
         console.write(u"INFO: Procurando e processando blocos {{levelX}}...\n")
-        for match in compiled_pattern.finditer(editor_content_unicode):
-            start_tag_start = match.start(1)
-            level_num_str = match.group(2)
-            content = match.group(3)
-            full_match_start, full_match_end = match.span(0)
-
-            # Adiciona o texto *antes* da correspondencia atual
-            modified_parts.append(editor_content_unicode[last_end:full_match_start])
-
-            # Analisa o conteudo da correspondencia
-            if u'\n' in content:
-                # Contem nova linha: Insere marcador + newline + conteudo (stripado no fim) + newline garantido
-                line_num = editor.lineFromPosition(start_tag_start) + 1
-                console.write(u"  - Linha {}: Level {} multi-linha. Removendo tags e inserindo 'BreakLine'.\n".format(line_num, level_num_str))
-                modified_parts.append(u"BreakLine\n" + content.rstrip() + u"\n")
-                marker_inserted_count += 1
-            else:
-                # Linha unica: Adiciona a correspondencia INTEIRA original
-                modified_parts.append(match.group(0))
-
-            # Atualiza a posicao final
-            last_end = full_match_end
-
-        # Adiciona o restante do texto
-        modified_parts.append(editor_content_unicode[last_end:])
-        modified_content_unicode = u"".join(modified_parts)
-
-        # 4. Comparacao e Escrita
-        if marker_inserted_count > 0: # Verifica se houve alguma modificacao
+        with recorder.timer('breaklines'): result = insert_breakline_markers(editor_content_unicode)
+        recorder.count('breaklines.breaks', len(result.info['breaks']))
+        if recorder.verbose:
+            for item in result.info['breaks']:
+                recorder.log(u"  - Linha {}: Level {} multi-linha. Removendo tags e inserindo 'BreakLine'.\n", item['line'], item['level'])
+            recorder.flush_log(console.write)
+
+        # 3. Escrita
+        if result.changes > 0:
             console.write(u"\nINFO: Modificacoes realizadas. Atualizando o editor...\n")
-            console.write(u"INFO: {} marcadores 'BreakLine' foram inseridos (tags removidas).\n".format(marker_inserted_count))
-
-            try:
-                modified_content_bytes = modified_content_unicode.encode('utf-8')
-            except UnicodeEncodeError as enc_err:
-                 console.write(u"ERRO CRITICO: Falha ao re-codificar para UTF-8: {}\n".format(unicode(enc_err)))
-                 notepad.messageBox(u"Erro ao codificar texto para salvar!\nVerifique o console.".encode('utf-8'), "Erro", MESSAGEBOXFLAGS.ICONERROR)
-                 return
+            console.write(u"INFO: {} marcadores 'BreakLine' foram inseridos (tags removidas).\n".format(result.changes))
 
             editor.beginUndoAction()
             try:
-                editor.setText(modified_content_bytes)
+                with recorder.timer('breaklines.apply'): editor.setText(to_npp(result.text))
                 console.write(u"INFO: Texto do editor atualizado com sucesso.\n")
             except Exception as set_err:
-                 console.write(u"ERRO CRITICO: Falha ao definir texto no editor: {}\n".format(unicode(set_err)))
-                 notepad.messageBox(u"Erro ao atualizar editor!\nVerifique o console.".encode('utf-8'), "Erro", MESSAGEBOXFLAGS.ICONERROR)
+                 console.write(u"ERRO CRITICO: Falha ao definir texto no editor: {}\n".format(set_err))
+                 notepad.messageBox(to_npp(u"Erro ao atualizar editor!\nVerifique o console."), to_npp(u"Erro"), MESSAGEBOXFLAGS.ICONERROR)
                  editor.endUndoAction()
                  return
             editor.endUndoAction()
 
-            notepad.messageBox(u"{} marcadores 'BreakLine' inseridos onde tags multi-linha foram removidas.".format(marker_inserted_count).encode('utf-8'),
-                               "Limpeza Concluida", MESSAGEBOXFLAGS.ICONINFORMATION)
+            notepad.messageBox(to_npp(u"{} marcadores 'BreakLine' inseridos onde tags multi-linha foram removidas.".format(result.changes)),
+                               to_npp(u"Limpeza Concluida"), MESSAGEBOXFLAGS.ICONINFORMATION)
 
         else:
             console.write(u"\nINFO: Nenhuma tag multi-linha encontrada para remover/marcar.\n")
-            notepad.messageBox("Nenhuma alteracao necessaria.".encode('utf-8'), "Info", MESSAGEBOXFLAGS.ICONINFORMATION)
+            notepad.messageBox(to_npp(u"Nenhuma alteracao necessaria."), to_npp(u"Info"), MESSAGEBOXFLAGS.ICONINFORMATION)
 
     except Exception as e:
         console.write(u"\n--- ERRO INESPERADO NO FLUXO PRINCIPAL ---\n")
         console.write(traceback.format_exc() + u"\n")
-        error_summary = unicode(e).split('\n')[0]
-        notepad.messageBox(u"Erro inesperado no script: {}\nVerifique o Console Python.".format(error_summary).encode('utf-8'), "Erro", MESSAGEBOXFLAGS.ICONERROR)
+        error_summary = u"{}".format(e).split(u'\n')[0]
+        notepad.messageBox(to_npp(u"Erro inesperado no script: {}\nVerifique o Console Python.".format(error_summary)), to_npp(u"Erro"), MESSAGEBOXFLAGS.ICONERROR)
     finally:
+        try: recorder.emit(console.write, METRICS_LOG)
+        except Exception as metrics_err: console.write(u"AVISO: metricas nao gravadas: {}\n".format(metrics_err))
         console.write(u"\n--- Fim da execucao do Script (Inserir Marcador 'BreakLine' v1.4 Final) ---\n")
 
 # --- Executa ---
 if __name__ == '__main__':
-    insert_breakline_marker_v1_4_final()
\ No newline at end of file
+    insert_breakline_marker_v1_4_final()
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+from Npp import *
+import os
+import sys
+import traceback
+
+# =======================================================
+# DPA PIPELINE - todos os scripts em sequencia, uma escrita
+# =======================================================
+# OBJETIVO: Rodar Text Aligner -> LEVEL IN 1 LINE -> FIX SEPARATION ->
+#           Break-LevelX -> LVL CORRECTION -> FIX FOOTNOTE SEQUENCE
+#           sobre o documento atual com UM getText, UM decode, UM encode
+#           e UM setText (um unico passo de undo).
+# O tempo de cada estagio aparece no console, e o registro da
+# execucao (tempos por passo e contadores, dpa_parsing/instrument.py)
+# numa linha "METRICS {...}", gravada tambem em METRICS_LOG.
+# Com CACHE_DIR, as secoes de topo ja alinhadas numa execucao
+# anterior vem do cache em disco (so as alteradas sao refeitas).
+# Para rodar so parte do fluxo, edite PIPELINE_STAGES abaixo.
+# LOGICA: dpa_parsing/pipeline.py.
+# AMBIENTE: Python 2.7 / Notepad++ / PythonScript
+# =======================================================
+
+# --- Motor dpa_parsing fica na mesma pasta deste script ---
+try: _SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+except NameError: _SCRIPT_DIR = None
+if _SCRIPT_DIR and _SCRIPT_DIR not in sys.path: sys.path.insert(0, _SCRIPT_DIR)
+
+from dpa_parsing.common import to_npp
+from dpa_parsing.cache import SectionCache
+from dpa_parsing.instrument import Recorder
+from dpa_parsing.pipeline import Document, Pipeline, build_stages, format_timings
+
+# Estagios, na ordem: align, oneline, separate, breaklines, levels, footnotes
+PIPELINE_STAGES = ['align', 'oneline', 'separate', 'breaklines', 'levels', 'footnotes']
+# Notas com sequencia quebrada: True renumera mesmo assim (o "Ask Fix" do FIX FOOTNOTE)
+FORCE_FOOTNOTES = False
+# Pasta do cache do Text Aligner (None = sem cache), ex.: os.path.join(_SCRIPT_DIR, '.dpa_cache')
+CACHE_DIR = None
+# Arquivo JSON Lines que recebe o registro METRICS de cada execucao (None = so console)
+METRICS_LOG = None
+
+
+def run_pipeline():
+    console.show()
+    console.clear()
+    console.write(u"--- DPA PIPELINE: {} ---\n".format(u" -> ".join(PIPELINE_STAGES)))
+
+    try:
+        # 1. Leitura e decodificacao (uma vez)
+        editor_text_raw = editor.getText()
+        if not editor_text_raw:
+            notepad.messageBox(to_npp(u"Documento vazio."), to_npp(u"Aviso"), MESSAGEBOXFLAGS.ICONWARNING)
+            return
+        document = Document.from_bytes(editor_text_raw)
+        original_text = document.text
+
+        # 2. Estagios em memoria
+        cache = SectionCache(CACHE_DIR) if CACHE_DIR else None
+        recorder = Recorder(u"DPA PIPELINE")
+        runs = Pipeline(PIPELINE_STAGES, FORCE_FOOTNOTES, build_stages(cache=cache), recorder).run(document)
+        console.write(format_timings(runs) + u"\n")
+        recorder.emit(console.write, METRICS_LOG, stages=PIPELINE_STAGES)
+        if cache is not None: console.write(cache.report() + u"\n")
+        for run in runs:
+            if run.name == 'footnotes' and run.result.info.get('sequence_break') and not run.result.info['renumbered']:
+                brk = run.result.info['sequence_break']
+                console.write(u"AVISO: sequencia de notas quebrada na linha {} (esperado {}, encontrado {}); notas NAO renumeradas.\n".format(
+                    brk['line_number'], brk['expected'], brk['found']))
+
+        if document.text == original_text:
+            console.write(u"INFO: Nenhuma alteracao.\n")
+            notepad.messageBox(to_npp(u"Nenhuma alteracao necessaria."), to_npp(u"DPA Pipeline"), MESSAGEBOXFLAGS.ICONINFORMATION)
+            return
+
+        # 3. Codificacao e escrita (uma vez, um passo de undo)
+        editor.beginUndoAction()
+        try:
+            editor.setText(to_npp(document.text, document.encoding))
+        finally:
+            editor.endUndoAction()
+        summary = u"\n".join(u"{}: {} alteracoes".format(run.name, run.result.changes) for run in runs)
+        notepad.messageBox(to_npp(u"Pipeline concluido.\n\n" + summary), to_npp(u"DPA Pipeline"), MESSAGEBOXFLAGS.ICONINFORMATION)
+
+    except Exception as e:
+        console.write(u"\n!!! ERRO NO PIPELINE !!!\n{}\n".format(traceback.format_exc()))
+        notepad.messageBox(to_npp(u"Erro no pipeline:\n{}\n\nVeja o console.".format(e)), to_npp(u"Erro"), MESSAGEBOXFLAGS.ICONERROR)
+
+if __name__ == '__main__':
+    run_pipeline()
@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 from Npp import *
-import re
+import io
+import json
+import os
+import sys
 import traceback
 
 # =======================================================
@@ -8,131 +11,94 @@ import traceback
 # =======================================================
 # OBJECTIVE: Renumber footnotes sequentially from 1.
 # PATTERN: Finds {{num1}}num2{{-anynum}} structure.
-# NEW: Logs ALL found matches for review.
+# NEW: Logs ALL found matches for review (with VERBOSE = True, in one write).
 # NEW: Detects sequence breaks, reporting the LINE number.
+# NEW: Audits the whole sequence in one pass (gaps, duplicates, out-of-order,
+#      start/middle/end disagreements, unparseable tags) and lists every
+#      anomaly; AUDIT_REPORT saves the audit as JSON.
 # NEW: Asks user if they want to FORCE renumbering (1 to N) if sequence is broken.
+# NEW: The {{footnoteN}}...{{-footnoteN}} bodies are renumbered with their
+#      footnotes (old->new map from the markers), in the same single write.
+#      A body with no footnote of its number keeps it unless another body is
+#      renumbered to it; then it moves past the last footnote (no duplicates).
 # NEW: All user messages and logs are in English.
-# FIX: Encodes MessageBox text for Python 2 compatibility.
+# The find/check/renumber logic lives in dpa_parsing/footnotes.py.
+# The analysis runs on a background thread (dpa_parsing/worker.py) with
+# progress on the console; "Stop Script" cancels it. Only the final
+# write (one undo step) happens on the script thread, and only if the
+# document was not edited during the analysis.
+# The document is scanned as the editor's bytes (dpa_parsing/bytedoc.py):
+# only tag contents are decoded, and edit positions and the "Pos" column
+# are Scintilla (byte) positions from the byte<->char offset map.
+# Each run ends with one "METRICS {...}" JSON line (find/check/renumber
+# timers and counters, dpa_parsing/instrument.py), also appended to
+# METRICS_LOG when set.
 # =======================================================
 
-# Regex captures:
-# Group 1: Number inside START tag {{footnotenumber(\d+)}}
-# Group 2: Number BETWEEN tags }}(\d+){{  <-- USED FOR SEQUENCE CHECK
-# Matches end tag with ANY number: {{-footnotenumber\d+}}
-FOOTNOTE_PATTERN_FIND = r"\{\{footnotenumber(\d+)\}\}(\d+)\{\{-footnotenumber\d+\}\}"
-
-
-def safe_decode(byte_string):
-    """Safely decode bytes to string (unicode in Py2, str in Py3)."""
-    if isinstance(byte_string, str): return byte_string
-    try: return byte_string.decode('utf-8', 'ignore')
-    except Exception: return "[Encoding Error]"
-
-def check_sequence_and_find_break(matches_list):
+# --- The dpa_parsing engine sits next to this script ---
+try: _SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+except NameError: _SCRIPT_DIR = None
+if _SCRIPT_DIR and _SCRIPT_DIR not in sys.path: sys.path.insert(0, _SCRIPT_DIR)
+
+from dpa_parsing.bytedoc import editor_document
+from dpa_parsing.common import safe_decode, to_npp
+from dpa_parsing.editplan import EditorChangedError
+from dpa_parsing.footnotes import (FOOTNOTE_PATTERN_FIND, audit_footnotes, check_sequence_and_find_break,
+                                   describe_anomaly, find_footnote_bodies, find_footnotes, footnote_number_mapping,
+                                   footnote_renumbering_plan, format_orphan_bodies, orphan_bodies)
+from dpa_parsing.instrument import Recorder
+from dpa_parsing.worker import BackgroundTask, wait_for_task
+
+# True lists every footnote found on the console (buffered, one write)
+VERBOSE = False
+# JSON Lines file that receives the METRICS record of each run (None = console only)
+METRICS_LOG = None
+# JSON file that receives the full footnote audit of the document (None = console only)
+AUDIT_REPORT = None
+
+
+# --- Analysis (background thread: no editor calls in here) ---
+def analyze_footnotes(editor_text, code_page, recorder, progress):
     """
-    Checks if the middle numbers (Group 2) form a sequence 1, 2, 3...
-    Reports break using LINE NUMBER.
-    Returns details of the first break found, or None if contiguous.
+    The editor's document (a ByteDocument), its footnotes, their (verbose) listing,
+    the sequence check, the full audit and the renumbering plan (bodies included).
     """
-    console.write(u"--- Checking original footnote number sequence (using middle number) ---\n")
-    if not matches_list:
-        console.write(u"INFO: No footnotes found to check sequence.\n")
-        return None
-
-    first_break_info = None
-    for i, match in enumerate(matches_list):
-        expected_number = i + 1
-        start_pos = match.start() # Get position for line number lookup
-
-        try:
-            # Use Group 2 (the number BETWEEN the tags) for sequence check
-            found_number_str = match.group(2)
-            found_number = int(found_number_str)
-        except (IndexError, ValueError):
-            # Try to get line number even if number extraction fails
-            line_num = editor.lineFromPosition(start_pos) + 1 # Get 1-based line number
-            console.write(u"ERROR: Failed to read middle number in footnote on Line {} (Pos {})! Match: '{}'\n".format(
-                line_num, start_pos, safe_decode(match.group(0))))
-            found_number = -1 # Mark as invalid
-
-        if found_number != expected_number:
-            line_num = editor.lineFromPosition(start_pos) + 1 # Get 1-based line number
-            console.write(u"WARNING: Sequence break detected!\n")
-            console.write(u"  - On Line Number  : {}\n".format(line_num))
-            console.write(u"  - Expected number : {}\n".format(expected_number))
-            console.write(u"  - Found middle num: {} in tag '{}'\n".format(found_number if found_number != -1 else "[Read Error]", safe_decode(match.group(0))))
-
-            first_break_info = {
-                "expected": expected_number,
-                "found": found_number if found_number != -1 else "[Read Error]",
-                "position": start_pos, # Keep position internally
-                "line_number": line_num, # Store the user-friendly line number
-                "text": safe_decode(match.group(0))
-            }
-            break # Stop checking after the first break
-
-    if first_break_info:
-        console.write(u"--- Sequence Check Finished: Original sequence is BROKEN. ---\n")
-    else:
-        console.write(u"--- Sequence Check Finished: Original sequence (1 to {}) appears OK.\n".format(len(matches_list)))
-
-    return first_break_info
-
-def perform_footnote_renumbering(matches_list):
-    """Forces renumbering of footnotes sequentially from 1."""
-    num_to_renumber = len(matches_list)
-    console.write(u"--- Starting Forced Sequential Renumbering (v_final_7) ---\n")
-    console.write(u"Processing {} footnotes BACKWARDS (forcing 1 to {})\n".format(num_to_renumber, num_to_renumber))
-    renumbered_count = 0
-
-    editor.beginUndoAction()
-    try:
-        for i in range(num_to_renumber - 1, -1, -1):
-            match_object = matches_list[i]
-            correct_sequential_number = i + 1
-            # Create the perfectly formatted replacement tag
-            replacement_text = "{{{{footnotenumber{0}}}}}{0}{{{{-footnotenumber{0}}}}}".format(correct_sequential_number)
-
-            start_pos = match_object.start()
-            end_pos = match_object.end()
-
-            # Perform the replacement
-            editor.setTargetStart(start_pos)
-            editor.setTargetEnd(end_pos)
-            editor.replaceTarget(str(replacement_text)) # Ensure string type
-            renumbered_count += 1
-
-        console.write(u"\n--- Renumbering Complete ---\n")
-        console.write(u"INFO: {} footnotes renumbered sequentially (1 to {}).\n".format(renumbered_count, num_to_renumber))
-        editor.endUndoAction()
-        return True
-
-    except Exception as e:
-        editor.endUndoAction()
-        console.write(u"\n!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!\n")
-        console.write(u"!!! CRITICAL ERROR DURING REPLACEMENT !!!\n")
-        failed_index_msg = u"The error likely occurred near the end of processing."
-        try: failed_index_msg = u"The error likely occurred while processing original index {} (intended new number {})".format(i, correct_sequential_number)
-        except NameError: pass
-        console.write(failed_index_msg + u"\n")
-        console.write(u"Error Traceback:\n")
-        console.write(traceback.format_exc() + u"\n")
-        console.write(u"!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!\n")
-
-        error_details = safe_decode(str(e))
-        error_message_box = u"CRITICAL Error during replacement! See CONSOLE.\n{}".format(error_details)
-        # Encode message for Python 2's messageBox
-        try:
-             error_message_encoded = error_message_box.encode('utf-8')
-             notepad.messageBox(error_message_encoded, "Renumbering Failed", MESSAGEBOXFLAGS.ICONERROR)
-        except NameError: # Handles Python 3
-             notepad.messageBox(error_message_box, "Renumbering Failed", MESSAGEBOXFLAGS.ICONERROR)
-        except Exception as mb_err:
-             console.write(u"ERROR displaying Renumbering Failed messagebox: {}\n".format(mb_err))
-             print("Renumbering Failed MessageBox Error: {}".format(mb_err))
-
-        console.write(u"WARNING: Use Ctrl+Z to try and undo any partial changes.\n")
-        return False
+    progress.start(0, u"scanning tags")
+    stats = {'regex_calls': 0}
+    with recorder.timer('footnotes.find'):
+        document = editor_document(editor_text, code_page) # one bytes scan for find, bodies and audit
+        matches_list = find_footnotes(document, document.tokens, progress=progress, stats=stats)
+        bodies = find_footnote_bodies(document, document.tokens)
+    lines = document.line_index() # one line table for every report below
+    if recorder.verbose:
+        for i, footnote in enumerate(matches_list):
+            recorder.log(u"  {:>3}: Pos {:<8} Line {:<5} StartTagNum: {:<3} MiddleNum: {:<3} Text: '{}'\n",
+                         i + 1, document.byte_offset(footnote['start']), lines.line_of(footnote['start']),
+                         footnote['start_num'], footnote['middle_num'], footnote['text'])
+    with recorder.timer('footnotes.check'): sequence_break_info = check_sequence_and_find_break(matches_list, lines=lines)
+    with recorder.timer('footnotes.audit'): audit = audit_footnotes(document, document.tokens, lines=lines)
+    with recorder.timer('footnotes.renumber'): plan = footnote_renumbering_plan(matches_list, bodies)
+    orphans = [(body['number'], number) for body, number in orphan_bodies(bodies, footnote_number_mapping(matches_list), len(matches_list))]
+    recorder.count('footnotes.found', len(matches_list))
+    recorder.count('footnotes.bodies', len(bodies))
+    recorder.count('footnotes.sequence_breaks', 1 if sequence_break_info else 0)
+    recorder.add_counters('footnotes', stats)
+    recorder.add_counters('footnotes.audit', audit['counts'])
+    return document, matches_list, sequence_break_info, audit, plan, bodies, orphans
+
+def write_audit_report(path, audit):
+    with io.open(path, 'w', encoding='utf-8') as handle:
+        handle.write(u"{}\n".format(json.dumps(audit, indent=1, separators=(',', ': '))))
+
+def report_progress(progress):
+    console.write(u"INFO: {}\n".format(progress.describe()))
+
+
+def show_message(text_unicode, title, flags):
+    try: return notepad.messageBox(to_npp(text_unicode), to_npp(title), flags)
+    except Exception as mb_err:
+        console.write(u"ERROR showing '{}' messagebox: {}\n".format(title, mb_err))
+        return 7 # Default to NO if messagebox fails
 
 def run_renumber_flow():
     """Main function: find, log all, check sequence (line num), ask, renumber."""
@@ -140,151 +106,127 @@ def run_renumber_flow():
     console.clear()
     console.write(u"--- Starting Script: Renumber Footnotes (v_final_7) ---\n")
     console.write(u"Searching for pattern: {}\n".format(FOOTNOTE_PATTERN_FIND))
+    recorder = Recorder(u"FIX FOOTNOTE SEQUENCE", verbose=VERBOSE)
 
     try:
         # 1. Get Text
         console.write(u"INFO: Getting text from the currently active editor tab...\n")
-        editor_text_bytes = editor.getText()
-        editor_text_unicode = safe_decode(editor_text_bytes)
-        console.write(u"INFO: Text length = {}. Checking content...\n".format(len(editor_text_unicode)))
+        editor_text_raw = editor.getText()
+        console.write(u"INFO: Text length = {}. Checking content...\n".format(len(editor_text_raw)))
 
-        if not editor_text_unicode:
-            msg_unicode = u"The current document is empty."
-            try: notepad.messageBox(msg_unicode.encode('utf-8'), "Empty Document", MESSAGEBOXFLAGS.ICONWARNING)
-            except NameError: notepad.messageBox(msg_unicode, "Empty Document", MESSAGEBOXFLAGS.ICONWARNING)
+        if not editor_text_raw:
+            show_message(u"The current document is empty.", u"Empty Document", MESSAGEBOXFLAGS.ICONWARNING)
             console.write(u"WARNING: Document is empty.\n")
             return
 
-        # 2. Find Matches
-        console.write(u"INFO: Finding all potential footnote occurrences...\n")
-        matches_list = list(re.finditer(FOOTNOTE_PATTERN_FIND, editor_text_unicode))
+        # 2. Find Matches and check the sequence (background thread)
+        console.write(u"INFO: Finding all potential footnote occurrences (Plugins > Python Script > Stop Script cancels)...\n")
+        task = wait_for_task(BackgroundTask(analyze_footnotes, editor_text_raw, editor.getCodePage(), recorder).start(), report_progress)
+        if task.cancelled:
+            console.write(u"INFO: Analysis cancelled. Nothing was changed.\n")
+            show_message(u"Analysis cancelled.", u"Cancelled", MESSAGEBOXFLAGS.ICONINFORMATION)
+            return
+        if task.error:
+            console.write(u"\n!!! ERROR DURING ANALYSIS !!!\n" + task.error + u"\n")
+            show_message(u"Error during analysis. See CONSOLE.", u"Unexpected Error", MESSAGEBOXFLAGS.ICONERROR)
+            return
+        document, matches_list, sequence_break_info, audit, plan, bodies, orphans = task.result
         num_found = len(matches_list)
-        console.write(u"INFO: Search complete. Found {} potential occurrences.\n".format(num_found))
+        console.write(u"INFO: Search complete. Found {} potential occurrences and {} footnote bodies.\n".format(num_found, len(bodies)))
 
-        # 3. Log All Found Matches (if any)
+        # 3. Log All Found Matches (VERBOSE only), in one console write
         if num_found > 0:
-            console.write(u"\n--- List of ALL {} Found Footnotes ---\n".format(num_found))
-            for i, match in enumerate(matches_list):
-                try:
-                    g1 = match.group(1) # Num in start tag
-                    g2 = match.group(2) # Num in middle
-                except IndexError:
-                    g1, g2 = "[err]", "[err]"
-                console.write(u"  {:>3}: Pos {:<8} Line {:<5} StartTagNum: {:<3} MiddleNum: {:<3} Text: '{}'\n".format(
-                    i + 1,
-                    match.start(),
-                    editor.lineFromPosition(match.start()) + 1, # Get line number here too
-                    g1,
-                    g2,
-                    safe_decode(match.group(0))
-                ))
-            console.write(u"--- End of Found Footnotes List ---\n\n")
+            if recorder.verbose:
+                console.write(u"\n--- List of ALL {} Found Footnotes ---\n".format(num_found))
+                recorder.flush_log(console.write)
+                console.write(u"--- End of Found Footnotes List ---\n\n")
         else:
-             # If zero found now, something is still wrong
-            msg_unicode = u"No footnotes matching the pattern were found.\nPattern: {}".format(FOOTNOTE_PATTERN_FIND)
-            try: notepad.messageBox(msg_unicode.encode('utf-8'), "No Footnotes Found", MESSAGEBOXFLAGS.ICONINFORMATION)
-            except NameError: notepad.messageBox(msg_unicode, "No Footnotes Found", MESSAGEBOXFLAGS.ICONINFORMATION)
+            show_message(u"No footnotes matching the pattern were found.\nPattern: {}".format(FOOTNOTE_PATTERN_FIND),
+                         u"No Footnotes Found", MESSAGEBOXFLAGS.ICONINFORMATION)
             console.write(u"INFO: No matching footnotes found. Check pattern and file content.\n")
             return
 
         # 4. Perform Sequence Check (using middle number, reporting line number)
-        sequence_break_info = check_sequence_and_find_break(matches_list)
+        console.write(u"--- Checking original footnote number sequence (using middle number) ---\n")
+        if sequence_break_info:
+            console.write(u"WARNING: Sequence break detected!\n")
+            console.write(u"  - On Line Number  : {}\n".format(sequence_break_info["line_number"]))
+            console.write(u"  - Expected number : {}\n".format(sequence_break_info["expected"]))
+            console.write(u"  - Found middle num: {} in tag '{}'\n".format(sequence_break_info["found"], sequence_break_info["text"]))
+            console.write(u"--- Sequence Check Finished: Original sequence is BROKEN. ---\n")
+        else:
+            console.write(u"--- Sequence Check Finished: Original sequence (1 to {}) appears OK.\n".format(num_found))
+        if not audit['ok']:
+            console.write(u"--- Footnote Audit: {} anomalies ({}) ---\n".format(len(audit['anomalies']), u", ".join(
+                u"{} {}".format(number, kind) for kind, number in audit['counts'].items() if number)) +
+                u"".join(u"  - {}\n".format(describe_anomaly(anomaly)) for anomaly in audit['anomalies']))
+        orphan_note = u""
+        if orphans:
+            orphan_note = (u"\n\n{} footnote bodies have no footnote with their number. So that no two bodies share a number, "
+                           u"a body whose number another body takes moves past the last footnote: {}").format(len(orphans), format_orphan_bodies(orphans))
+            console.write(u"WARNING: {} footnote bodies have no footnote with their number: {}\n".format(
+                len(orphans), format_orphan_bodies(orphans)))
+        if AUDIT_REPORT:
+            write_audit_report(AUDIT_REPORT, audit)
+            console.write(u"INFO: Footnote audit saved to {}\n".format(AUDIT_REPORT))
 
         # 5. Ask User for Confirmation (handling sequence break)
-        proceed_renumber = False
         if sequence_break_info:
-            # Sequence is broken, ask user if they want to force it
             console.write(u"ACTION: Asking user whether to force renumbering due to sequence break.\n")
             warning_msg_unicode = (u"WARNING: Found {} footnotes, but the original numbering is NOT sequential!\n\n"
                                    u"First break detected around Line {}:\n"
                                    u"  Expected number: {}\n"
                                    u"  Found middle number: {}\n\n"
-                                   u"Do you want to IGNORE the original numbers and FORCE renumbering sequentially from 1 to {}?"
-                                   ).format(num_found,
-                                            sequence_break_info["line_number"], # Use line number
-                                            sequence_break_info["expected"],
-                                            sequence_break_info["found"],
-                                            num_found)
-            try:
-                warning_msg_bytes = warning_msg_unicode.encode('utf-8')
-                user_choice_on_break = notepad.messageBox(warning_msg_bytes, "Broken Sequence Detected", MESSAGEBOXFLAGS.YESNO | MESSAGEBOXFLAGS.ICONWARNING)
-            except NameError: # Python 3
-                user_choice_on_break = notepad.messageBox(warning_msg_unicode, "Broken Sequence Detected", MESSAGEBOXFLAGS.YESNO | MESSAGEBOXFLAGS.ICONWARNING)
-            except Exception as mb_err:
-                 console.write(u"ERROR showing Broken Sequence messagebox: {}\n".format(mb_err))
-                 user_choice_on_break = 7 # Default to NO if messagebox fails
-
-            if user_choice_on_break == 6: # IDYES
-                console.write(u"INFO: User chose YES to force renumbering despite broken sequence.\n")
-                proceed_renumber = True
-            else:
-                console.write(u"INFO: User chose NO to forcing renumbering (return code {}).\n".format(user_choice_on_break))
-                cancel_msg_unicode = u"Operation cancelled. Please fix the footnote numbering manually if needed."
-                try: notepad.messageBox(cancel_msg_unicode.encode('utf-8'), "Cancelled", MESSAGEBOXFLAGS.ICONINFORMATION)
-                except NameError: notepad.messageBox(cancel_msg_unicode, "Cancelled", MESSAGEBOXFLAGS.ICONINFORMATION)
-                except Exception as mb_err: console.write(u"ERROR showing Cancelled messagebox: {}\n".format(mb_err))
-
+                                   u"Do you want to IGNORE the original numbers and FORCE renumbering sequentially from 1 to {}?{}"
+                                   ).format(num_found, sequence_break_info["line_number"],
+                                            sequence_break_info["expected"], sequence_break_info["found"], num_found, orphan_note)
+            user_choice = show_message(warning_msg_unicode, u"Broken Sequence Detected", MESSAGEBOXFLAGS.YESNO | MESSAGEBOXFLAGS.ICONWARNING)
+            cancel_msg_unicode = u"Operation cancelled. Please fix the footnote numbering manually if needed."
         else:
-            # Sequence is OK, ask for standard confirmation
             console.write(u"ACTION: Asking user for standard renumbering confirmation.\n")
-            confirm_msg_unicode = u"Found {} footnotes. The original sequence appears correct (1 to {}).\n\nDo you want to renumber them sequentially (to ensure format consistency)?".format(num_found, num_found)
-            try:
-                confirm_msg_bytes = confirm_msg_unicode.encode('utf-8')
-                user_choice_ok = notepad.messageBox(confirm_msg_bytes, "Confirm Renumbering", MESSAGEBOXFLAGS.YESNO | MESSAGEBOXFLAGS.ICONQUESTION)
-            except NameError: # Python 3
-                user_choice_ok = notepad.messageBox(confirm_msg_unicode, "Confirm Renumbering", MESSAGEBOXFLAGS.YESNO | MESSAGEBOXFLAGS.ICONQUESTION)
-            except Exception as mb_err:
-                 console.write(u"ERROR showing Confirm Renumbering messagebox: {}\n".format(mb_err))
-                 user_choice_ok = 7 # Default to NO
+            confirm_msg_unicode = u"Found {} footnotes. The original sequence appears correct (1 to {}).\n\nDo you want to renumber them sequentially (to ensure format consistency)?{}".format(num_found, num_found, orphan_note)
+            user_choice = show_message(confirm_msg_unicode, u"Confirm Renumbering", MESSAGEBOXFLAGS.YESNO | MESSAGEBOXFLAGS.ICONQUESTION)
+            cancel_msg_unicode = u"Operation cancelled by user."
 
-            if user_choice_ok == 6: # IDYES
-                console.write(u"INFO: User chose YES to renumber (sequence was OK).\n")
-                proceed_renumber = True
-            else:
-                console.write(u"INFO: User chose NO to renumbering (return code {}).\n".format(user_choice_ok))
-                cancel_msg_unicode = u"Operation cancelled by user."
-                try: notepad.messageBox(cancel_msg_unicode.encode('utf-8'), "Cancelled", MESSAGEBOXFLAGS.ICONINFORMATION)
-                except NameError: notepad.messageBox(cancel_msg_unicode, "Cancelled", MESSAGEBOXFLAGS.ICONINFORMATION)
-                except Exception as mb_err: console.write(u"ERROR showing Cancelled messagebox: {}\n".format(mb_err))
+        if user_choice != 6: # IDYES
+            console.write(u"INFO: User chose NO to renumbering (return code {}).\n".format(user_choice))
+            show_message(cancel_msg_unicode, u"Cancelled", MESSAGEBOXFLAGS.ICONINFORMATION)
+            return
 
-        # 6. Perform Renumbering if User Confirmed
-        if proceed_renumber:
-            success = perform_footnote_renumbering(matches_list)
-            if success:
-                final_msg_unicode = u"Renumbering complete.\n\n{} footnotes were processed and numbered 1 to {}.".format(num_found, num_found)
-                try: notepad.messageBox(final_msg_unicode.encode('utf-8'), "Success", MESSAGEBOXFLAGS.ICONINFORMATION)
-                except NameError: notepad.messageBox(final_msg_unicode, "Success", MESSAGEBOXFLAGS.ICONINFORMATION)
-                except Exception as mb_err: console.write(u"ERROR showing Success messagebox: {}\n".format(mb_err))
-                console.write(u"INFO: Process finished successfully.\n")
-            # else: Error message already shown
+        # 6. Perform Renumbering
+        console.write(u"INFO: User chose YES to renumber.\n")
+        console.write(u"--- Starting Forced Sequential Renumbering (v_final_7) ---\n")
+        try:
+            # One editor write (single undo step) instead of one replaceTarget per footnote
+            with recorder.timer('footnotes.apply'): changed_count = plan.apply_to_editor(editor, document)
+            recorder.count('footnotes.rewritten', changed_count)
+        except EditorChangedError:
+            console.write(u"WARNING: The document was edited during the analysis. Nothing was changed; run the script again.\n")
+            show_message(u"The document was edited during the analysis.\nNothing was changed: run the script again.",
+                         u"Document Changed", MESSAGEBOXFLAGS.ICONWARNING)
+            return
+        except Exception as e:
+            console.write(u"\n!!! CRITICAL ERROR DURING REPLACEMENT !!!\n")
+            console.write(traceback.format_exc() + u"\n")
+            show_message(u"CRITICAL Error during replacement! See CONSOLE.\n{}".format(safe_decode(str(e))),
+                         u"Renumbering Failed", MESSAGEBOXFLAGS.ICONERROR)
+            return
+        console.write(u"INFO: {} footnotes renumbered sequentially (1 to {}), {} bodies kept in step with them, {} without a footnote ({}); {} edits.\n".format(
+            num_found, num_found, len(bodies) - len(orphans), len(orphans), format_orphan_bodies(orphans) or u"none", changed_count))
+        show_message(u"Renumbering complete.\n\n{} footnotes were processed and numbered 1 to {}.".format(num_found, num_found),
+                     u"Success", MESSAGEBOXFLAGS.ICONINFORMATION)
+        console.write(u"INFO: Process finished successfully.\n")
 
     # --- Error Handling ---
-    except NameError as ne:
-        error_details = safe_decode(str(ne))
-        print("CRITICAL ENVIRONMENT ERROR: {}".format(error_details))
-        console.write(u"CRITICAL ENVIRONMENT ERROR: Cannot access Notepad++ functions (editor, notepad, etc).\nEnsure the script is run correctly via the PythonScript plugin.\nError: {}\n".format(error_details))
-        console.write(traceback.format_exc() + u"\n")
-        try:
-            error_msg = u"Critical Error: Cannot access Notepad++ functions.\nSee console/PythonScript output.\nError: {}".format(error_details)
-            # Try encoding for Py2
-            notepad.messageBox(error_msg.encode('utf-8') if hasattr(error_msg, 'encode') else error_msg, "Environment Error", MESSAGEBOXFLAGS.ICONERROR)
-        except Exception as mb_err:
-            print("Failed to show Environment Error message box: {}".format(mb_err))
     except Exception as e:
         console.write(u"\n--- UNEXPECTED ERROR IN MAIN FLOW ---\n")
         console.write(traceback.format_exc() + u"\n")
-        error_details = safe_decode(str(e))
-        error_message_box_unicode = u"An unexpected error occurred:\n{}".format(error_details)
-        try:
-            # Try encoding for Py2
-            notepad.messageBox(error_message_box_unicode.encode('utf-8') if hasattr(error_message_box_unicode, 'encode') else error_message_box_unicode, "Unexpected Error", MESSAGEBOXFLAGS.ICONERROR)
-        except Exception as mb_err:
-            print("UNEXPECTED ERROR (messageBox failed): {}".format(mb_err))
-        console.write(u"Error displaying the unexpected error message box: {}\n".format(mb_err))
-
+        show_message(u"An unexpected error occurred:\n{}".format(safe_decode(str(e))), u"Unexpected Error", MESSAGEBOXFLAGS.ICONERROR)
     finally:
+        try: recorder.emit(console.write, METRICS_LOG)
+        except Exception as metrics_err: console.write(u"WARNING: metrics not written: {}\n".format(metrics_err))
         console.write(u"\n--- Script execution finished (v_final_7) ---\n")
 
 # --- Run the main function ---
 if __name__ == '__main__':
-    run_renumber_flow()
\ No newline at end of file
+    run_renumber_flow()
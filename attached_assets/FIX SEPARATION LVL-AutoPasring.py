@@ -1,125 +1,59 @@
 # -*- coding: utf-8 -*-
 from Npp import editor, notepad, console
-import re
+import os
+import sys
 
-# --- Bloco de Segurana para Scintilla (Opcional) ---
+# --- Bloco de Seguranca para Scintilla (Opcional) ---
 try:
     from Npp import SCINTILLANOTIFICATION
 except ImportError:
     class SCINTILLANOTIFICATION:
         MODIFIED = None
 
+# --- Motor dpa_parsing fica na mesma pasta deste script ---
+try: _SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+except NameError: _SCRIPT_DIR = None
+if _SCRIPT_DIR and _SCRIPT_DIR not in sys.path: sys.path.insert(0, _SCRIPT_DIR)
+
+from dpa_parsing.common import decode_document, to_npp
+from dpa_parsing.separation import join_then_force_separate
+
 def format_join_then_force_separate_final(): # Nome reflete o processo
     """
-    COMBINA TRS OPERAES EM SEQUNCIA:
-    1. JUNTA em uma nica linha interna:
+    COMBINA TRES OPERACOES EM SEQUENCIA (ver dpa_parsing/separation.py):
+    1. JUNTA em uma unica linha interna:
         - {{levelN}} com seu texto.
         - Texto com sua tag final {{-levelN}}.
         - Marcadores de lista {{...}} com seu texto.
-    2. FORA SEPARAO: Garante que CADA tag {{...}} resultante
-       (seja ela {{levelN}}Texto{{-levelN}} ou {{text_level}} etc.)
+    2. FORCA SEPARACAO: Garante que CADA tag {{...}} resultante
        esteja isolada por quebras de linha (\n).
     3. ADICIONA BLANKS: Insere UMA linha em branco (\n\n) entre
        cada linha/tag isolada, removendo linhas totalmente vazias.
-    Compatvel com Python 2.7 e verses antigas do PythonScript.
+    Compativel com Python 2.7 e versoes antigas do PythonScript.
     """
-    # --- Inicializao ---
-    # console.show() # Descomente para ver logs
-    # console.clear()
-    # console.write("Iniciando Formatao Final Combinada...\n")
-
     text_original = editor.getText()
     if not text_original:
         notepad.messageBox("Document is empty.", "Info", 0)
         return
 
-    text_processed = text_original
-    made_changes_phase1 = False # Flag para saber se a juno fez algo
-
-    # ===========================================================
-    # FASE 1: JUNTAR TAGS/MARCADORES AO TEXTO
-    # ===========================================================
-    # console.write("FASE 1: Juntando tags/marcadores...\n")
-    num_subs_total_phase1 = 0
-
-    # Passagem 1.1: Juntar Tag Inicial {{levelN}} com Texto
-    start_pattern = re.compile(r'(\{\{level\d+\}\})(\s*\n\s*)(?=\S)')
-    start_replacement = r'\1'
-    text_processed, num_subs1 = start_pattern.subn(start_replacement, text_processed)
-    if num_subs1 > 0: num_subs_total_phase1 += num_subs1
-
-    # Passagem 1.2: Juntar Texto com Tag Final {{-levelN}}
-    end_pattern = re.compile(r'(\S)(\s*\n\s*)(\{\{-level\d+\}\})')
-    end_replacement = r'\1\3'
-    text_processed, num_subs2 = end_pattern.subn(end_replacement, text_processed)
-    if num_subs2 > 0: num_subs_total_phase1 += num_subs2
-
-    # Passagem 1.3: Juntar Marcador de Lista {{...}} com Texto
-    marker_pattern = re.compile(
-        r'(\{\{\s*\(?\s*[a-zA-Z0-9ivxlcdmIVXLCDM\.]+\s*\)?\s*\}\})'
-        r'(\s*\n\s*)'
-        r'(?=\S)'
-    )
-    marker_replacement = r'\1 '
-    text_processed, num_subs3 = marker_pattern.subn(marker_replacement, text_processed)
-    if num_subs3 > 0: num_subs_total_phase1 += num_subs3
-
-    if num_subs_total_phase1 > 0:
-        made_changes_phase1 = True
-        # console.write("FASE 1: {} substituies de juno realizadas.\n".format(num_subs_total_phase1))
-    # else:
-        # console.write("FASE 1: Nenhuma juno interna necessria.\n")
-
-    # ===========================================================
-    # FASE 2: FORAR SEPARAO DE TODAS AS TAGS {{...}}
-    # (Usa a lgica do primeiro script 'format_text_separate_safely')
-    # Aplicada ao resultado da Fase 1
-    # ===========================================================
-    # console.write("FASE 2: Forando separao de todas as tags...\n")
-    text_after_phase1 = text_processed # Renomeia para clareza
-
-    # Adiciona \n ANTES de QUALQUER {{...}} se no houver \n antes.
-    text_sep1 = re.sub(r'(?<!\n)(\{\{[^{}]+\}\})', r'\n\1', text_after_phase1)
-    # Adiciona \n DEPOIS de QUALQUER {{...}} se no houver \n depois.
-    text_sep2 = re.sub(r'(\{\{[^{}]+\}\})(?!\n)', r'\1\n', text_sep1)
-
-    # ===========================================================
-    # FASE 3: ADICIONAR LINHAS EM BRANCO FINAIS
-    # (Divide, filtra vazios, junta com \n\n)
-    # Aplicada ao resultado da Fase 2
-    # ===========================================================
-    # console.write("FASE 3: Adicionando linhas em branco finais...\n")
-
-    # Divide o texto (agora com todas as tags isoladas por \n) em linhas
-    lines = text_sep2.splitlines()
-
-    # Filtra APENAS linhas que so literalmente strings vazias ('').
-    # Preserva linhas com espaos, e as linhas de tag/contedo.
-    processed_lines = [line for line in lines if line != '']
-
-    # Junta com "\n\n" para garantir UMA linha em branco entre cada item.
-    final_text_for_editor = "\n\n".join(processed_lines)
+    text_unicode, encoding = decode_document(text_original)
+    result = join_then_force_separate(text_unicode)
 
     # --- Atualizar o Editor ---
     # Atualiza se o resultado final for diferente do original
-    if final_text_for_editor != text_original:
-        # console.write("Atualizando editor com resultado final...\n")
+    if result.changes > 0:
         editor.beginUndoAction()
         try:
-            editor.setText(final_text_for_editor)
-            editor.scrollCaret() # Tenta trazer o cursor para a viso
+            editor.setText(to_npp(result.text, encoding))
+            editor.scrollCaret() # Tenta trazer o cursor para a visao
         except Exception as e:
             notepad.messageBox("Error updating text:\n" + str(e), "Error", 0)
-            # console.write(u"ERRO ao atualizar editor: {}\n".format(e))
         finally:
             editor.endUndoAction()
-        # Mensagem de sucesso final "Done"
         notepad.messageBox("Done", "Complete")
     else:
-        # Mensagem se nenhuma alterao foi necessria no total
         notepad.messageBox("No changes needed.", "Info", 0)
-        # console.write("Nenhuma alterao necessria no total.\n")
 
-# --- Ponto de Entrada Padro ---
+# --- Ponto de Entrada Padrao ---
 if __name__ == '__main__':
-    format_join_then_force_separate_final()
\ No newline at end of file
+    format_join_then_force_separate_final()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+from Npp import editor, notepad, console
+import os
+import sys
+
+# --- Bloco de Segurança para Scintilla (Opcional) ---
+try:
+    from Npp import SCINTILLANOTIFICATION
+except ImportError:
+    class SCINTILLANOTIFICATION:
+        MODIFIED = None
+        UPDATEUI = None
+
+# =======================================================
+# TEXT ALIGNER LIVE - realinha so a secao editada
+# =======================================================
+# OBJETIVO: Com o documento ja alinhado (Text Aligner.py), rodar
+#           este script liga o modo ao vivo; rodar de novo desliga.
+#           Cada edicao (notificacao MODIFIED) marca as linhas
+#           alteradas; quando o cursor sai da secao de topo editada
+#           (PART, CHAPTER, ANNEX ... ate o proximo), so essa secao
+#           e realinhada, com um replaceTarget (um passo de undo),
+#           em vez de um editor.setText do documento inteiro.
+# LOGICA: dpa_parsing/live.py (mesmo resultado do Text Aligner).
+# AMBIENTE: Python 2.7 / Notepad++ / PythonScript
+# =======================================================
+
+# --- Motor dpa_parsing fica na mesma pasta deste script ---
+try: _SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+except NameError: _SCRIPT_DIR = None
+if _SCRIPT_DIR and _SCRIPT_DIR not in sys.path: sys.path.insert(0, _SCRIPT_DIR)
+
+from dpa_parsing.common import decode_document, to_npp
+from dpa_parsing.live import DirtyLines, realign_region, region_bounds
+
+# Scintilla: SC_MOD_INSERTTEXT | SC_MOD_DELETETEXT
+TEXT_CHANGED_FLAGS = 0x01 | 0x02
+# SC_EOL_CRLF, SC_EOL_CR, SC_EOL_LF
+EOL_BY_MODE = {0: u"\r\n", 1: u"\r", 2: u"\n"}
+
+
+class LiveAligner(object):
+    """Dirty-line tracking for one buffer and the region realignment."""
+
+    def __init__(self):
+        self.buffer_id = notepad.getCurrentBufferID()
+        self.encoding = 'utf-8' if editor.getCodePage() == 65001 else 'latin-1'
+        self.dirty = DirtyLines()
+        self.applying = False # ignora as notificacoes da nossa propria escrita
+
+    def get_line(self, line):
+        return decode_document(editor.getLine(line))[0].rstrip(u"\r\n")
+
+    def on_modified(self, args):
+        if self.applying or not (args['modificationType'] & TEXT_CHANGED_FLAGS): return
+        if notepad.getCurrentBufferID() != self.buffer_id: return
+        self.dirty.mark(editor.lineFromPosition(args['position']), args['linesAdded'])
+
+    def on_update_ui(self, args):
+        if not self.dirty: return
+        if notepad.getCurrentBufferID() != self.buffer_id:
+            self.dirty.clear(); return
+        caret_line = editor.lineFromPosition(editor.getCurrentPos())
+        if self.dirty.contains(caret_line): return
+        line_count = editor.getLineCount()
+        start, end = region_bounds(self.get_line, line_count, self.dirty.first, self.dirty.last)
+        if start <= caret_line < end: return # ainda editando esta secao
+        self.realign(line_count)
+
+    def realign(self, line_count):
+        eol = EOL_BY_MODE.get(editor.getEOLMode(), u"\n")
+        start, end, replacement, stats = realign_region(self.get_line, line_count, self.dirty.first, self.dirty.last, eol)
+        self.dirty.clear()
+        start_pos = editor.positionFromLine(start)
+        end_pos = editor.positionFromLine(end) if end < line_count else editor.getLength()
+        if decode_document(editor.getTextRange(start_pos, end_pos))[0] == replacement: return
+        self.applying = True
+        editor.beginUndoAction()
+        try:
+            editor.setTargetStart(start_pos); editor.setTargetEnd(end_pos)
+            editor.replaceTarget(to_npp(replacement, self.encoding))
+        finally:
+            editor.endUndoAction()
+            self.applying = False
+        console.write(u"Text Aligner live: linhas {}-{} realinhadas ({} merges, {} splits)\n".format(
+            start + 1, end, stats['marker_merges'] + stats['description_merges'], stats['splits']))
+
+
+def toggle_live_mode():
+    global _dpa_live_aligner
+    live = globals().get('_dpa_live_aligner')
+    if live is not None:
+        editor.clearCallbacks(live.on_modified)
+        editor.clearCallbacks(live.on_update_ui)
+        _dpa_live_aligner = None
+        notepad.messageBox(to_npp(u"Text Aligner live: DESLIGADO"), to_npp(u"Text Aligner live"))
+        return
+    live = LiveAligner()
+    # MODIFIED sincrono: o intervalo sujo acompanha cada edicao na ordem certa
+    editor.callbackSync(live.on_modified, [SCINTILLANOTIFICATION.MODIFIED])
+    editor.callback(live.on_update_ui, [SCINTILLANOTIFICATION.UPDATEUI])
+    _dpa_live_aligner = live
+    notepad.messageBox(to_npp(u"Text Aligner live: LIGADO (rode de novo para desligar)"), to_npp(u"Text Aligner live"))
+
+if __name__ == '__main__':
+    toggle_live_mode()
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+Motor headless dos scripts Notepad++ do DPA Parsing.
+
+Cada estagio e uma funcao pura  texto unicode -> StageResult(text, changes, info).
+Os scripts em attached_assets/*.py sao apenas wrappers do Npp sobre estas funcoes;
+a linha de comando fica em ``python -m dpa_parsing``.
+"""
+from .aligner import align_text
+from .breaklines import insert_breakline_markers
+from .bytedoc import ByteDocument
+from .cache import SectionCache, cached_align_text
+from .common import StageResult, decode_document, decode_to_unicode, encode_document
+from .editplan import EditorChangedError, EditOverlapError, EditPlan
+from .footnotes import fix_footnote_sequence
+from .instrument import Recorder
+from .levels import adjust_levels
+from .lexer import Token, tokenize
+from .oneline import join_tags_to_text
+from .parallel import align_text_parallel
+from .pipeline import STAGES, Document, Pipeline, StageRun
+from .separation import join_then_force_separate
+from .vocabulary import DEFAULT_VOCABULARY, Vocabulary, register_language_pack
+
+__version__ = '1.0.0'
+
+__all__ = [
+    'STAGES', 'StageResult', 'Pipeline', 'Document', 'StageRun',
+    'align_text', 'align_text_parallel', 'cached_align_text', 'SectionCache', 'join_tags_to_text', 'join_then_force_separate',
+    'insert_breakline_markers', 'adjust_levels', 'fix_footnote_sequence',
+    'decode_document', 'decode_to_unicode', 'encode_document', 'ByteDocument',
+    'EditPlan', 'EditOverlapError', 'EditorChangedError', 'Recorder',
+    'Token', 'tokenize',
+    'Vocabulary', 'DEFAULT_VOCABULARY', 'register_language_pack',
+]
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+import sys
+
+from .cli import main
+
+if __name__ == '__main__': # os processos do --jobs reimportam este modulo no Windows
+    sys.exit(main())
@@ -0,0 +1,418 @@
+# -*- coding: utf-8 -*-
+# =======================================================
+# TEXT ALIGNER - motor (logica V7, sem dependencia do Npp)
+# =======================================================
+# Classifica cada linha, separa "6. (a) texto", junta
+# marcadores/descricoes as linhas seguintes e aplica o
+# espacamento final. align_text() e a funcao pura str -> str.
+# =======================================================
+from __future__ import unicode_literals
+
+import re
+
+from .common import StageResult
+from .vocabulary import DEFAULT_VOCABULARY
+
+# ======================
+# CONSTANTS & KEYWORDS & TYPES
+# ======================
+# (Constants, Keywords, Types remain the same as V6)
+# Palavras-chave de titulo por idioma em vocabulary.py (language packs), lidas de
+# DEFAULT_VOCABULARY a cada chamada: DETECT_KEYWORDS_UPPER / _TITLE / ALL_DETECT_KEYWORDS
+# sao DEFAULT_VOCABULARY.heading_keywords() e o trie, heading_matcher().
+AMBIGUOUS_TITLE_KEYWORDS = {u'rule', u'order', u'paragraph', u'clause', u'regulation'}
+
+PREAMBLE_INTRO_PHRASES=[u"Members,"]
+PREAMBLE_CLAUSE_STARTERS=[
+    u"Noting", u"Considering", u"Recognizing", u"Recognising", u"Recalling", u"Desiring",
+    u"Affirming", u"Having carried out", u"Striving", u"Believing", u"Whereas",
+    u"The Governments of", u"The Parties",
+    u"Conscious of", u"Mindful of", u"Reaffirming"
+]
+TRANSITIONAL_PHRASES=[
+    u"Hereby agree as follows:", u"Have agreed as follows:", u"The Parties hereby agree as follows:",
+    u"Agree as follows:", u"Adopt the following provisions:"
+]
+DETECT_TRANSITIONAL_PHRASES_LOWER=set(p.lower() for p in TRANSITIONAL_PHRASES)
+
+# --- Line Types ---
+# Codigos inteiros (comparacao e set lookup baratos); LINE_TYPE_NAMES[code] da o nome.
+LINE_TYPE_NAMES = (
+    u"PREAMBLE_HEAD", u"PREAMBLE_INTRO", u"PREAMBLE_CLAUSE",
+    u"TRANSITIONAL", u"HEADING_UPPER", u"HEADING_TITLE",
+    u"HEADING_DESC", u"NUMBERED_PARA_HEAD", u"ENUM_MARKER",
+    u"NUM_MARKER", u"ENUM_ITEM", u"NUMBERED_ITEM",
+    u"FOOTNOTE_BLOCK", u"ENDS_COLON", u"REGULAR",
+    u"BLANK", u"CONSUMED", u"UNKNOWN",
+    u"SPLIT_MARKER_PARENT",
+)
+(LT_PREAMBLE_HEAD, LT_PREAMBLE_INTRO, LT_PREAMBLE_CLAUSE,
+ LT_TRANSITIONAL, LT_HEADING_UPPER, LT_HEADING_TITLE,
+ LT_HEADING_DESC, LT_NUMBERED_PARA_HEAD, LT_ENUM_MARKER,
+ LT_NUM_MARKER, LT_ENUM_ITEM, LT_NUMBERED_ITEM,
+ LT_FOOTNOTE_BLOCK, LT_ENDS_COLON, LT_REGULAR,
+ LT_BLANK, LT_CONSUMED, LT_UNKNOWN,
+ LT_SPLIT_MARKER_PARENT) = range(len(LINE_TYPE_NAMES))
+
+HEADING_TYPES = frozenset([LT_HEADING_UPPER, LT_HEADING_TITLE])
+# Types considered major structural elements that would prevent merging a previous line as a title
+MAJOR_STRUCTURAL_TYPES = {
+    LT_HEADING_UPPER, LT_HEADING_TITLE, LT_PREAMBLE_HEAD, LT_TRANSITIONAL,
+    LT_SPLIT_MARKER_PARENT # Parent part of a split line also acts as structure start
+}
+
+
+# --- Compiled Regex ---
+# (Regex remain the same as V6)
+RE_FOOTNOTE_BLOCK=re.compile(r'^\s*\d+\s+["“].*',re.UNICODE)
+RE_NUMBERED_ITEM=re.compile(r'^\s*(?:\d+(?:\.\d+)*\.|\(\d+\))\s+\S+',re.UNICODE)
+RE_NUM_MARKER=re.compile(r'^\s*(?:\d+(?:\.\d+)*\.|\(\d+\))\s*$',re.UNICODE)
+RE_NUMBERED_PARA_HEAD_MARKER=re.compile(r'^\s*(?:\d+|[IVXLCDM]+)\.\s*$',re.IGNORECASE|re.UNICODE)
+RE_ENUM_ITEM=re.compile(r"""
+    ^\s*(?: \([a-zA-Z]{1,2}\) | \([ivxlcdm]+\) | \([IVXLCDM]+\) |
+             [a-zA-Z]{1,2}\. | [ivxlcdm]+\. | [IVXLCDM]+\. )\s+\S+
+    """,re.VERBOSE|re.IGNORECASE|re.UNICODE)
+RE_ENUM_MARKER=re.compile(r"""
+    ^\s*(?: \([a-zA-Z]{1,2}\) | \([ivxlcdm]+\) | \([IVXLCDM]+\) |
+             [a-zA-Z]{1,2}\. | [ivxlcdm]+\. | [IVXLCDM]+\. )\s*$
+    """,re.VERBOSE|re.IGNORECASE|re.UNICODE)
+RE_FIND_FIRST_ID_PATTERN=re.compile(r"""
+    ( \d+(?:\.\d+)* | [IVXLCDM]+ | [A-Z] )
+    (?=[\s\.:\-]|$)
+    """,re.IGNORECASE|re.UNICODE|re.VERBOSE)
+RE_ITEM_MARKER_START=re.compile(r'^\s*(\(?[a-zA-Z0-9]+\)|[a-zA-Z]{1,2}\.|[ivxlcdm]+\.|[IVXLCDM]+\.|\d+\.)',re.IGNORECASE|re.UNICODE)
+RE_SPLIT_NUMBER_ENUM=re.compile(r"""
+    ^           # Start of line
+    \s*         # Optional leading space
+    ( \d+\. )   # Group 1: Number marker (e.g., "6.")
+    \s+         # One or more spaces BETWEEN markers
+    ( \( [a-zA-Z]{1,2} \) ) # Group 2: Enum marker (e.g., "(a)")
+    \s+         # One or more spaces AFTER enum marker
+    ( .* )      # Group 3: The rest of the line (content)
+    $           # End of line
+    """, re.VERBOSE | re.UNICODE | re.IGNORECASE)
+RE_HEADING_ONLY_KEY_ID = re.compile(r"""
+    ^                 # Start of line
+    \s*               # Optional leading space
+    ([a-zA-ZÁÉÍÓÚÑÜÇÀÂÊÎÔÛÄËÏÖÜáéíóúñüçàâêîôûäëïöü]+) # Keyword (Group 1)
+    \s+               # Space(s)
+    ([0-9IVXLCDM]+     # ID: number or Roman (Group 2)
+     (?:\.[0-9]+)*)   # Optional sub-numbers like .1 .2
+    (?:\s*[:.\-–]?\s*$) # Optional space, colon, dot, hyphen, en-dash, then end of line
+    """, re.VERBOSE | re.UNICODE | re.IGNORECASE)
+
+# --- Scanner combinado ---
+# Os seis testes de formato do fim de identify_line_type (RE_ENUM_MARKER ...
+# RE_NUMBERED_ITEM) numa unica alternancia, na mesma ordem de prioridade:
+# o re tenta cada alternativa por inteiro antes da seguinte, entao o grupo
+# que casa (match.lastgroup) e o mesmo que a cadeia de ifs escolheria.
+# IGNORECASE vale para todas: nas alternativas numericas nao muda nada.
+LINE_SHAPE_ALTERNATIVES = [
+    ('enum_marker', LT_ENUM_MARKER, r"\s*(?:\([a-zA-Z]{1,2}\)|\([ivxlcdm]+\)|\([IVXLCDM]+\)|[a-zA-Z]{1,2}\.|[ivxlcdm]+\.|[IVXLCDM]+\.)\s*$"),
+    ('numbered_para_head', LT_NUMBERED_PARA_HEAD, r"\s*(?:\d+|[IVXLCDM]+)\.\s*$"),
+    ('num_marker', LT_NUM_MARKER, r"\s*(?:\d+(?:\.\d+)*\.|\(\d+\))\s*$"),
+    ('footnote_block', LT_FOOTNOTE_BLOCK, r'\s*\d+\s+["“].*'),
+    ('enum_item', LT_ENUM_ITEM, r"\s*(?:\([a-zA-Z]{1,2}\)|\([ivxlcdm]+\)|\([IVXLCDM]+\)|[a-zA-Z]{1,2}\.|[ivxlcdm]+\.|[IVXLCDM]+\.)\s+\S+"),
+    ('numbered_item', LT_NUMBERED_ITEM, r"\s*(?:\d+(?:\.\d+)*\.|\(\d+\))\s+\S+"),
+]
+LINE_SHAPE_TYPES = dict((name, line_type) for name, line_type, _ in LINE_SHAPE_ALTERNATIVES)
+# Pass 1 testa antes o "6. (a) texto" (RE_SPLIT_NUMBER_ENUM): mesma varredura, primeira alternativa.
+SPLIT_ALTERNATIVE = ('split', None, r"\s*(?P<split_number>\d+\.)\s+(?P<split_enum>\([a-zA-Z]{1,2}\))\s+(?P<split_content>.*)$")
+
+def _compile_alternatives(alternatives):
+    return re.compile(u"^(?:" + u"|".join(u"(?P<{}>{})".format(name, pattern) for name, _, pattern in alternatives) + u")",
+                      re.IGNORECASE | re.UNICODE)
+
+RE_LINE_SHAPE = _compile_alternatives(LINE_SHAPE_ALTERNATIVES)
+RE_LINE_SCAN = _compile_alternatives([SPLIT_ALTERNATIVE] + LINE_SHAPE_ALTERNATIVES)
+_NOT_SCANNED = object()
+
+
+# ======================
+# HELPER FUNCTIONS
+# ======================
+# (is_pure_number, format_heading_text, ensure_blank_lines_before,
+#  heading_contains_only_keyword_and_id remain the same as V6)
+def is_pure_number(line):
+    return bool(re.match(r'^[0-9]+$', line.strip()))
+
+def format_heading_text(original_line, line_type):
+    return original_line.strip()
+
+def ensure_blank_lines_before(output_list, n):
+    can_add_initial = not output_list
+    while output_list and output_list[-1].strip() == u"": output_list.pop()
+    if output_list or (can_add_initial and n > 0):
+         for _ in range(n): output_list.append(u"")
+
+def _count(stats, key, amount=1):
+    if stats is not None: stats[key] = stats.get(key, 0) + amount
+
+def _match(pattern, text, stats):
+    """pattern.match(text), counted as one of stats['regex_calls']."""
+    _count(stats, 'regex_calls')
+    return pattern.match(text)
+
+def heading_contains_only_keyword_and_id(heading_text, stats=None):
+    return bool(_match(RE_HEADING_ONLY_KEY_ID, heading_text.strip(), stats))
+
+def identify_line_type(line, previous_line_type=None, shape_match=_NOT_SCANNED, stats=None):
+    """
+    V6 classification. `shape_match` is the RE_LINE_SHAPE/RE_LINE_SCAN match of
+    the stripped line when the caller already scanned it (Pass 1). The regexes
+    run here are counted in stats['regex_calls'] when `stats` is given.
+    """
+    stripped = line.strip(); lower_stripped = stripped.lower()
+    if not stripped: return LT_BLANK
+    if lower_stripped == u"preamble": return LT_PREAMBLE_HEAD
+    for phrase in PREAMBLE_INTRO_PHRASES:
+        if stripped == phrase: return LT_PREAMBLE_INTRO
+    if lower_stripped in DETECT_TRANSITIONAL_PHRASES_LOWER: return LT_TRANSITIONAL
+    detect_upper, detect_title, all_detect = DEFAULT_VOCABULARY.heading_keywords()
+    is_preamble_context = previous_line_type in [LT_PREAMBLE_HEAD, LT_PREAMBLE_INTRO, LT_PREAMBLE_CLAUSE]
+    if is_preamble_context:
+        for word in PREAMBLE_CLAUSE_STARTERS:
+            if stripped.startswith(word + u" ") and not _match(RE_ENUM_ITEM, stripped, stats) and not _match(RE_NUMBERED_ITEM, stripped, stats) :
+                 first_word_lower_check = stripped.split(None, 1)[0].lower()
+                 if first_word_lower_check not in all_detect: return LT_PREAMBLE_CLAUSE
+    parts = stripped.split(None, 1); first_word_lower = parts[0].lower() if parts else ""
+    heading_type = None; longest_keyword_match = 0
+    if first_word_lower in all_detect:
+        best_kw_lower = ""
+        # Uma caminhada no trie: so as palavras-chave que sao prefixo da linha, da mais curta a mais longa
+        for kw_len, kw_lower in DEFAULT_VOCABULARY.heading_matcher().prefixes(lower_stripped):
+            if len(stripped) == kw_len or stripped[kw_len:kw_len+1].isspace() or stripped[kw_len:kw_len+1] == u'-':
+                 longest_keyword_match = kw_len
+                 best_kw_lower = kw_lower
+        if best_kw_lower:
+             if best_kw_lower in detect_upper: heading_type = LT_HEADING_UPPER
+             elif best_kw_lower in detect_title: heading_type = LT_HEADING_TITLE
+             else: heading_type = LT_HEADING_TITLE
+    if heading_type:
+        looks_like_item = _match(RE_ENUM_ITEM, stripped, stats) or _match(RE_NUMBERED_ITEM, stripped, stats)
+        is_short_keyword = longest_keyword_match <= 2
+        if looks_like_item and is_short_keyword: heading_type = None
+        elif first_word_lower in AMBIGUOUS_TITLE_KEYWORDS:
+            if not (_match(RE_HEADING_ONLY_KEY_ID, stripped, stats) or stripped.lower() == first_word_lower):
+                heading_type = None
+    if heading_type: return heading_type
+    if shape_match is _NOT_SCANNED: shape_match = _match(RE_LINE_SHAPE, stripped, stats)
+    if shape_match: return LINE_SHAPE_TYPES[shape_match.lastgroup]
+    if stripped.endswith(u':'): return LT_ENDS_COLON
+    if is_preamble_context:
+         potential_marker = stripped.split(None,1)[0] + '.' if stripped else ''
+         if not _match(RE_NUMBERED_PARA_HEAD_MARKER, potential_marker, stats): return LT_PREAMBLE_CLAUSE
+    return LT_REGULAR
+
+
+# ======================
+# LINE RECORDS
+# ======================
+class LineRecord(object):
+    """
+    One entry of processed_lines_data. __slots__ instead of the 7-key dict of
+    the original script: no per-line dict, attribute access in every pass.
+    """
+    __slots__ = ('text', 'type', 'original_index', 'merged_into_prev', 'consumes_next', 'is_heading', 'was_split')
+
+    def __init__(self, text, line_type, original_index, is_heading=False, was_split=False):
+        self.text = text; self.type = line_type; self.original_index = original_index
+        self.merged_into_prev = False; self.consumes_next = False
+        self.is_heading = is_heading; self.was_split = was_split
+
+    def __repr__(self):
+        return "LineRecord({!r}, {}, {})".format(self.text, LINE_TYPE_NAMES[self.type], self.original_index)
+
+
+# ======================
+# PASSES
+# ======================
+# Cada passo e um gerador sobre LineRecords: le a entrada sob demanda e so
+# guarda uma janela pequena (Pass 2 olha 1 linha a frente, Pass 2.5 olha 2),
+# entao o alinhamento inteiro roda com memoria constante. As funcoes de lista
+# (identify_lines, merge_markers, ...) sao os mesmos geradores consumidos.
+MERGEABLE_MARKER_TYPES = frozenset([LT_ENUM_MARKER, LT_NUM_MARKER, LT_NUMBERED_PARA_HEAD])
+NON_MERGE_TYPES = frozenset([LT_HEADING_UPPER, LT_HEADING_TITLE, LT_PREAMBLE_HEAD, LT_PREAMBLE_INTRO, LT_PREAMBLE_CLAUSE,
+                             LT_TRANSITIONAL, LT_NUMBERED_PARA_HEAD, LT_ENUM_MARKER, LT_NUM_MARKER, LT_ENUM_ITEM,
+                             LT_NUMBERED_ITEM, LT_FOOTNOTE_BLOCK, LT_SPLIT_MARKER_PARENT])
+DESCRIPTION_TYPES = frozenset([LT_REGULAR, LT_ENDS_COLON])
+HEADINGS_ALL = frozenset([LT_HEADING_UPPER, LT_HEADING_TITLE, LT_PREAMBLE_HEAD])
+EFFECTIVE_HEADINGS = HEADINGS_ALL.union([LT_SPLIT_MARKER_PARENT])
+# Contadores de iter_aligned_lines (StageResult.info do align)
+ALIGN_STATS = ('lines_in', 'lines_out', 'splits', 'marker_merges', 'description_merges', 'regex_calls')
+
+def _live(processed_lines_data):
+    return (line_info for line_info in processed_lines_data if not line_info.merged_into_prev)
+
+def iter_identified(raw_lines_unicode, stats=None):
+    """Pass 1 generator: initial identification (and "6. (a) text" split)."""
+    last_line_type_identified = None
+    regex_calls = 0 # is_pure_number + RE_LINE_SCAN; contador local, somado em stats no fim
+    try:
+        for i, line in enumerate(raw_lines_unicode):
+            _count(stats, 'lines_in')
+            regex_calls += 1
+            if is_pure_number(line): continue
+            stripped_line = line.strip()
+            if not stripped_line: continue
+            scan_match = RE_LINE_SCAN.match(stripped_line) # split + formato numa so varredura
+            regex_calls += 1
+            if scan_match and scan_match.lastgroup == 'split':
+                num_marker = scan_match.group('split_number').strip()
+                enum_marker = scan_match.group('split_enum').strip()
+                content = scan_match.group('split_content').strip()
+                _count(stats, 'splits')
+                yield LineRecord(num_marker, LT_SPLIT_MARKER_PARENT, i, was_split=True)
+                enum_text = enum_marker + u" " + content
+                yield LineRecord(enum_text, LT_ENUM_ITEM, i, was_split=True)
+                last_line_type_identified = LT_ENUM_ITEM
+                continue
+            line_type = identify_line_type(line, last_line_type_identified, scan_match, stats)
+            yield LineRecord(stripped_line, line_type, i, is_heading=line_type in HEADING_TYPES)
+            last_line_type_identified = line_type
+    finally:
+        _count(stats, 'regex_calls', regex_calls)
+
+def iter_marker_merges(line_records, stats=None):
+    """
+    Pass 2 generator: merges bare markers ("(a)", "1.", "IV.") with the following
+    text line. Yields the surviving records, each once its merge is settled.
+    """
+    current_info = None
+    for next_info in line_records:
+        if current_info is None:
+            current_info = next_info; continue
+        if current_info.type in MERGEABLE_MARKER_TYPES and next_info.type not in NON_MERGE_TYPES and next_info.text:
+            current_info.text = current_info.text + u" " + next_info.text
+            if current_info.type == LT_ENUM_MARKER: current_info.type = LT_ENUM_ITEM
+            else: current_info.type = LT_NUMBERED_ITEM
+            next_info.merged_into_prev = True; current_info.consumes_next = True
+            _count(stats, 'marker_merges')
+            yield current_info
+            current_info = None # Skip merged line
+        else:
+            yield current_info
+            current_info = next_info
+    if current_info is not None: yield current_info
+
+def iter_description_merges(line_records, stats=None):
+    """
+    Pass 2.5 generator: merges "Keyword ID" headings with their description
+    (V7 lookahead: the line after the description must not be structural).
+    """
+    line_records = iter(line_records)
+    all_detect = DEFAULT_VOCABULARY.heading_keywords()[2]
+    window = [] # no maximo [descricao, linha seguinte]
+    def fill(size):
+        while len(window) < size:
+            try: window.append(next(line_records))
+            except StopIteration: return
+    while True:
+        fill(1)
+        if not window: return
+        current_info = window.pop(0)
+        # Step 1/2: only headings made of keyword + ID alone
+        if current_info.is_heading and heading_contains_only_keyword_and_id(current_info.text, stats):
+            fill(2)
+            if window: # Step 3: a line follows
+                potential_desc_info = window[0]
+                potential_desc_text = potential_desc_info.text
+                # Step 4: basic checks on the potential description line
+                if potential_desc_text and not _match(RE_ITEM_MARKER_START, potential_desc_text, stats) and \
+                   potential_desc_text.split(None, 1)[0].lower() not in all_detect:
+                    # Step 5/6: the V7 decision - potential_desc must not be the last line
+                    # nor the only content before the next structural element
+                    should_merge = len(window) > 1 and window[1].type not in MAJOR_STRUCTURAL_TYPES
+                    # Step 7
+                    if should_merge and potential_desc_info.type in DESCRIPTION_TYPES:
+                        current_info.text += u" " + potential_desc_text
+                        potential_desc_info.merged_into_prev = True
+                        current_info.consumes_next = True
+                        _count(stats, 'description_merges')
+                        window.pop(0)
+        yield current_info
+
+def blank_lines_between(last_type, current_type, current_was_split=False):
+    """Pass 3 rule: blank lines to put between a line of last_type and the next one."""
+    if last_type == LT_SPLIT_MARKER_PARENT and current_type == LT_ENUM_ITEM and current_was_split: return 0
+    if current_type in EFFECTIVE_HEADINGS and last_type not in EFFECTIVE_HEADINGS and last_type != LT_TRANSITIONAL: return 2
+    return 1
+
+def iter_spaced_lines(line_records, stats=None):
+    """
+    Pass 3 + final cleanup generator: yields the output lines (text with the
+    trailing space, u"" for blank lines). The blank lines the script put before
+    the first line were removed again by the cleanup, so none are yielded.
+    """
+    last_added_info = None
+    for current_info in line_records:
+        if last_added_info is None: num_blanks_needed = 0
+        else: num_blanks_needed = blank_lines_between(last_added_info.type, current_info.type, current_info.was_split)
+        for _ in range(num_blanks_needed): yield u""
+        yield current_info.text + u" "
+        _count(stats, 'lines_out', num_blanks_needed + 1)
+        last_added_info = current_info
+
+def iter_aligned_lines(raw_lines_unicode, stats=None):
+    """
+    Streaming Text Aligner: raw input lines in (any iterable, read lazily),
+    output lines out. `stats` (a dict) receives lines_in, lines_out, splits,
+    marker_merges, description_merges and regex_calls as the lines go through.
+    """
+    _init_stats(stats)
+    line_records = iter_identified(raw_lines_unicode, stats)
+    line_records = iter_marker_merges(line_records, stats)
+    line_records = iter_description_merges(line_records, stats)
+    return iter_spaced_lines(line_records, stats)
+
+def timed_aligned_lines(raw_lines_unicode, stats, recorder):
+    """
+    iter_aligned_lines one pass at a time (each pass materialized in a list),
+    with Pass 1, 2, 2.5 and 3 timed in `recorder` (an instrument.Recorder).
+    """
+    _init_stats(stats)
+    with recorder.timer('align.pass1'): line_records = list(iter_identified(raw_lines_unicode, stats))
+    with recorder.timer('align.pass2'): line_records = list(iter_marker_merges(line_records, stats))
+    with recorder.timer('align.pass2_5'): line_records = list(iter_description_merges(line_records, stats))
+    with recorder.timer('align.pass3'): return list(iter_spaced_lines(line_records, stats))
+
+def _init_stats(stats):
+    if stats is not None:
+        for key in ALIGN_STATS: stats.setdefault(key, 0)
+
+def identify_lines(raw_lines_unicode):
+    """Pass 1: Initial identification (and "6. (a) text" split)."""
+    return list(iter_identified(raw_lines_unicode))
+
+def merge_markers(processed_lines_data):
+    """Pass 2 over a record list (flags set in place). Returns the number of merges."""
+    stats = {'marker_merges': 0}
+    for _ in iter_marker_merges(_live(processed_lines_data), stats): pass
+    return stats['marker_merges']
+
+def merge_descriptions(processed_lines_data):
+    """Pass 2.5 over a record list (flags set in place). Returns the number of merges."""
+    stats = {'description_merges': 0}
+    for _ in iter_description_merges(_live(processed_lines_data), stats): pass
+    return stats['description_merges']
+
+def apply_spacing(processed_lines_data):
+    """Pass 3 + final cleanup: returns the output lines (with trailing space)."""
+    return list(iter_spaced_lines(_live(processed_lines_data)))
+
+# ======================
+# ENTRY POINT (str -> str)
+# ======================
+def align_text(text_unicode, recorder=None):
+    """
+    Runs Pass 1, 2, 2.5 and 3 over a unicode document. Returns a StageResult.
+    With a `recorder` (instrument.Recorder) each pass is timed and the stats
+    are added to its counters as align.*.
+    """
+    stats = {}
+    if recorder is None: output_lines = iter_aligned_lines(text_unicode.splitlines(), stats)
+    else: output_lines = timed_aligned_lines(text_unicode.splitlines(), stats, recorder)
+    final_text_unicode = u"\n".join(output_lines)
+    if recorder is not None: recorder.add_counters('align', stats)
+    # changes = edicoes estruturais (split/merge); o espacamento sozinho conta como 0
+    return StageResult(final_text_unicode, stats['splits'] + stats['marker_merges'] + stats['description_merges'], stats)
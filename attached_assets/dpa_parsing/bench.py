@@ -0,0 +1,646 @@
+# -*- coding: utf-8 -*-
+# =======================================================
+# BENCH - micro-benchmarks de escalabilidade do motor
+# =======================================================
+# Uso:
+#   python -m dpa_parsing.bench containment
+#   python -m dpa_parsing.bench aligner --sizes 1,10,100
+#   python -m dpa_parsing.bench classify
+#   python -m dpa_parsing.bench records      (Python 3: tracemalloc)
+#   python -m dpa_parsing.bench stream       (Python 3: tracemalloc)
+#   python -m dpa_parsing.bench separate
+#   python -m dpa_parsing.bench parallel --sizes 100,1000
+#   python -m dpa_parsing.bench cache
+#   python -m dpa_parsing.bench live
+#   python -m dpa_parsing.bench pairing      (tags sem fechamento)
+# Cada benchmark gera documentos sinteticos de tamanho
+# crescente e imprime o tempo por item; em um algoritmo
+# linear a coluna "us/item" fica estavel.
+# =======================================================
+from __future__ import print_function, unicode_literals
+
+import argparse
+import io
+import multiprocessing
+import os
+import random
+import re
+import shutil
+import tempfile
+import timeit
+
+try:
+    import tracemalloc
+except ImportError: # Python 2 (PythonScript)
+    tracemalloc = None
+
+from .aligner import (LINE_SHAPE_TYPES, LINE_TYPE_NAMES, RE_ENUM_ITEM, RE_ENUM_MARKER, RE_FOOTNOTE_BLOCK, RE_LINE_SCAN, RE_LINE_SHAPE,
+                      RE_HEADING_ONLY_KEY_ID, RE_NUM_MARKER, RE_NUMBERED_ITEM, RE_NUMBERED_PARA_HEAD_MARKER,
+                      RE_SPLIT_NUMBER_ENUM, AMBIGUOUS_TITLE_KEYWORDS, DETECT_TRANSITIONAL_PHRASES_LOWER,
+                      PREAMBLE_CLAUSE_STARTERS, PREAMBLE_INTRO_PHRASES, identify_line_type, is_pure_number,
+                      LT_ENUM_ITEM, LT_ENUM_MARKER, LT_FOOTNOTE_BLOCK, LT_NUM_MARKER, LT_NUMBERED_ITEM,
+                      LT_NUMBERED_PARA_HEAD, LineRecord, align_text, identify_lines, iter_aligned_lines,
+                      merge_descriptions, merge_markers)
+from .breaklines import insert_breakline_markers
+from .cache import SectionCache, cached_align_text
+from .common import iter_file_lines, write_lines
+from .levels import (HIERARCHY, MARKER_CLEANUP_PATTERN_U, extract_identifier, find_level_tags, is_direct_sub_identifier,
+                     perform_level_adjustment_v4_10)
+from .lexer import LEVEL_CLOSE, LEVEL_OPEN, pair_same_number, tokenize
+from .live import DirtyLines, realign_region
+from .parallel import CHUNKS_PER_PROCESS, align_text_parallel, find_cuts
+from .separation import join_then_force_separate, join_then_force_separate_phased
+from .vocabulary import register_language_pack
+
+# original.txt / parsed.txt ficam em attached_assets, ao lado do pacote.
+SAMPLE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ARTICLE_TEMPLATE = (u"{{{{level2}}}}Article {n}{{{{-level2}}}}\n\n"
+                    u"{{{{text_level}}}}{{{{level3}}}}1. Paragraph {n}.1 of the Article.{{{{-level3}}}}\n\n"
+                    u"{{{{level3}}}}2. Paragraph {n}.2 of the Article.{{{{-level3}}}}{{{{-text_level}}}}\n\n")
+
+
+def synthetic_levels_document(articles):
+    """CHAPTER headings every 20 articles; each article carries a {{text_level}} block."""
+    parts = []
+    for n in range(1, articles + 1):
+        if n % 20 == 1: parts.append(u"{{{{level1}}}}CHAPTER {}{{{{-level1}}}}\n\n".format(n // 20 + 1))
+        parts.append(ARTICLE_TEMPLATE.format(n=n))
+    return u"".join(parts)
+
+def shuffled_levels_document(articles, seed=4):
+    """synthetic_levels_document with every {{levelN}}...{{-levelN}} pair renumbered at random (1-5)."""
+    rng = random.Random(seed); levels = []
+    def renumber(match):
+        if not match.group(1): levels.append(rng.randint(1, 5))
+        return u"{{{{{}level{}}}}}".format(match.group(1), levels[-1])
+    return re.sub(r"\{\{(-?)level\d+\}\}", renumber, synthetic_levels_document(articles))
+
+def replicated_sample(name, times):
+    """attached_assets/<name> repeated `times` times (blank line between copies)."""
+    with io.open(os.path.join(SAMPLE_DIR, name), encoding='utf-8') as handle:
+        text = handle.read()
+    return u"\n\n".join([text] * times)
+
+def best_of(func, repeat=3):
+    """Best wall time (seconds) of `repeat` calls."""
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+def print_scaling(title, rows):
+    """rows: (size, items, seconds). Prints time per item and items per second for each size."""
+    print(title)
+    print(u"  {:>10} {:>10} {:>10} {:>10} {:>12}".format(u"size", u"items", u"ms", u"us/item", u"items/s"))
+    for size, items, seconds in rows:
+        print(u"  {:>10} {:>10} {:>10.1f} {:>10.2f} {:>12.0f}".format(size, items, seconds * 1000, seconds * 1e6 / max(items, 1),
+                                                                    items / max(seconds, 1e-9)))
+
+# Limites das verificacoes de escala: na maior medida o us/item pode ser no maximo
+# MAX_US_PER_ITEM_GROWTH vezes o da menor, e 100k tags do LVL CORRECTION ficam abaixo
+# de LEVELS_100K_SECONDS (o laco quadratico original leva minutos).
+MAX_US_PER_ITEM_GROWTH = 3.0
+LEVELS_100K_TAGS = 100000
+LEVELS_100K_SECONDS = 10.0
+# As referencias originais sao quadraticas (tags x blocos, tags x tags): rodam num
+# documento sintetico deste tamanho.
+REFERENCE_ARTICLES = 500
+
+def check_linear(name, rows):
+    """SystemExit when us/item at the largest size exceeds MAX_US_PER_ITEM_GROWTH x the smallest."""
+    (_, first_items, first_seconds), (_, last_items, last_seconds) = rows[0], rows[-1]
+    growth = (last_seconds / max(last_items, 1)) / max(first_seconds / max(first_items, 1), 1e-12)
+    if growth > MAX_US_PER_ITEM_GROWTH:
+        raise SystemExit(u"{}: us/item grew {:.1f}x from the smallest to the largest size (limit {}x)".format(name, growth, MAX_US_PER_ITEM_GROWTH))
+
+def original_containing_blocks(all_level_tags_data, block_data_by_start):
+    """(is_inside, containing_block_start) per tag, by the tags x blocks scan of the original script."""
+    found = []
+    for level_data in all_level_tags_data:
+        is_inside = False; containing_block_start = None; match_start, match_end = level_data['start'], level_data['end']
+        for b_start, b_data in block_data_by_start.items():
+             if b_data['content_start'] <= match_start < match_end <= b_data['content_end']: is_inside = True; containing_block_start = b_start; break;
+        found.append((is_inside, containing_block_start))
+    return found
+
+def original_level_adjustments(all_level_tags_data):
+    """
+    The v4.10 loop of the original script (reference for 'levels'): every tag
+    inside a block rescans all the tags before it for the closest outer one.
+    """
+    adjustments_to_make = []
+    last_outer_tag_data = {'correct_level': -1, 'type': u'unknown', 'original_level': -1, 'identifier': u''}
+    internal_block_state = {}
+    calculated_correct_levels = {}
+    for i, current_level_data in enumerate(all_level_tags_data):
+        current_start = current_level_data['start']
+        current_original_level = current_level_data['original_level']
+        current_content_unicode = current_level_data['original_content_unicode']
+        current_type = current_level_data['type']
+        current_identifier = extract_identifier(current_content_unicode, current_type)
+        correct_level = current_original_level
+        final_content_unicode = current_content_unicode
+        content_cleaned = False
+        needs_update = False
+        if not current_level_data['is_inside']: # FORA
+            previous_correct_level = last_outer_tag_data['correct_level']
+            previous_type = last_outer_tag_data['type']
+            previous_original_level = last_outer_tag_data['original_level']
+            previous_identifier = last_outer_tag_data['identifier']
+            if previous_correct_level != -1 and previous_type != u'unknown' and current_type != u'unknown':
+                if current_type == previous_type and is_direct_sub_identifier(current_identifier, previous_identifier):
+                    correct_level = previous_correct_level + 1
+                elif current_original_level == previous_original_level + 1:
+                     correct_level = previous_correct_level + 1
+                elif previous_type in HIERARCHY and current_type in HIERARCHY.get(previous_type, {}):
+                     correct_level = previous_correct_level + 1
+                elif current_type == previous_type:
+                     correct_level = previous_correct_level
+                else:
+                     correct_level = current_original_level
+            else:
+                 correct_level = current_original_level
+            calculated_correct_levels[current_start] = correct_level
+            last_outer_tag_data = {'correct_level': correct_level, 'type': current_type, 'original_level': current_original_level, 'identifier': current_identifier}
+            needs_update = (correct_level != current_original_level)
+        else: # DENTRO
+             actual_block_start = current_level_data.get('containing_block_start')
+             if actual_block_start is not None:
+                 outer_corrected_level = None; closest_outer_tag_start = -1;
+                 for j in range(i):
+                     prev_data = all_level_tags_data[j]
+                     if not prev_data.get('is_inside', True) and prev_data['start'] in calculated_correct_levels \
+                       and prev_data['end'] <= actual_block_start:
+                          if prev_data['start'] > closest_outer_tag_start:
+                               closest_outer_tag_start = prev_data['start']; outer_corrected_level = calculated_correct_levels[prev_data['start']]
+                 if outer_corrected_level is not None:
+                     block_state = internal_block_state.get(actual_block_start)
+                     if block_state is None: correct_level = outer_corrected_level + 1
+                     else:
+                         prev_orig_internal = block_state['prev_orig']; prev_corr_internal = block_state['prev_corr'];
+                         difference = current_original_level - prev_orig_internal; correct_level = prev_corr_internal + difference;
+                     internal_block_state[actual_block_start] = {'prev_orig': current_original_level, 'prev_corr': correct_level}
+                     final_content_unicode = current_content_unicode; content_cleaned = False;
+                     match_cleanup = MARKER_CLEANUP_PATTERN_U.match(current_content_unicode);
+                     if match_cleanup:
+                         if match_cleanup.group(1) is not None: final_content_unicode = u"{} {}".format(match_cleanup.group(1), (match_cleanup.group(2) or u"").strip()); content_cleaned = True;
+                         elif match_cleanup.group(3): final_content_unicode = match_cleanup.group(3);
+                     needs_update = (correct_level != current_original_level) or content_cleaned;
+                 else: needs_update = False; correct_level = current_original_level;
+             else: needs_update = False; correct_level = current_original_level;
+             calculated_correct_levels[current_start] = correct_level;
+        if needs_update:
+            adjustments_to_make.append({'start': current_start, 'end': current_level_data['end'],'correct_level': correct_level,'final_content_unicode': final_content_unicode,'orig_level': current_original_level,'cleaned': content_cleaned})
+    return adjustments_to_make
+
+def reference_levels_documents():
+    """(name, text) of the documents the original loops are checked on."""
+    return [(u"synthetic x{}".format(REFERENCE_ARTICLES), synthetic_levels_document(REFERENCE_ARTICLES)),
+            (u"shuffled synthetic x{}".format(REFERENCE_ARTICLES), shuffled_levels_document(REFERENCE_ARTICLES)),
+            (u"parsed.txt", replicated_sample('parsed.txt', 1))]
+
+def bench_containment(sizes):
+    """Tag -> {{text_level}} block assignment (find_level_tags) on growing documents."""
+    for name, text in reference_levels_documents():
+        tags, blocks = find_level_tags(text)
+        if [(tag['is_inside'], tag['containing_block_start']) for tag in tags] != original_containing_blocks(tags, blocks):
+            raise SystemExit(u"containment: blocks assigned differently from the original scan on {}".format(name))
+    print(u"containment: synthetic, shuffled and parsed.txt tags get the original blocks")
+    rows = []
+    for articles in sizes:
+        text = synthetic_levels_document(articles)
+        tokens = tokenize(text)
+        tags, blocks = find_level_tags(text, tokens)
+        rows.append((articles, len(tags) + len(blocks), best_of(lambda: find_level_tags(text, tokens))))
+    print_scaling(u"find_level_tags (tags + blocks)", rows)
+    check_linear(u"containment", rows)
+
+def bench_levels(sizes):
+    """perform_level_adjustment_v4_10 alone; 33000 articles ~ 100k {{levelN}} tags."""
+    compared_keys = ('start', 'end', 'correct_level', 'final_content_unicode', 'orig_level', 'cleaned')
+    for name, text in reference_levels_documents():
+        tags, blocks = find_level_tags(text)
+        expected = [tuple(adj[key] for key in compared_keys) for adj in original_level_adjustments(tags)]
+        if [tuple(adj[key] for key in compared_keys) for adj in perform_level_adjustment_v4_10(tags, blocks)] != expected:
+            raise SystemExit(u"levels: adjustments differ from the original loop on {}".format(name))
+    print(u"levels: synthetic, shuffled and parsed.txt get the original adjustments")
+    rows = []
+    for articles in sizes:
+        text = synthetic_levels_document(articles)
+        tags, blocks = find_level_tags(text)
+        rows.append((articles, len(tags), best_of(lambda: perform_level_adjustment_v4_10(tags, blocks), repeat=1)))
+    print_scaling(u"perform_level_adjustment_v4_10 (tags)", rows)
+    for articles, tag_count, seconds in rows:
+        if tag_count >= LEVELS_100K_TAGS and seconds > LEVELS_100K_SECONDS:
+            raise SystemExit(u"levels: {} tags took {:.1f} s (limit {} s)".format(tag_count, seconds, LEVELS_100K_SECONDS))
+    check_linear(u"levels", rows)
+
+def bench_aligner(sizes):
+    """Text Aligner on original.txt replicated N times: merge passes alone, then the full stage."""
+    merge_rows = []; full_rows = []
+    for times in sizes:
+        text = replicated_sample('original.txt', times)
+        raw_lines = text.splitlines()
+        def merge_passes():
+            data = identify_lines(raw_lines)
+            merge_markers(data); merge_descriptions(data)
+        merge_rows.append((times, len(raw_lines), best_of(merge_passes)))
+        full_rows.append((times, len(raw_lines), best_of(lambda: align_text(text))))
+    print_scaling(u"identify_lines + merge_markers + merge_descriptions (lines)", merge_rows)
+    print_scaling(u"align_text (lines)", full_rows)
+
+def sequential_line_shape(stripped):
+    """The V6 chain of six regex tests that RE_LINE_SHAPE replaces (reference for 'classify')."""
+    if RE_ENUM_MARKER.match(stripped): return LT_ENUM_MARKER
+    if RE_NUMBERED_PARA_HEAD_MARKER.match(stripped): return LT_NUMBERED_PARA_HEAD
+    if RE_NUM_MARKER.match(stripped): return LT_NUM_MARKER
+    if RE_FOOTNOTE_BLOCK.match(stripped): return LT_FOOTNOTE_BLOCK
+    if RE_ENUM_ITEM.match(stripped): return LT_ENUM_ITEM
+    if RE_NUMBERED_ITEM.match(stripped): return LT_NUMBERED_ITEM
+    return None
+
+def scanned_line_shape(stripped):
+    match = RE_LINE_SHAPE.match(stripped)
+    return LINE_SHAPE_TYPES[match.lastgroup] if match else None
+
+def line_shape_mismatches(lines):
+    """Lines where the combined scanners disagree with the sequential regexes (shape or split groups)."""
+    mismatches = []
+    for line in lines:
+        stripped = line.strip()
+        split_match = RE_SPLIT_NUMBER_ENUM.match(stripped); scan_match = RE_LINE_SCAN.match(stripped)
+        expected_split = split_match.groups() if split_match else None
+        found_split = scan_match.group('split_number', 'split_enum', 'split_content') if scan_match and scan_match.lastgroup == 'split' else None
+        if sequential_line_shape(stripped) != scanned_line_shape(stripped) or expected_split != found_split:
+            mismatches.append(line)
+    return mismatches
+
+# =======================================================
+# identify_line_type() do Text Aligner original (V6), referencia de ouro
+# para 'classify': palavras-chave da base, busca linear nas palavras-chave
+# e cadeia de regexes. As regexes e frases de aligner.py sao as da V6.
+# =======================================================
+ORIGINAL_HEADING_KEYWORDS_UPPER_CANONICAL = [
+    u"PART", u"BOOK", u"ANNEX", u"APPENDIX", u"SCHEDULE", u"PREAMBLE", u"CHAPTER", u"DIVISION", u"SUBPART",
+    u"PARTE", u"LIBRO", u"ANEXO", u"APÉNDICE", u"PREÁMBULO", u"CAPÍTULO", u"DIVISIÓN", u"SUBPARTE",
+    u"PARTE", u"LIVRO", u"ANEXO", u"APÊNDICE", u"PREÂMBULO", u"CAPÍTULO", u"DIVISÃO", u"SUBPARTE",
+    u"PARTIE", u"LIVRE", u"ANNEXE", u"APPENDICE", u"PRÉAMBULE", u"CHAPITRE", u"DIVISION", u"SOUS-PARTIE",
+    u"TEIL", u"BUCH", u"ANHANG", u"ANLAGE", u"KAPITEL", u"UNTERTEIL",
+]
+ORIGINAL_HEADING_KEYWORDS_TITLE_CANONICAL = [
+    u"Title", u"Section", u"Subsection", u"Article", u"Clause", u"Regulation", u"Rule", u"Order", u"Paragraph",
+    u"Título", u"Sección", u"Subsección", u"Artículo", u"Cláusula", u"Reglamento", u"Regla", u"Orden", u"Párrafo", u"Apartado",
+    u"Título", u"Secção", u"Seção", u"Subsecção", u"Subseção", u"Artigo", u"Cláusula", u"Regulamento", u"Regra", u"Ordem", u"Parágrafo", u"Art.",
+    u"Titre", u"Section", u"Sous-section", u"Article", u"Clause", u"Règlement", u"Règle", u"Ordonnance", u"Paragraphe",
+    u"Titel", u"Abschnitt", u"Unterabschnitt", u"Artikel", u"Klausel", u"Regelung", u"Verordnung", u"Regel", u"Anordnung", u"Paragraph", u"Absatz"
+]
+ORIGINAL_EXTRA_KEYWORDS_EITHER_CASE = [
+    u"SECTION", u"ARTICLE", u"TITLE", u"TÍTULO", u"SECCIÓN", u"SECÇÃO", u"ARTÍCULO", u"ARTIGO",
+    u"Chapter", u"Division"
+]
+ORIGINAL_DETECT_KEYWORDS_UPPER = set(k.lower() for k in ORIGINAL_HEADING_KEYWORDS_UPPER_CANONICAL + ORIGINAL_EXTRA_KEYWORDS_EITHER_CASE)
+ORIGINAL_DETECT_KEYWORDS_TITLE = set(k.lower() for k in ORIGINAL_HEADING_KEYWORDS_TITLE_CANONICAL + ORIGINAL_EXTRA_KEYWORDS_EITHER_CASE)
+ORIGINAL_ALL_DETECT_KEYWORDS = ORIGINAL_DETECT_KEYWORDS_UPPER.union(ORIGINAL_DETECT_KEYWORDS_TITLE)
+
+def original_identify_line_type(line, previous_line_type=None):
+    """The V6 function as shipped, returning type names (reference for 'classify')."""
+    stripped = line.strip(); lower_stripped = stripped.lower()
+    if not stripped: return u"BLANK"
+    if lower_stripped == u"preamble": return u"PREAMBLE_HEAD"
+    for phrase in PREAMBLE_INTRO_PHRASES:
+        if stripped == phrase: return u"PREAMBLE_INTRO"
+    if lower_stripped in DETECT_TRANSITIONAL_PHRASES_LOWER: return u"TRANSITIONAL"
+    is_preamble_context = previous_line_type in [u"PREAMBLE_HEAD", u"PREAMBLE_INTRO", u"PREAMBLE_CLAUSE"]
+    if is_preamble_context:
+        for word in PREAMBLE_CLAUSE_STARTERS:
+            if stripped.startswith(word + u" ") and not RE_ENUM_ITEM.match(stripped) and not RE_NUMBERED_ITEM.match(stripped) :
+                 first_word_lower_check = stripped.split(None, 1)[0].lower()
+                 if first_word_lower_check not in ORIGINAL_ALL_DETECT_KEYWORDS: return u"PREAMBLE_CLAUSE"
+    parts = stripped.split(None, 1); first_word_lower = parts[0].lower() if parts else ""
+    heading_type = None; longest_keyword_match = 0
+    if first_word_lower in ORIGINAL_ALL_DETECT_KEYWORDS:
+        best_kw_lower = ""
+        for kw_lower in ORIGINAL_ALL_DETECT_KEYWORDS:
+            if lower_stripped.startswith(kw_lower):
+                kw_len = len(kw_lower)
+                if len(stripped) == kw_len or stripped[kw_len:kw_len+1].isspace() or stripped[kw_len:kw_len+1] == u'-':
+                     if kw_len > longest_keyword_match:
+                         longest_keyword_match = kw_len
+                         best_kw_lower = kw_lower
+        if best_kw_lower:
+             if best_kw_lower in ORIGINAL_DETECT_KEYWORDS_UPPER: heading_type = u"HEADING_UPPER"
+             elif best_kw_lower in ORIGINAL_DETECT_KEYWORDS_TITLE: heading_type = u"HEADING_TITLE"
+             else: heading_type = u"HEADING_TITLE"
+    if heading_type:
+        looks_like_item = RE_ENUM_ITEM.match(stripped) or RE_NUMBERED_ITEM.match(stripped)
+        is_short_keyword = longest_keyword_match <= 2
+        if looks_like_item and is_short_keyword: heading_type = None
+        elif first_word_lower in AMBIGUOUS_TITLE_KEYWORDS:
+            if not (RE_HEADING_ONLY_KEY_ID.match(stripped) or stripped.lower() == first_word_lower):
+                heading_type = None
+    if heading_type: return heading_type
+    if RE_ENUM_MARKER.match(stripped): return u"ENUM_MARKER"
+    if RE_NUMBERED_PARA_HEAD_MARKER.match(stripped): return u"NUMBERED_PARA_HEAD"
+    if RE_NUM_MARKER.match(stripped): return u"NUM_MARKER"
+    if RE_FOOTNOTE_BLOCK.match(stripped): return u"FOOTNOTE_BLOCK"
+    if RE_ENUM_ITEM.match(stripped): return u"ENUM_ITEM"
+    if RE_NUMBERED_ITEM.match(stripped): return u"NUMBERED_ITEM"
+    if stripped.endswith(u':'): return u"ENDS_COLON"
+    if is_preamble_context:
+         potential_marker = stripped.split(None,1)[0] + '.' if stripped else ''
+         if not RE_NUMBERED_PARA_HEAD_MARKER.match(potential_marker): return u"PREAMBLE_CLAUSE"
+    return u"REGULAR"
+
+def classified_lines(lines, classify, split_type):
+    """Pass 1 of the original main(): the type of every classified line, threading the previous type."""
+    types = []; last_line_type_identified = None
+    for line in lines:
+        if is_pure_number(line): continue
+        stripped_line = line.strip()
+        if not stripped_line: continue
+        if RE_SPLIT_NUMBER_ENUM.match(stripped_line):
+            last_line_type_identified = split_type
+            continue
+        last_line_type_identified = classify(line, last_line_type_identified)
+        types.append((line, last_line_type_identified))
+    return types
+
+def line_type_mismatches(lines):
+    """Lines where identify_line_type disagrees with the original function."""
+    expected = classified_lines(lines, original_identify_line_type, u"ENUM_ITEM")
+    found = classified_lines(lines, identify_line_type, LT_ENUM_ITEM)
+    return [line for (line, name), (_, code) in zip(expected, found) if LINE_TYPE_NAMES[code] != name]
+
+def bench_classify(sizes):
+    """Line classification: the original identify_line_type and regex chain vs the rewrite (original.txt x N)."""
+    for name in ('original.txt', 'parsed.txt'):
+        lines = replicated_sample(name, 1).splitlines()
+        mismatches = line_shape_mismatches(lines)
+        if mismatches:
+            raise SystemExit(u"classify: {} lines of {} classified differently, e.g. {!r}".format(len(mismatches), name, mismatches[0]))
+        mismatches = line_type_mismatches(lines)
+        if mismatches:
+            raise SystemExit(u"classify: {} lines of {} get another type than in the original, e.g. {!r}".format(len(mismatches), name, mismatches[0]))
+    print(u"classify: original.txt and parsed.txt get the original line types and shapes")
+    original_rows = []; rewritten_rows = []; sequential_rows = []; scanner_rows = []
+    for times in sizes:
+        lines = replicated_sample('original.txt', times).splitlines()
+        stripped_lines = [line.strip() for line in lines]
+        original_rows.append((times, len(lines), best_of(lambda: classified_lines(lines, original_identify_line_type, u"ENUM_ITEM"))))
+        rewritten_rows.append((times, len(lines), best_of(lambda: classified_lines(lines, identify_line_type, LT_ENUM_ITEM))))
+        sequential_rows.append((times, len(stripped_lines), best_of(lambda: [sequential_line_shape(line) for line in stripped_lines])))
+        scanner_rows.append((times, len(stripped_lines), best_of(lambda: [scanned_line_shape(line) for line in stripped_lines])))
+    print_scaling(u"original identify_line_type (lines)", original_rows)
+    print_scaling(u"identify_line_type (lines)", rewritten_rows)
+    print_scaling(u"sequential regex chain (lines)", sequential_rows)
+    print_scaling(u"RE_LINE_SHAPE scanner (lines)", scanner_rows)
+
+def traced_peak(func):
+    """(result, peak bytes allocated while running func) - needs tracemalloc."""
+    tracemalloc.start()
+    try:
+        result = func()
+        return result, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def legacy_dict_records(records):
+    """The 7-key dicts the original script kept per line (same text objects)."""
+    return [{'text': r.text, 'type': LINE_TYPE_NAMES[r.type], 'original_index': r.original_index,
+             'merged_into_prev': r.merged_into_prev, 'consumes_next': r.consumes_next,
+             'is_heading': r.is_heading, 'was_split': r.was_split} for r in records]
+
+def slotted_records(records):
+    result = []
+    for r in records:
+        record = LineRecord(r.text, r.type, r.original_index, r.is_heading, r.was_split)
+        record.merged_into_prev = r.merged_into_prev; record.consumes_next = r.consumes_next
+        result.append(record)
+    return result
+
+def bench_records(sizes):
+    """Peak memory of processed_lines_data: 7-key dicts vs LineRecord (original.txt x N, bytes per million lines)."""
+    if tracemalloc is None:
+        print(u"records: tracemalloc is not available on this Python (needs 3.4+); skipped")
+        return
+    print(u"processed_lines_data peak memory (text objects shared, so only the record overhead counts)")
+    print(u"  {:>10} {:>10} {:>14} {:>14} {:>14}".format(u"size", u"records", u"dict MB/1M", u"slots MB/1M", u"Pass 1 MB/1M"))
+    for times in sizes:
+        raw_lines = replicated_sample('original.txt', times).splitlines()
+        records, pass1_peak = traced_peak(lambda: identify_lines(raw_lines))
+        per_million = 1e6 / max(len(records), 1) / (1024.0 * 1024.0)
+        _, dict_peak = traced_peak(lambda: legacy_dict_records(records))
+        _, slots_peak = traced_peak(lambda: slotted_records(records))
+        print(u"  {:>10} {:>10} {:>14.1f} {:>14.1f} {:>14.1f}".format(times, len(records), dict_peak * per_million,
+                                                                   slots_peak * per_million, pass1_peak * per_million))
+
+class NullSink(object):
+    """Binary handle that only counts what is written."""
+    def __init__(self): self.size = 0
+    def write(self, data): self.size += len(data)
+
+def bench_stream(sizes):
+    """Peak memory: align_text on the whole file vs the streaming pipeline (original.txt x N on disk)."""
+    if tracemalloc is None:
+        print(u"stream: tracemalloc is not available on this Python (needs 3.4+); skipped")
+        return
+    print(u"Text Aligner peak memory, file read -> aligned -> written")
+    print(u"  {:>10} {:>10} {:>14} {:>14}".format(u"size", u"input MB", u"align_text MB", u"stream MB"))
+    temp_dir = tempfile.mkdtemp(prefix='dpa_bench_')
+    try:
+        for times in sizes:
+            path = os.path.join(temp_dir, 'replicated.txt')
+            with io.open(path, 'wb') as handle:
+                handle.write(replicated_sample('original.txt', times).encode('utf-8'))
+            def whole():
+                with io.open(path, 'rb') as handle: text = handle.read().decode('utf-8')
+                NullSink().write(align_text(text).text.encode('utf-8'))
+            _, whole_peak = traced_peak(whole)
+            _, stream_peak = traced_peak(lambda: write_lines(NullSink(), iter_aligned_lines(iter_file_lines(path))))
+            megabyte = 1024.0 * 1024.0
+            print(u"  {:>10} {:>10.1f} {:>14.1f} {:>14.2f}".format(times, os.path.getsize(path) / megabyte,
+                                                                 whole_peak / megabyte, stream_peak / megabyte))
+    finally:
+        shutil.rmtree(temp_dir)
+
+# As cinco passagens do FIX SEPARATION original (referencia de ouro para 'separate'),
+# sobre os bytes UTF-8, como o script rodava no PythonScript (Python 2).
+ORIGINAL_SEPARATION_PASSES = [
+    (re.compile(br'(\{\{level\d+\}\})(\s*\n\s*)(?=\S)'), br'\1'),
+    (re.compile(br'(\S)(\s*\n\s*)(\{\{-level\d+\}\})'), br'\1\3'),
+    (re.compile(br'(\{\{\s*\(?\s*[a-zA-Z0-9ivxlcdmIVXLCDM\.]+\s*\)?\s*\}\})(\s*\n\s*)(?=\S)'), br'\1 '),
+    (re.compile(br'(?<!\n)(\{\{[^{}]+\}\})'), br'\n\1'),
+    (re.compile(br'(\{\{[^{}]+\}\})(?!\n)'), br'\1\n'),
+]
+
+def original_join_then_force_separate(text):
+    """format_join_then_force_separate_final() of the original script: the passes, then the non-empty lines joined by a blank line."""
+    data = text.encode('utf-8')
+    for pattern, replacement in ORIGINAL_SEPARATION_PASSES: data = pattern.sub(replacement, data)
+    return b"\n\n".join(line for line in data.splitlines() if line != b'').decode('utf-8')
+
+def bench_separate(sizes):
+    """FIX SEPARATION: the five-rewrite version vs the one-pass walk (parsed.txt x N)."""
+    for name in ('parsed.txt', 'original.txt'):
+        text = replicated_sample(name, 1)
+        expected = original_join_then_force_separate(text)
+        if join_then_force_separate_phased(text).text != expected:
+            raise SystemExit(u"separate: phased output differs from the original script on {}".format(name))
+        if join_then_force_separate(text).text != expected:
+            raise SystemExit(u"separate: one-pass output differs from the original script on {}".format(name))
+    print(u"separate: parsed.txt and original.txt give the original script's output in both versions")
+    phased_rows = []; fused_rows = []
+    for times in sizes:
+        text = replicated_sample('parsed.txt', times)
+        lines = text.count(u"\n") + 1
+        phased_rows.append((times, lines, best_of(lambda: join_then_force_separate_phased(text))))
+        fused_rows.append((times, lines, best_of(lambda: join_then_force_separate(text))))
+    print_scaling(u"join_then_force_separate_phased (input lines)", phased_rows)
+    print_scaling(u"join_then_force_separate, one pass (input lines)", fused_rows)
+
+def bench_parallel(sizes):
+    """Text Aligner: sequential vs split at top-level headings over a process pool (original.txt x N)."""
+    processes = multiprocessing.cpu_count()
+    print(u"parallel: {} worker process(es)".format(processes))
+    sequential_rows = []; parallel_rows = []
+    for times in sizes:
+        text = replicated_sample('original.txt', times)
+        sequential = align_text(text); split = align_text_parallel(text, processes)
+        if (split.text, split.changes, split.info) != (sequential.text, sequential.changes, sequential.info):
+            raise SystemExit(u"parallel: output differs from the sequential run at x{}".format(times))
+        lines = text.count(u"\n") + 1
+        print(u"x{}: identical output, {} chunk(s)".format(times, len(find_cuts(text.splitlines(), processes * CHUNKS_PER_PROCESS))))
+        sequential_rows.append((times, lines, best_of(lambda: align_text(text))))
+        parallel_rows.append((times, lines, best_of(lambda: align_text_parallel(text, processes))))
+    print_scaling(u"align_text (input lines)", sequential_rows)
+    print_scaling(u"align_text_parallel (input lines)", parallel_rows)
+    check_spawned_workers()
+
+def check_spawned_workers():
+    """Workers started by "spawn" (the Windows default) must see the packs registered here."""
+    if not hasattr(multiprocessing, 'get_start_method'):
+        print(u"parallel: the spawn start method needs Python 3.4+; spawn check skipped")
+        return
+    text = u"\n".join(u"CAPITOLO {}\n{}".format(copy, replicated_sample('parsed.txt', 1)) for copy in range(1, 9))
+    start_method = multiprocessing.get_start_method(allow_none=True)
+    register_language_pack('it', {'heading_upper': [u"CAPITOLO"]})
+    try:
+        multiprocessing.set_start_method('spawn', force=True)
+        split = align_text_parallel(text, 4, min_chunk_lines=50); sequential = align_text(text)
+    finally:
+        multiprocessing.set_start_method(start_method, force=True)
+        register_language_pack('it', {}) # pack vazio: as proximas medicoes usam o vocabulario de antes
+    if (split.text, split.changes, split.info) != (sequential.text, sequential.changes, sequential.info):
+        raise SystemExit(u"parallel: spawned workers ignore a registered language pack")
+    print(u"parallel: spawned workers give identical output with a registered 'it' pack")
+
+def distinct_copies(name, times):
+    """Like replicated_sample, but every non-blank line carries its copy number (no repeated sections)."""
+    with io.open(os.path.join(SAMPLE_DIR, name), encoding='utf-8') as handle:
+        lines = handle.read().splitlines()
+    return u"\n".join(line + u" {}".format(copy) if line.strip() else line
+                      for copy in range(1, times + 1) for line in lines)
+
+def bench_cache(sizes):
+    """Text Aligner with the section cache: empty cache, unchanged rerun, rerun after one edit."""
+    print(u"Text Aligner with SectionCache (original.txt x N, distinct copies)")
+    print(u"  {:>10} {:>10} {:>12} {:>12} {:>12} {:>12} {:>10}".format(
+        u"size", u"lines", u"no cache ms", u"cold ms", u"warm ms", u"1 edit ms", u"hit rate"))
+    for times in sizes:
+        text = distinct_copies('original.txt', times)
+        lines = text.splitlines()
+        lines[len(lines) // 2] += u" (edited)"
+        edited = u"\n".join(lines)
+        temp_dir = tempfile.mkdtemp(prefix='dpa_bench_')
+        try:
+            expected = align_text(edited).text
+            plain = best_of(lambda: align_text(text), repeat=1)
+            cold = best_of(lambda: cached_align_text(text, SectionCache(temp_dir)), repeat=1)
+            warm = best_of(lambda: cached_align_text(text, SectionCache(temp_dir)))
+            cache = SectionCache(temp_dir)
+            started = timeit.default_timer()
+            if cached_align_text(edited, cache).text != expected:
+                raise SystemExit(u"cache: output differs from align_text at x{}".format(times))
+            one_edit = timeit.default_timer() - started
+        finally:
+            shutil.rmtree(temp_dir)
+        print(u"  {:>10} {:>10} {:>12.1f} {:>12.1f} {:>12.1f} {:>12.1f} {:>9.1f}%".format(
+            times, len(lines), plain * 1000, cold * 1000, warm * 1000, one_edit * 1000, cache.hit_rate() * 100))
+
+def bench_live(sizes):
+    """Text Aligner live: one edited line realigned in its section vs the whole document (aligned original.txt x N)."""
+    print(u"One line edited in the middle of an aligned document")
+    print(u"  {:>10} {:>10} {:>14} {:>14} {:>14}".format(u"size", u"lines", u"region lines", u"region ms", u"align_text ms"))
+    for times in sizes:
+        lines = align_text(replicated_sample('original.txt', times)).text.split(u"\n")
+        middle = len(lines) // 2
+        lines[middle:middle] = [u"(a)", u"inserted text"]
+        dirty = DirtyLines(); dirty.mark(middle - 1, 2)
+        def realign(): return realign_region(lines.__getitem__, len(lines), dirty.first, dirty.last)
+        start, end, replacement, _ = realign()
+        if u"\n".join(lines[:start] + [replacement + u"\n".join(lines[end:])]) != align_text(u"\n".join(lines)).text:
+            raise SystemExit(u"live: region realignment differs from align_text at x{}".format(times))
+        region_ms = best_of(realign) * 1000
+        whole_ms = best_of(lambda: align_text(u"\n".join(lines))) * 1000
+        print(u"  {:>10} {:>10} {:>14} {:>14.2f} {:>14.1f}".format(times, len(lines), end - start, region_ms, whole_ms))
+
+# O padrao do Break-LevelX original (referencia para 'pairing'): sem o fechamento
+# de mesmo numero, cada {{levelN}} faz o .*? varrer ate o fim do documento.
+BREAKLINE_LEVEL_PATTERN = re.compile(r"(\{\{level(\d+)\}\})(.*?)(\{\{-level\2\}\})", re.DOTALL)
+
+def unclosed_levels_document(opens):
+    """Raw parser output gone wrong: `opens` {{level3}} never closed (a stray {{-level4}} every 10), then one good block."""
+    parts = []
+    for n in range(1, opens + 1):
+        parts.append(u"{{{{level3}}}}({}) item text without its closing tag\n".format(n))
+        if n % 10 == 0: parts.append(u"{{-level4}}\n")
+    parts.append(u"{{level2}}Article 1\nspread over two lines{{-level2}}\n")
+    return u"".join(parts)
+
+def bench_pairing(sizes):
+    """Multi-line BreakLine pairing with missing closes: the back-referencing regex vs pair_same_number."""
+    for text in (replicated_sample('parsed.txt', 1), unclosed_levels_document(min(sizes))):
+        expected = [match.span() for match in BREAKLINE_LEVEL_PATTERN.finditer(text)]
+        found = [(open_token.start, close_token.end) for open_token, close_token in pair_same_number(tokenize(text), LEVEL_OPEN, LEVEL_CLOSE)]
+        if found != expected:
+            raise SystemExit(u"pairing: pair_same_number differs from the Break-LevelX regex")
+    print(u"pairing: parsed.txt and the unclosed document paired identically by both")
+    regex_rows = []; pair_rows = []; stage_rows = []
+    for opens in sizes:
+        text = unclosed_levels_document(opens)
+        tokens = tokenize(text)
+        regex_rows.append((opens, opens, best_of(lambda: list(BREAKLINE_LEVEL_PATTERN.finditer(text)), repeat=1)))
+        pair_rows.append((opens, opens, best_of(lambda: pair_same_number(tokens, LEVEL_OPEN, LEVEL_CLOSE))))
+        stage_rows.append((opens, opens, best_of(lambda: insert_breakline_markers(text))))
+    print_scaling(u"Break-LevelX regex (unclosed {{levelN}})", regex_rows)
+    print_scaling(u"pair_same_number (unclosed {{levelN}})", pair_rows)
+    print_scaling(u"insert_breakline_markers, tokenize included (unclosed {{levelN}})", stage_rows)
+
+BENCHMARKS = {
+    'aligner': (bench_aligner, (1, 10, 100)),
+    'cache': (bench_cache, (1, 10, 50)),
+    'classify': (bench_classify, (1, 10)),
+    'containment': (bench_containment, (1000, 2000, 4000, 8000, 16000)),
+    'levels': (bench_levels, (2000, 8000, 33000)),
+    'live': (bench_live, (1, 3, 10)),
+    'pairing': (bench_pairing, (500, 1000, 2000, 4000)),
+    'parallel': (bench_parallel, (10, 100, 400)),
+    'records': (bench_records, (10, 100)),
+    'separate': (bench_separate, (1, 10, 100)),
+    'stream': (bench_stream, (1, 10, 100)),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m dpa_parsing.bench', description='Scaling benchmarks for the dpa_parsing engine.')
+    parser.add_argument('names', nargs='*', metavar='NAME', help='benchmarks to run: {} (default: all)'.format(', '.join(sorted(BENCHMARKS))))
+    parser.add_argument('--sizes', help='comma-separated sizes overriding the defaults')
+    args = parser.parse_args(argv)
+    for name in args.names or sorted(BENCHMARKS):
+        if name not in BENCHMARKS: parser.error('unknown benchmark: {}'.format(name))
+        func, default_sizes = BENCHMARKS[name]
+        sizes = [int(size) for size in args.sizes.split(',')] if args.sizes else default_sizes
+        func(sizes)
+    return 0
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(main())
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# DESFAZER NIVEIS MULTI-LINHA - motor (logica v1.4)
+# =============================================================================
+# Remove {{levelX}}/{{-levelX}} quando o conteudo tem quebras de linha,
+# inserindo o marcador "BreakLine" antes do conteudo liberado.
+# =============================================================================
+from __future__ import unicode_literals
+
+from .common import LineIndex, StageResult
+from .editplan import EditPlan
+from .lexer import LEVEL_CLOSE, LEVEL_OPEN, pair_same_number, tokenize
+
+BREAKLINE_MARKER = u"BreakLine"
+
+
+def insert_breakline_markers(text_unicode, tokens=None):
+    """
+    Pairs {{levelN}}...{{-levelN}} (same N, like the old back-referencing regex)
+    from the lexer tokens. Returns a StageResult; info['breaks'] lists
+    {'line', 'level'} per removed block.
+    """
+    if tokens is None: tokens = tokenize(text_unicode)
+    plan, breaks = breakline_plan(text_unicode, tokens)
+    lines = LineIndex(text_unicode)
+    for item in breaks: item['line'] = lines.line_of(item['start'])
+    return StageResult(plan.apply(text_unicode), len(plan), {'breaks': breaks})
+
+def breakline_plan(text_unicode, tokens):
+    """
+    Returns (EditPlan, breaks): each multi-line {{levelN}}...{{-levelN}} becomes
+    "BreakLine\n" + content (stripado no fim) + "\n" (newline garantido);
+    single-line blocks are left untouched. breaks lists {'start', 'level'}.
+    """
+    plan = EditPlan(); breaks = []
+    for open_token, close_token in pair_same_number(tokens, LEVEL_OPEN, LEVEL_CLOSE):
+        content = text_unicode[open_token.end:close_token.start]
+        if u'\n' in content:
+            plan.replace(open_token.start, close_token.end, BREAKLINE_MARKER + u"\n" + content.rstrip() + u"\n")
+            breaks.append({'start': open_token.start, 'level': open_token.value})
+    return plan, breaks
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+# =======================================================
+# BYTEDOC - documento em bytes, offsets byte <-> caractere
+# =======================================================
+# editor.getText() devolve os bytes do Scintilla (UTF-8 na
+# pagina de codigo 65001). LVL CORRECTION e FIX FOOTNOTE
+# decodificavam o documento inteiro para varrer as tags e,
+# na escrita, recodificavam o prefixo ate a primeira edicao
+# para achar a posicao em bytes. Um ByteDocument:
+#   - varre os bytes uma vez (lexer.tokenize_bytes, o
+#     TAG_PATTERN em versao bytes);
+#   - guarda um OffsetMap byte <-> caractere, exato no
+#     inicio e no fim de cada tag; entre duas tags o offset
+#     e contado so nos bytes daquele trecho;
+#   - so decodifica o que for fatiado (doc[inicio:fim] em
+#     caracteres): conteudo de uma tag, numero de uma nota.
+# Os estagios recebem o ByteDocument no lugar do texto com
+# tokens=doc.tokens (e line_index() para os relatorios);
+# EditPlan escreve no editor direto em bytes. No cli --mmap
+# os bytes sao o arquivo mapeado e a lista guarda so as tags
+# que o estagio le (kinds).
+# =======================================================
+from __future__ import unicode_literals
+
+import codecs
+import re
+import sys
+from bisect import bisect_right
+
+from .common import text_type
+from .lexer import tokenize_bytes
+
+UTF8_CONTINUATION_BYTES = bytes(bytearray(range(0x80, 0xC0)))
+# Build "estreito" (Python 2 no Windows): fora do BMP um caractere conta 2 no unicode
+NARROW_BUILD = sys.maxunicode < 0x10FFFF
+NOT_UTF8_4_BYTE_LEADS = bytes(bytearray(b for b in range(256) if not 0xF0 <= b <= 0xF4))
+NEWLINE_PATTERN_B = re.compile(b"\n")
+utf_8_decode = codecs.utf_8_decode # direto: bytes.decode('utf-8') procura o codec a cada chamada (Python 2)
+
+
+def utf8_char_count(data):
+    """len() of the unicode the UTF-8 bytes `data` decode to, without decoding them."""
+    count = len(data.translate(None, UTF8_CONTINUATION_BYTES))
+    if NARROW_BUILD: count += len(data.translate(None, NOT_UTF8_4_BYTE_LEADS))
+    return count
+
+
+class OffsetMap(object):
+    """
+    Byte <-> character offsets of one encoded document. Checkpoints (the
+    ends of every token) are exact: byte_at_char answers them directly;
+    any other offset is counted from the nearest checkpoint before it, so
+    its cost is the gap to that checkpoint. Single-byte encodings map 1:1.
+    """
+
+    def __init__(self, data, encoding='utf-8'):
+        self.data = data
+        is_ascii = getattr(data, 'isascii', None) # bytes no Python 3.7+
+        self.variable = codecs.lookup(encoding).name == 'utf-8' and not (is_ascii and is_ascii())
+        self.byte_at_char = {0: 0}
+        self._tokens = ()
+        self._points = None # (byte_points, char_points) para o bisect, montados na primeira consulta
+
+    def add_tokens(self, tokens):
+        """Makes the start and end of every token (in document order) a checkpoint."""
+        byte_at_char = self.byte_at_char
+        for token in tokens:
+            byte_at_char[token.start] = token.byte_start; byte_at_char[token.end] = token.byte_end
+        self._tokens = tokens; self._points = None
+
+    def points(self):
+        if self._points is None:
+            byte_points = [0]; char_points = [0]
+            for token in self._tokens:
+                byte_points.append(token.byte_start); byte_points.append(token.byte_end)
+                char_points.append(token.start); char_points.append(token.end)
+            self._points = byte_points, char_points
+        return self._points
+
+    def char_count(self, byte_start, byte_end):
+        """Characters in data[byte_start:byte_end] (a span starting on a character)."""
+        if not self.variable: return byte_end - byte_start
+        return utf8_char_count(self.data[byte_start:byte_end])
+
+    def to_char(self, byte_offset):
+        if not self.variable: return byte_offset
+        byte_points, char_points = self.points()
+        i = bisect_right(byte_points, byte_offset) - 1
+        return char_points[i] + self.char_count(byte_points[i], byte_offset)
+
+    def to_byte(self, char_offset):
+        if not self.variable: return char_offset
+        byte_offset = self.byte_at_char.get(char_offset)
+        if byte_offset is not None: return byte_offset
+        byte_points, char_points = self.points()
+        i = bisect_right(char_points, char_offset) - 1
+        byte_offset = byte_points[i]; wanted = char_offset - char_points[i]
+        if wanted:
+            # No maximo 4 bytes por caractere; um caractere cortado no fim da janela fica de fora
+            window = codecs.utf_8_decode(self.data[byte_offset:byte_offset + 4 * wanted], 'strict', False)[0]
+            byte_offset += len(window[:wanted].encode('utf-8'))
+        return byte_offset
+
+
+class ByteDocument(object):
+    """
+    An encoded document (bytes, or an mmap) standing in for its unicode text:
+    tokens from one bytes scan, an OffsetMap, len() in characters and
+    document[start:end] slices (character offsets) that decode only that span.
+    `kinds` keeps only the tokens a stage reads (tokenize_bytes).
+    """
+
+    def __init__(self, data, encoding='utf-8', kinds=None):
+        self.data = data
+        self.encoding = encoding
+        self._utf8 = codecs.lookup(encoding).name == 'utf-8'
+        self.byte_length = len(data)
+        self.offsets = OffsetMap(data, encoding)
+        self.tokens = tokenize_bytes(data, self.offsets.char_count, encoding, kinds)
+        self.offsets.add_tokens(self.tokens)
+        self._byte_at_char = self.offsets.byte_at_char
+        self._length = None
+
+    def __len__(self):
+        if self._length is None: self._length = self.offsets.to_char(self.byte_length)
+        return self._length
+
+    def __getitem__(self, key):
+        try: # caso comum: as duas pontas sao pontas de tags
+            return self.decode(self._byte_at_char[key.start], self._byte_at_char[key.stop])
+        except (KeyError, AttributeError):
+            return self._slice(key)
+
+    def _slice(self, key):
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise TypeError("ByteDocument only supports [start:end] slices")
+        start, stop = key.start, key.stop
+        if start is None or stop is None or start < 0 or stop < 0: start, stop, _ = key.indices(len(self))
+        if start >= stop: return u""
+        return self.decode(self.offsets.to_byte(start), self.offsets.to_byte(stop))
+
+    def decode(self, byte_start, byte_end):
+        """The unicode of data[byte_start:byte_end]."""
+        if self._utf8: return utf_8_decode(self.data[byte_start:byte_end], 'strict', True)[0]
+        return self.data[byte_start:byte_end].decode(self.encoding)
+
+    def byte_offset(self, char_offset):
+        return self.offsets.to_byte(char_offset)
+
+    def char_offset(self, byte_offset):
+        return self.offsets.to_char(byte_offset)
+
+    def text(self):
+        """The whole document decoded (what the unicode stages work on)."""
+        return self.decode(0, self.byte_length)
+
+    def line_index(self):
+        return ByteLineIndex(self)
+
+
+def editor_document(editor_text, code_page):
+    """
+    ByteDocument of editor.getText() for a buffer in `code_page` (65001 =
+    UTF-8, else Latin-1). PythonScript 2 returns bytes, used as they are;
+    PythonScript 3 returns str, encoded once.
+    """
+    encoding = 'utf-8' if code_page == 65001 else 'latin-1'
+    if isinstance(editor_text, text_type): editor_text = editor_text.encode(encoding)
+    return ByteDocument(editor_text, encoding)
+
+
+class ByteLineIndex(object):
+    """LineIndex of a ByteDocument: line starts found in the bytes, same lookups by character offset."""
+
+    def __init__(self, document):
+        self.document = document
+        self.byte_line_starts = [0]
+        self.byte_line_starts.extend(match.end() for match in NEWLINE_PATTERN_B.finditer(document.data))
+
+    def __len__(self):
+        return len(self.byte_line_starts)
+
+    def line_of(self, position):
+        return bisect_right(self.byte_line_starts, self.document.byte_offset(position))
+
+    def line_start(self, line):
+        return self.document.char_offset(self.byte_line_starts[line - 1])
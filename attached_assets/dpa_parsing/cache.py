@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+# =======================================================
+# CACHE - resultados por secao, em disco, entre execucoes
+# =======================================================
+# Depois de uma correcao manual pequena o documento e
+# rodado de novo quase igual. O Text Aligner ja e local a
+# cada secao de topo (ver parallel.py: PART, CHAPTER,
+# ANNEX ... viram os {{level1}} do documento tratado), entao
+# cada secao (titulos de topo seguidos sao agrupados ate
+# SECTION_MIN_LINES linhas, para nao ter um arquivo por
+# titulo curto) e guardada em disco com a chave
+#   sha1(estagio + versao do estagio + vocabulario + texto da secao)
+# (vocabulario = DEFAULT_VOCABULARY.fingerprint(): um
+# language pack registrado muda a classificacao e as
+# chaves antigas deixam de casar) e numa nova execucao so
+# as secoes alteradas sao processadas; as outras vem do
+# cache e sao costuradas como no modo paralelo. Entradas antigas saem por LRU
+# (data de acesso do arquivo) quando o total passa do
+# limite de tamanho, ao abrir o cache e a cada gravacao.
+# Os demais estagios dependem do documento inteiro (pilha
+# de niveis, numeracao das notas) e nao usam o cache.
+# =======================================================
+from __future__ import unicode_literals
+
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+
+from .common import StageResult
+from .instrument import timed
+from .parallel import align_chunks, find_cuts, stitch_chunks
+from .vocabulary import DEFAULT_VOCABULARY
+
+# Mudar a versao de um estagio quando a saida dele mudar: as chaves antigas deixam de casar.
+STAGE_VERSIONS = {'align': '3'} # 2: stats com regex_calls; 3: chave com o vocabulario
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+SECTION_MIN_LINES = 200
+ENTRY_SUFFIX = '.json'
+
+
+class SectionCache(object):
+    """
+    Directory of JSON entries addressed by content hash, evicted least
+    recently used first once the entries take more than max_bytes.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0; self.misses = 0; self.writes = 0; self.evictions = 0
+        if not os.path.isdir(directory):
+            try: os.makedirs(directory)
+            except OSError:
+                if not os.path.isdir(directory): raise
+        self._sizes = {}
+        for name in os.listdir(directory):
+            if name.endswith(ENTRY_SUFFIX):
+                try: self._sizes[name] = os.path.getsize(os.path.join(directory, name))
+                except OSError: pass # removida por outro processo
+        self.total_bytes = sum(self._sizes.values())
+        if self.total_bytes > self.max_bytes: self.evict() # limite menor que o da execucao anterior
+
+    @staticmethod
+    def key(stage, section_text):
+        digest = hashlib.sha1()
+        digest.update('{}\0{}\0{}\0'.format(stage, STAGE_VERSIONS[stage], DEFAULT_VOCABULARY.fingerprint()).encode('utf-8'))
+        digest.update(section_text.encode('utf-8'))
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    def get(self, key):
+        """The stored value, or None. A hit refreshes the entry's LRU time."""
+        path = self._path(key)
+        try:
+            with io.open(path, 'rb') as handle:
+                value = json.loads(handle.read().decode('utf-8'))
+            os.utime(path, None)
+        except (IOError, OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        name = key + ENTRY_SUFFIX
+        path = os.path.join(self.directory, name)
+        data = json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        temp_path = '{}.{}.partial'.format(path, os.getpid())
+        with io.open(temp_path, 'wb') as handle:
+            handle.write(data)
+        try:
+            if os.path.exists(path): os.remove(path) # os.rename nao sobrescreve no Windows
+            os.rename(temp_path, path)
+        except OSError: # outro processo gravou a mesma chave
+            if os.path.exists(temp_path): os.remove(temp_path)
+            return
+        self.total_bytes += len(data) - self._sizes.get(name, 0)
+        self._sizes[name] = len(data)
+        self.writes += 1
+        if self.total_bytes > self.max_bytes: self.evict()
+
+    def evict(self):
+        """Removes the least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for name in self._sizes:
+            try: entries.append((os.path.getmtime(os.path.join(self.directory, name)), name))
+            except OSError: entries.append((0, name))
+        for _, name in sorted(entries):
+            if self.total_bytes <= self.max_bytes: break
+            try: os.remove(os.path.join(self.directory, name))
+            except OSError: pass
+            self.total_bytes -= self._sizes.pop(name)
+            self.evictions += 1
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return float(self.hits) / lookups if lookups else 0.0
+
+    def report(self):
+        return u"cache: {} hits, {} misses ({:.1f}% hit rate), {} written, {} evicted, {} entries / {:.1f} MB".format(
+            self.hits, self.misses, self.hit_rate() * 100, self.writes, self.evictions,
+            len(self._sizes), self.total_bytes / (1024.0 * 1024.0))
+
+
+def cached_align_text(text_unicode, cache, processes=1, recorder=None):
+    """
+    align_text with every top-level section looked up in `cache` first; only
+    the misses are aligned (by `processes` workers, 0 = one per CPU) and
+    stored. Same output as align_text; info also carries cache_hits / cache_misses.
+    A `recorder` times align.cut / align.cache_lookup / align.chunks / align.stitch.
+    """
+    if processes <= 0: processes = multiprocessing.cpu_count()
+    started_hits, started_misses = cache.hits, cache.misses
+    raw_lines = text_unicode.splitlines()
+    with timed(recorder, 'align.cut'):
+        cuts = find_cuts(raw_lines, len(raw_lines), SECTION_MIN_LINES)
+        sections = [raw_lines[start:end] for start, end in zip(cuts, cuts[1:] + [len(raw_lines)])]
+    with timed(recorder, 'align.cache_lookup'):
+        keys = [cache.key('align', u"\n".join(section)) for section in sections]
+        found = {} # secoes repetidas no documento: uma leitura / um alinhamento
+        for key in keys:
+            if key not in found: found[key] = cache.get(key)
+    missing = [key for key in found if found[key] is None]
+    first_section = dict(zip(reversed(keys), reversed(sections)))
+    with timed(recorder, 'align.chunks'):
+        for key, result in zip(missing, align_chunks([first_section[key] for key in missing], processes)):
+            cache.put(key, result)
+            found[key] = result
+    with timed(recorder, 'align.stitch'): output_lines, stats = stitch_chunks([found[key] for key in keys])
+    stats['cache_hits'] = cache.hits - started_hits
+    stats['cache_misses'] = cache.misses - started_misses
+    if recorder is not None: recorder.add_counters('align', stats)
+    return StageResult(u"\n".join(output_lines), stats['splits'] + stats['marker_merges'] + stats['description_merges'], stats)
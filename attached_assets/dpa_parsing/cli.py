@@ -0,0 +1,366 @@
+# -*- coding: utf-8 -*-
+# =======================================================
+# CLI - processa arquivos/diretorios sem o Notepad++
+# =======================================================
+# Exemplo:
+#   python -m dpa_parsing -s align original.txt -o saida/
+#   python -m dpa_parsing -s levels -s footnotes tratados/ --in-place
+#   python -m dpa_parsing -s align --stream corpus_consolidado.txt -o saida/
+#   python -m dpa_parsing -s align -s levels -s footnotes "acordos/*.txt" -o saida/ -j 0
+#   python -m dpa_parsing -s align corpus_consolidado.txt -o saida/ --align-workers 0
+#   python -m dpa_parsing -s align -s oneline tratados/ --in-place --cache-dir .dpa_cache
+#   python -m dpa_parsing -s align -s levels -s footnotes tratados/ --metrics metricas.jsonl
+#   python -m dpa_parsing -s audit tratados/ --audit-report notas.jsonl
+#   python -m dpa_parsing -s levels -s footnotes --mmap corpus_consolidado.txt -o saida/
+# Sem -o/--in-place apenas relata o que seria alterado.
+# =======================================================
+from __future__ import print_function, unicode_literals
+
+import argparse
+import fnmatch
+import glob
+import io
+import json
+import mmap
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import traceback
+from collections import OrderedDict
+from timeit import default_timer
+
+from . import STAGES, __version__
+from .aligner import iter_aligned_lines
+from .bytedoc import ByteDocument
+from .cache import DEFAULT_MAX_BYTES, SectionCache
+from .common import StageResult, iter_file_lines, sniff_encoding, write_lines
+from .editplan import EditPlan
+from .footnotes import AUDIT_KINDS, audit_footnotes, format_orphan_bodies, plan_footnote_sequence
+from .instrument import Recorder, timed
+from .levels import plan_level_adjustments
+from .lexer import FOOTNOTE_KINDS, LEVEL_KINDS
+from .pipeline import INSTRUMENTED_STAGES, Document, Pipeline, StageRun, build_stages, format_timings
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m dpa_parsing',
+        description='Run the DPA Parsing Notepad++ tools headless over files and directories.')
+    parser.add_argument('paths', nargs='+', metavar='PATH', help='input file, directory or glob pattern')
+    parser.add_argument('-s', '--stage', dest='stages', action='append', required=True,
+                        choices=list(STAGES), help='stage to run (repeat to chain, in the given order)')
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('-o', '--output-dir', help='write results under this directory')
+    target.add_argument('--in-place', action='store_true', help='overwrite the input files')
+    parser.add_argument('--pattern', default='*.txt', help='file name pattern for directories (default: %(default)s)')
+    parser.add_argument('--force-footnotes', action='store_true',
+                        help='renumber footnotes even when the original sequence is broken')
+    parser.add_argument('--timings', action='store_true', help='print the time taken by each stage')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='worker processes for the files (0 = one per CPU; default: %(default)s)')
+    parser.add_argument('--stream', action='store_true',
+                        help='run "-s align" line by line with constant memory (for very large files)')
+    parser.add_argument('--align-workers', type=int, default=None, metavar='N',
+                        help='split each document at top-level headings and align the parts in N processes '
+                             '(0 = one per CPU; same output as the sequential run)')
+    parser.add_argument('--mmap', action='store_true',
+                        help='run the levels / footnotes / audit stages over the memory-mapped file, '
+                             'streaming the result (for very large files)')
+    parser.add_argument('--cache-dir', metavar='DIR',
+                        help='keep aligned top-level sections in DIR and only realign the sections that changed')
+    parser.add_argument('--cache-size', type=float, default=DEFAULT_MAX_BYTES / (1024.0 * 1024.0), metavar='MB',
+                        help='evict least recently used cache entries above this size (default: %(default)d MB)')
+    parser.add_argument('--metrics', metavar='PATH',
+                        help='append one JSON record per file (per-pass timers and counters) to PATH')
+    parser.add_argument('--audit-report', metavar='PATH',
+                        help='append the "-s audit" footnote report of each file (one JSON record per file) to PATH')
+    parser.add_argument('--version', action='version', version='%(prog)s ' + __version__)
+    return parser
+
+
+def _is_glob(path):
+    return any(char in path for char in '*?[')
+
+def _glob_root(pattern):
+    """Directory part of a glob pattern before its first wildcard."""
+    root = pattern
+    while _is_glob(root): root = os.path.dirname(root)
+    return root
+
+def collect_inputs(paths, pattern):
+    """
+    Returns (path, relative_path) pairs: directories are walked recursively,
+    glob patterns expanded (both sorted); relative_path is kept under -o.
+    """
+    inputs = []
+    for path in paths:
+        if not os.path.exists(path) and _is_glob(path):
+            matches = sorted(match for match in glob.glob(path) if os.path.isfile(match))
+            if not matches: raise IOError('No files match: {}'.format(path))
+            root = _glob_root(path)
+            inputs.extend((match, os.path.relpath(match, root) if root else match) for match in matches)
+        elif os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(fnmatch.filter(files, pattern)):
+                    full_path = os.path.join(root, name)
+                    inputs.append((full_path, os.path.relpath(full_path, path)))
+        elif os.path.isfile(path):
+            inputs.append((path, os.path.basename(path)))
+        else:
+            raise IOError('No such file or directory: {}'.format(path))
+    return inputs
+
+
+def ensure_parent_dir(path):
+    """Creates the directory of `path`; tolerates another worker creating it first."""
+    output_dir = os.path.dirname(path)
+    if not output_dir or os.path.isdir(output_dir): return
+    try: os.makedirs(output_dir)
+    except OSError:
+        if not os.path.isdir(output_dir): raise
+
+
+def process_file(path, stage_names, output_path=None, force_footnotes=False, align_workers=None, cache=None, recorder=None):
+    """
+    Decodes the file once, runs the pipeline, encodes and writes once. Returns
+    the StageRuns. align_workers / cache (a SectionCache) change how "align"
+    runs; a `recorder` (instrument.Recorder) collects timers and counters.
+    """
+    with io.open(path, 'rb') as handle:
+        document = Document.from_bytes(handle.read())
+    runs = Pipeline(stage_names, force_footnotes, build_stages(align_workers, cache), recorder).run(document)
+    if output_path is not None:
+        ensure_parent_dir(output_path)
+        with io.open(output_path, 'wb') as handle:
+            handle.write(document.to_bytes())
+    return runs
+
+
+def stream_align_file(path, output_path=None):
+    """
+    Text Aligner over a file without loading it: lines are read, aligned and
+    written one at a time. The output goes to a temporary file first, so
+    output_path may be the input itself.
+    """
+    started = default_timer()
+    encoding = sniff_encoding(path)
+    stats = {}
+    aligned_lines = iter_aligned_lines(iter_file_lines(path, encoding), stats)
+    if output_path is None:
+        for _ in aligned_lines: pass
+    else:
+        ensure_parent_dir(output_path)
+        temp_path = output_path + '.partial'
+        try:
+            with io.open(temp_path, 'wb') as handle:
+                write_lines(handle, aligned_lines, encoding)
+            if os.path.exists(output_path): os.remove(output_path) # os.rename nao sobrescreve no Windows
+            os.rename(temp_path, output_path)
+        finally:
+            if os.path.exists(temp_path): os.remove(temp_path)
+    changes = stats['splits'] + stats['marker_merges'] + stats['description_merges']
+    return [StageRun('align', StageResult(None, changes, stats), default_timer() - started)]
+
+
+# ======================
+# --mmap: ESTAGIOS DE TAGS SOBRE O ARQUIVO MAPEADO
+# ======================
+# Cada estagio devolve (EditPlan, info) sem reconstruir o texto;
+# o plano e escrito direto do mapa para o arquivo seguinte.
+def _plan_audit(document, tokens=None):
+    return EditPlan(), audit_footnotes(document, tokens)
+
+# nome -> (funcao de plano, tipos de token que ela le)
+MAPPED_STAGES = OrderedDict([
+    ('levels', (plan_level_adjustments, LEVEL_KINDS)),
+    ('footnotes', (plan_footnote_sequence, FOOTNOTE_KINDS)),
+    ('audit', (_plan_audit, FOOTNOTE_KINDS)),
+])
+
+def map_file(handle):
+    """Read-only mmap of an open binary file (b'' when it is empty: mmap refuses length 0)."""
+    if os.fstat(handle.fileno()).st_size == 0: return b''
+    return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+
+def _remove(path):
+    if os.path.exists(path): os.remove(path)
+
+def process_mapped_file(path, stage_names, output_path=None, force_footnotes=False, recorder=None):
+    """
+    The MAPPED_STAGES over a memory-mapped file: tags are scanned in the mapped
+    bytes (bytedoc.ByteDocument) and each stage's EditPlan is streamed from the
+    map to a temporary file, the input of the next stage. Only the tokens and
+    the edits are held in memory, never the whole document. output_path may be
+    the input itself.
+    """
+    encoding = sniff_encoding(path)
+    if output_path is not None: ensure_parent_dir(output_path)
+    temp_dir = os.path.dirname(os.path.abspath(output_path or path))
+    runs = []
+    current = path # entrada do proximo estagio: o arquivo original ou o .partial do anterior
+    try:
+        for index, name in enumerate(stage_names):
+            started = default_timer()
+            written = None
+            with io.open(current, 'rb') as handle:
+                data = map_file(handle)
+                try:
+                    plan_stage, kinds = MAPPED_STAGES[name]
+                    with timed(recorder, 'tokenize'): document = ByteDocument(data, encoding, kinds)
+                    kwargs = {'tokens': document.tokens}
+                    if name == 'footnotes': kwargs['force'] = force_footnotes
+                    if recorder is not None and name in INSTRUMENTED_STAGES: kwargs['recorder'] = recorder
+                    plan, info = plan_stage(document, **kwargs)
+                    if plan and (output_path is not None or index < len(stage_names) - 1):
+                        descriptor, written = tempfile.mkstemp(suffix='.partial', dir=temp_dir)
+                        try:
+                            with io.open(descriptor, 'wb') as output:
+                                plan.write_to(output, document)
+                        except Exception:
+                            os.remove(written)
+                            raise
+                finally:
+                    document = None
+                    if not isinstance(data, bytes): data.close() # antes de apagar/renomear (Windows)
+            if written is not None:
+                if current != path: _remove(current)
+                current = written
+            seconds = default_timer() - started
+            if recorder is not None: recorder.add_time(name, seconds)
+            runs.append(StageRun(name, StageResult(None, len(plan), info), seconds))
+        if output_path is not None and current != path:
+            _remove(output_path) # os.rename nao sobrescreve no Windows
+            os.rename(current, output_path)
+            current = path
+        elif output_path is not None and os.path.abspath(output_path) != os.path.abspath(path):
+            shutil.copyfile(path, output_path)
+    finally:
+        if current != path: _remove(current)
+    return runs
+
+
+def process_job(job):
+    """
+    Worker entry point (also used with --jobs 1): one file, errors caught.
+    Returns (path, report, error_traceback, records): records maps 'metrics' /
+    'audit' to a JSON line. Only these strings cross the process boundary, the
+    document itself is written by the worker.
+    """
+    path, stage_names, output_path, force_footnotes, stream, mapped, timings, align_workers, cache_dir, cache_bytes, metrics = job
+    cache = None
+    recorder = Recorder(u"cli") if metrics else None
+    try:
+        if stream:
+            runs = stream_align_file(path, output_path)
+            if recorder is not None:
+                recorder.add_time('align', runs[0].seconds); recorder.add_counters('align', runs[0].result.info)
+        elif mapped:
+            runs = process_mapped_file(path, stage_names, output_path, force_footnotes, recorder)
+        else:
+            if cache_dir: cache = SectionCache(cache_dir, cache_bytes)
+            runs = process_file(path, stage_names, output_path, force_footnotes, align_workers, cache, recorder)
+    except Exception:
+        return path, None, traceback.format_exc(), {}
+    report = describe(runs)
+    if cache is not None: report += '\n  ' + cache.report()
+    if timings: report += '\n' + format_timings(runs)
+    records = {}
+    if recorder is not None: records['metrics'] = recorder.to_json(file=path, stages=list(stage_names))
+    for run in runs:
+        if run.name == 'audit': records['audit'] = audit_record(path, run.result.info)
+    return path, report, None, records
+
+
+def audit_record(path, audit_report):
+    """One JSON line: the file and its audit_footnotes report (the last audit run of the file)."""
+    record = OrderedDict([('file', path)])
+    record.update((key, audit_report[key]) for key in ('found', 'ok', 'counts', 'anomalies'))
+    return u"{}".format(json.dumps(record, separators=(',', ':')))
+
+
+def iter_job_results(jobs, processes):
+    """Results in the order of `jobs` (deterministic report), from a process pool when processes > 1."""
+    if processes <= 1 or len(jobs) <= 1:
+        for job in jobs: yield process_job(job)
+        return
+    pool = multiprocessing.Pool(processes)
+    try:
+        for result in pool.imap(process_job, jobs, chunksize=1): yield result
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+
+def describe(runs):
+    parts = []
+    for name, result, _ in runs:
+        part = '{} changes={}'.format(name, result.changes)
+        if name == 'audit':
+            part = 'audit footnotes={} anomalies={}'.format(result.info['found'], len(result.info['anomalies']))
+            if not result.info['ok']:
+                part += ' ({})'.format(', '.join('{}={}'.format(kind, result.info['counts'][kind])
+                                                 for kind in AUDIT_KINDS if result.info['counts'][kind]))
+        if name == 'footnotes' and result.info.get('sequence_break'):
+            brk = result.info['sequence_break']
+            part += ' (sequence break at line {}: expected {}, found {}{})'.format(
+                brk['line_number'], brk['expected'], brk['found'],
+                '' if result.info['renumbered'] else '; not renumbered')
+        if name == 'footnotes' and result.info.get('orphan_bodies'):
+            part += ' (bodies without a footnote: {})'.format(format_orphan_bodies(result.info['orphan_bodies']))
+        parts.append(part)
+    return '; '.join(parts)
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.stream and args.stages != ['align']:
+        parser.error('--stream only supports a single "-s align" stage')
+    if args.align_workers is not None and (args.stream or args.jobs != 1):
+        parser.error('--align-workers cannot be combined with --stream or -j/--jobs')
+    if args.cache_dir and args.stream:
+        parser.error('--cache-dir cannot be combined with --stream')
+    if args.mmap and any(stage not in MAPPED_STAGES for stage in args.stages):
+        parser.error('--mmap only supports the {} stages'.format(' / '.join(MAPPED_STAGES)))
+    if args.audit_report and 'audit' not in args.stages:
+        parser.error('--audit-report needs "-s audit"')
+    try:
+        inputs = collect_inputs(args.paths, args.pattern)
+    except IOError as e:
+        print('ERROR: {}'.format(e), file=sys.stderr)
+        return 2
+
+    jobs = []
+    for path, relative_path in inputs:
+        if args.in_place: output_path = path
+        elif args.output_dir: output_path = os.path.join(args.output_dir, relative_path)
+        else: output_path = None
+        jobs.append((path, args.stages, output_path, args.force_footnotes, args.stream, args.mmap, args.timings,
+                     args.align_workers, args.cache_dir, int(args.cache_size * 1024 * 1024), bool(args.metrics)))
+    processes = args.jobs if args.jobs > 0 else multiprocessing.cpu_count()
+
+    failures = 0
+    record_files = {}
+    if args.metrics: record_files['metrics'] = io.open(args.metrics, 'a', encoding='utf-8')
+    if args.audit_report: record_files['audit'] = io.open(args.audit_report, 'a', encoding='utf-8')
+    try:
+        for path, report, error, records in iter_job_results(jobs, processes):
+            if error is not None:
+                failures += 1
+                print('ERROR {}: {}'.format(path, error.strip().splitlines()[-1]), file=sys.stderr)
+                sys.stderr.write(error)
+                continue
+            print('{}: {}'.format(path, report))
+            for kind, handle in record_files.items():
+                if kind in records: handle.write(records[kind] + u"\n")
+    finally:
+        for handle in record_files.values(): handle.close()
+
+    print('{} file(s) processed, {} failed.'.format(len(inputs) - failures, failures))
+    return 1 if failures else 0
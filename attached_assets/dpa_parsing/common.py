@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+# =======================================================
+# COMMON - Helpers partilhados pelos estagios do motor
+# =======================================================
+# Decodificacao/codificacao de documentos e o tipo de
+# resultado devolvido por todas as funcoes de estagio.
+# Compativel com Python 2.7 (PythonScript) e Python 3.
+# =======================================================
+from __future__ import unicode_literals
+
+import codecs
+import io
+import re
+from bisect import bisect_right
+from collections import namedtuple
+
+try:
+    text_type = unicode
+except NameError:  # Python 3
+    text_type = str
+
+# Os scripts de juncao/separacao rodavam sobre os bytes do editor, onde \s e
+# \S sao so ASCII. Em Python 3 o mesmo comportamento exige re.ASCII.
+RE_ASCII = getattr(re, 'ASCII', 0)
+
+# Resultado padrao de um estagio:
+#   text    -> documento (unicode) depois do estagio
+#   changes -> numero de alteracoes feitas (0 = nada mudou)
+#   info    -> dict com dados estruturados especificos do estagio
+StageResult = namedtuple('StageResult', ['text', 'changes', 'info'])
+
+
+def decode_document(byte_string):
+    """Decode bytes as UTF-8, falling back to Latin-1. Returns (text, encoding)."""
+    if isinstance(byte_string, text_type): return byte_string, 'utf-8'
+    try: return byte_string.decode('utf-8'), 'utf-8'
+    except UnicodeDecodeError: return byte_string.decode('latin-1'), 'latin-1'
+
+
+def decode_to_unicode(byte_string):
+    """Same fallback as the original scripts: UTF-8, then Latin-1, else u''."""
+    try: return decode_document(byte_string)[0]
+    except Exception: return u""
+
+
+def safe_decode(byte_string):
+    """Safely decode bytes to text, ignoring invalid UTF-8 sequences."""
+    if isinstance(byte_string, text_type): return byte_string
+    try: return byte_string.decode('utf-8', 'ignore')
+    except Exception: return u"[Encoding Error]"
+
+
+def encode_document(text, encoding='utf-8'):
+    return text.encode(encoding)
+
+
+# ======================
+# LEITURA/ESCRITA EM STREAMING
+# ======================
+# Para corpora grandes: o arquivo nunca fica inteiro na memoria.
+STREAM_CHUNK_SIZE = 1 << 16
+
+def sniff_encoding(path, chunk_size=STREAM_CHUNK_SIZE):
+    """decode_document's choice for a file ('utf-8', else 'latin-1'), read in chunks."""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    with io.open(path, 'rb') as handle:
+        try:
+            while True:
+                chunk = handle.read(chunk_size)
+                if not chunk:
+                    decoder.decode(b'', True)
+                    return 'utf-8'
+                decoder.decode(chunk)
+        except UnicodeDecodeError:
+            return 'latin-1'
+
+def iter_file_lines(path, encoding='utf-8'):
+    """Lines of a text file read lazily, split exactly like unicode.splitlines()."""
+    with io.open(path, encoding=encoding, newline='') as handle:
+        for chunk in handle: # termina em \n, \r ou \r\n; splitlines() cobre \x0b, \x85, \u2028 ...
+            for line in chunk.splitlines(): yield line
+
+def write_lines(handle, lines, encoding='utf-8'):
+    """Writes u"\n".join(lines), encoded, to a binary handle without building the string."""
+    first = True
+    for line in lines:
+        if not first: handle.write(b"\n")
+        handle.write(line.encode(encoding))
+        first = False
+
+
+# ======================
+# NUMEROS DE LINHA
+# ======================
+# Os relatorios chamavam editor.lineFromPosition() a cada tag (uma ida ao
+# Scintilla por chamada, inexistente fora do Npp). A tabela de inicios de
+# linha e montada uma vez por documento; cada consulta e um bisect.
+NEWLINE_PATTERN = re.compile(r"\n")
+
+class LineIndex(object):
+    """Line-start offsets of one unicode document; 1-based line lookups in O(log n)."""
+
+    def __init__(self, text):
+        self.line_starts = [0]
+        self.line_starts.extend(match.end() for match in NEWLINE_PATTERN.finditer(text))
+
+    def __len__(self):
+        return len(self.line_starts)
+
+    def line_of(self, position):
+        """1-based line of a character offset (same as lineFromPosition + 1)."""
+        return bisect_right(self.line_starts, position)
+
+    def line_start(self, line):
+        """Character offset where the 1-based `line` begins."""
+        return self.line_starts[line - 1]
+
+def document_text(text):
+    """The unicode text itself; a bytedoc.ByteDocument decodes itself whole."""
+    if hasattr(text, 'line_index'): return text.text()
+    return text
+
+def line_index(text):
+    """LineIndex(text); a bytedoc.ByteDocument builds its own from the bytes."""
+    if hasattr(text, 'line_index'): return text.line_index()
+    return LineIndex(text)
+
+
+def to_npp(text_unicode, encoding='utf-8'):
+    """Text for editor.setText()/notepad.messageBox(): bytes on PythonScript 2, str on 3."""
+    if text_type is str: return text_unicode
+    return text_unicode.encode(encoding)
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+# =======================================================
+# EDIT PLAN - substituicoes em lote
+# =======================================================
+# Os scripts aplicavam cada ajuste com setTargetStart /
+# setTargetEnd / replaceTarget, de tras para frente: o
+# Scintilla deslocava o resto do documento e gravava um
+# passo de undo por ajuste. Um EditPlan junta todas as
+# substituicoes (sem sobreposicao) e materializa o
+# resultado numa unica reconstrucao do buffer, escrita
+# uma vez no editor ou no arquivo.
+# Sobre um bytedoc.ByteDocument os trechos entre as edicoes
+# saem como fatias dos bytes originais (nada e decodificado
+# nem recodificado) e a posicao no editor vem do OffsetMap.
+# write_to copia esses trechos em blocos de STREAM_CHUNK_SIZE:
+# sobre um mmap (cli --mmap) so o bloco da vez vai para a
+# memoria.
+# =======================================================
+from __future__ import unicode_literals
+
+from collections import namedtuple
+
+from .bytedoc import ByteDocument
+from .common import STREAM_CHUNK_SIZE, text_type, to_npp
+
+Edit = namedtuple('Edit', ['start', 'end', 'replacement'])
+
+
+class EditOverlapError(ValueError):
+    """Two edits of the same plan touch the same characters."""
+
+
+class EditorChangedError(RuntimeError):
+    """The editor no longer holds the text a plan was computed on."""
+
+
+class EditPlan(object):
+    """
+    Collects replacements over character offsets of one unicode document.
+    Insertions (start == end) at the same position keep the order they were added.
+    """
+
+    def __init__(self, edits=None):
+        self._edits = []
+        self._sorted = True
+        for edit in edits or (): self.replace(*edit)
+
+    def __len__(self):
+        return len(self._edits)
+
+    def __iter__(self):
+        return iter(self.edits())
+
+    def replace(self, start, end, replacement):
+        if start < 0 or end < start:
+            raise ValueError("Invalid edit span [{}, {})".format(start, end))
+        if self._edits and start < self._edits[-1].start: self._sorted = False
+        self._edits.append(Edit(start, end, replacement))
+
+    def insert(self, position, text):
+        self.replace(position, position, text)
+
+    def delete(self, start, end):
+        self.replace(start, end, '')
+
+    def edits(self):
+        """Edits sorted by position, validated against overlaps."""
+        if not self._sorted:
+            self._edits.sort(key=lambda edit: edit.start) # estavel: insercoes mantem a ordem
+            self._sorted = True
+        previous = None
+        for edit in self._edits:
+            if previous is not None and (edit.start < previous.end or
+                                         (edit.start == previous.start and previous.end > previous.start)):
+                raise EditOverlapError("Edit [{}, {}) overlaps [{}, {})".format(edit.start, edit.end, previous.start, previous.end))
+            previous = edit
+        return self._edits
+
+    def iter_pieces(self, text, start=0, end=None):
+        """Yields the pieces of the edited text[start:end] (untouched spans and replacements)."""
+        if end is None: end = len(text)
+        position = start
+        for edit in self.edits():
+            if edit.start < start or edit.end > end: continue
+            if edit.start > position: yield text[position:edit.start]
+            if edit.replacement: yield edit.replacement
+            position = edit.end
+        if position < end: yield text[position:end]
+
+    def byte_pieces(self, document, start=0, end=None, chunk_size=None):
+        """
+        iter_pieces over a ByteDocument, in its encoding: the spans between
+        edits are byte slices (at most chunk_size bytes each, when given).
+        """
+        if end is None: end = len(document)
+        position = document.byte_offset(start)
+        for edit in self.edits():
+            if edit.start < start or edit.end > end: continue
+            edit_start = document.byte_offset(edit.start)
+            for piece in _byte_slices(document.data, position, edit_start, chunk_size): yield piece
+            if edit.replacement: yield edit.replacement.encode(document.encoding)
+            position = document.byte_offset(edit.end)
+        for piece in _byte_slices(document.data, position, document.byte_offset(end), chunk_size): yield piece
+
+    def apply(self, text):
+        """Returns the edited text (unicode, also for a ByteDocument), built in one pass."""
+        if isinstance(text, ByteDocument):
+            if not self._edits: return text.text()
+            return b''.join(self.byte_pieces(text)).decode(text.encoding)
+        if not self._edits: return text
+        return ''.join(self.iter_pieces(text))
+
+    def span(self):
+        """(first start, last end) covered by the plan, or None when empty."""
+        edits = self.edits()
+        if not edits: return None
+        return edits[0].start, max(edit.end for edit in edits)
+
+    def apply_to_editor(self, editor, text, encoding='utf-8'):
+        """
+        One Scintilla write: replaces only the byte range between the first and
+        the last edit (one undo step, the text before it never moves).
+        `text` must be the unicode text currently in the editor, or a ByteDocument
+        of its bytes (positions from its OffsetMap, the target written as bytes).
+        Raises EditorChangedError, writing nothing, when the editor was edited
+        since `text` was taken (e.g. during a background analysis).
+        """
+        span = self.span()
+        if span is None: return 0
+        if not editor_holds(editor, text, encoding):
+            raise EditorChangedError("The document changed after it was analysed; nothing was written")
+        first, last = span
+        if isinstance(text, ByteDocument):
+            byte_start, byte_end = text.byte_offset(first), text.byte_offset(last)
+            replacement = b''.join(self.byte_pieces(text, first, last))
+            if text_type is str: replacement = replacement.decode(text.encoding) # PythonScript 3 recebe str
+        else:
+            byte_start = len(text[:first].encode(encoding))
+            byte_end = byte_start + len(text[first:last].encode(encoding))
+            replacement = to_npp(''.join(self.iter_pieces(text, first, last)), encoding)
+        editor.beginUndoAction()
+        try:
+            editor.setTargetStart(byte_start); editor.setTargetEnd(byte_end)
+            editor.replaceTarget(replacement)
+        finally:
+            editor.endUndoAction()
+        return len(self._edits)
+
+    def write_to(self, handle, text, encoding='utf-8'):
+        """
+        Streams the edited text to a binary file handle without joining it first
+        (a ByteDocument is written in its own encoding).
+        """
+        if isinstance(text, ByteDocument):
+            for piece in self.byte_pieces(text, chunk_size=STREAM_CHUNK_SIZE): handle.write(piece)
+            return
+        for piece in self.iter_pieces(text):
+            handle.write(piece.encode(encoding))
+
+
+def _byte_slices(data, start, stop, chunk_size=None):
+    """data[start:stop] as one slice, or in slices of chunk_size bytes."""
+    if stop <= start: return
+    if not chunk_size:
+        yield data[start:stop]; return
+    while start < stop:
+        yield data[start:min(start + chunk_size, stop)]
+        start += chunk_size
+
+
+def editor_holds(editor, text, encoding='utf-8'):
+    """True when the editor's document is still `text` (unicode, or a ByteDocument): length first, then the bytes."""
+    if isinstance(text, ByteDocument): expected, encoding = text.data, text.encoding
+    else: expected = text.encode(encoding)
+    if editor.getLength() != len(expected): return False
+    current = editor.getText()
+    if isinstance(current, text_type): current = current.encode(encoding) # PythonScript 3
+    return current == expected
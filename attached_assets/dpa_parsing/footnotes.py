@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+# =======================================================
+# RENUMBER FOOTNOTES - motor (logica v_FINAL_7)
+# =======================================================
+# Encontra {{footnotenumberN}}N{{-footnotenumberM}},
+# verifica a sequencia (numero do meio) e renumera de 1..N.
+# audit_footnotes lista TODAS as anomalias numa passada
+# (a verificacao antiga para na primeira quebra).
+# A renumeracao leva junto os corpos {{footnoteN}}N ...
+# {{-footnoteN}} (o visualizador casa nota e corpo pelo
+# numero): um mapa antigo->novo montado dos marcadores e
+# um unico EditPlan para marcadores e corpos. Um corpo sem
+# nota do seu numero (orfao) so muda de numero se outro
+# corpo for renumerado para ele: vai para depois do ultimo.
+# =======================================================
+from __future__ import unicode_literals
+
+import re
+from collections import Counter, OrderedDict
+
+from .common import RE_ASCII, StageResult, document_text, line_index
+from .editplan import EditPlan
+from .instrument import timed
+from .lexer import FOOTNOTE_BODY_CLOSE, FOOTNOTE_BODY_OPEN, FOOTNOTE_CLOSE, FOOTNOTE_OPEN, pair_same_number, tokenize
+from .worker import PROGRESS_STEP
+
+# Estrutura procurada (documentacao/log; a busca usa o token stream do lexer):
+#   {{footnotenumber(\d+)}}  -> 'start_num'  (numero na tag inicial)
+#   }}(\d+){{                -> 'middle_num' <-- USED FOR SEQUENCE CHECK
+#   {{-footnotenumber\d+}}   -> 'end_num'    (qualquer numero)
+FOOTNOTE_PATTERN_FIND = r"\{\{footnotenumber(\d+)\}\}(\d+)\{\{-footnotenumber\d+\}\}"
+MIDDLE_NUMBER_PATTERN = re.compile(r"\d+\Z", RE_ASCII)
+
+
+def find_footnotes(text_unicode, tokens=None, progress=None, stats=None):
+    """
+    Returns one dict per {{footnotenumberN}}N{{-footnotenumberM}} occurrence:
+    start, end, start_num, middle_num, end_num, text. `progress` (worker.Progress,
+    optional) counts the tags scanned; raises Cancelled when cancelled. `stats`
+    (a dict, optional) receives regex_calls.
+    """
+    if tokens is None: tokens = tokenize(text_unicode)
+    footnotes = []
+    if progress is not None: progress.start(len(tokens), u"tags")
+    for i in range(len(tokens) - 1):
+        if progress is not None and i % PROGRESS_STEP == 0: progress.update(i)
+        open_token = tokens[i]; close_token = tokens[i + 1]
+        if open_token.kind != FOOTNOTE_OPEN or close_token.kind != FOOTNOTE_CLOSE: continue
+        middle = text_unicode[open_token.end:close_token.start]
+        if stats is not None: stats['regex_calls'] = stats.get('regex_calls', 0) + 1
+        if not MIDDLE_NUMBER_PATTERN.match(middle): continue
+        footnotes.append({'start': open_token.start, 'end': close_token.end,
+                          'start_num': open_token.value, 'middle_num': middle, 'end_num': close_token.value,
+                          'text': text_unicode[open_token.start:close_token.end]})
+    if progress is not None: progress.update(len(tokens))
+    return footnotes
+
+def check_sequence_and_find_break(matches_list, text_unicode=None, lines=None):
+    """
+    Checks if the middle numbers (Group 2) form a sequence 1, 2, 3...
+    Returns details of the first break found, or None if contiguous.
+    The line number comes from `lines` (a LineIndex), built from text_unicode if needed.
+    (The functions of this module also take a bytedoc.ByteDocument as text_unicode.)
+    """
+    for i, footnote in enumerate(matches_list):
+        expected_number = i + 1
+        start_pos = footnote['start']
+        try:
+            found_number = int(footnote['middle_num'])
+        except (KeyError, ValueError):
+            found_number = -1 # Mark as invalid
+
+        if found_number != expected_number:
+            return {
+                "expected": expected_number,
+                "found": found_number if found_number != -1 else "[Read Error]",
+                "position": start_pos,
+                "line_number": _line_of(start_pos, text_unicode, lines),
+                "text": footnote['text']
+            }
+    return None
+
+def _line_of(position, text_unicode, lines):
+    if lines is None:
+        if text_unicode is None: return None
+        lines = line_index(text_unicode)
+    return lines.line_of(position)
+
+# ======================
+# AUDITORIA (todas as anomalias, uma passada)
+# ======================
+AUDIT_KINDS = ('gap', 'duplicate', 'out_of_order', 'mismatch', 'unparseable')
+
+def audit_footnotes(text_unicode, tokens=None, lines=None):
+    """
+    Every anomaly of the footnote sequence in one pass over the tags:
+      gap          - number above previous + 1 ('missing': [first, last])
+      duplicate    - number already used ('first_line')
+      out_of_order - number below previous + 1, not used before
+      mismatch     - start/end tag number differs from the middle number
+      unparseable  - middle not a number, or a tag without its pair ('reason')
+    The sequence is judged against the previous good number (not the position),
+    so one wrong number is one anomaly. Each anomaly carries kind, line,
+    position and text. Returns a JSON-ready OrderedDict: found, ok, counts, anomalies.
+    """
+    if tokens is None: tokens = tokenize(text_unicode)
+    if lines is None: lines = line_index(text_unicode)
+    anomalies = []
+    def add(kind, start, end, **details):
+        anomaly = OrderedDict([('kind', kind), ('line', lines.line_of(start)), ('position', start)])
+        anomaly.update(sorted(details.items()))
+        anomaly['text'] = text_unicode[start:end]
+        anomalies.append(anomaly)
+    found = 0; previous = 0; first_line_of = {}
+    count = len(tokens); i = 0
+    while i < count:
+        token = tokens[i]
+        if token.kind == FOOTNOTE_CLOSE: # sem a tag inicial logo antes
+            add('unparseable', token.start, token.end, reason=u"closing tag without opening tag")
+        elif token.kind == FOOTNOTE_OPEN:
+            if i + 1 >= count or tokens[i + 1].kind != FOOTNOTE_CLOSE:
+                add('unparseable', token.start, token.end, reason=u"opening tag without closing tag")
+                i += 1; continue
+            close_token = tokens[i + 1]; i += 1
+            middle = text_unicode[token.end:close_token.start]
+            if not MIDDLE_NUMBER_PATTERN.match(middle):
+                add('unparseable', token.start, close_token.end, reason=u"middle is not a number")
+                i += 1; continue
+            found += 1
+            number = int(middle); line = lines.line_of(token.start)
+            if int(token.value) != number or int(close_token.value) != number:
+                add('mismatch', token.start, close_token.end, number=number,
+                    start_num=int(token.value), end_num=int(close_token.value))
+            if number in first_line_of:
+                add('duplicate', token.start, close_token.end, number=number, expected=previous + 1, first_line=first_line_of[number])
+            else:
+                first_line_of[number] = line
+                if number > previous + 1:
+                    add('gap', token.start, close_token.end, number=number, expected=previous + 1, missing=[previous + 1, number - 1])
+                    previous = number
+                elif number == previous + 1: previous = number
+                else: add('out_of_order', token.start, close_token.end, number=number, expected=previous + 1)
+        i += 1
+    counts = OrderedDict((kind, 0) for kind in AUDIT_KINDS)
+    for anomaly in anomalies: counts[anomaly['kind']] += 1
+    return OrderedDict([('found', found), ('ok', not anomalies), ('counts', counts), ('anomalies', anomalies)])
+
+def describe_anomaly(anomaly):
+    """One report line for an audit_footnotes anomaly."""
+    kind = anomaly['kind']
+    if kind == 'gap':
+        first, last = anomaly['missing']
+        detail = u"expected {}, found {} (missing {})".format(anomaly['expected'], anomaly['number'],
+                                                             first if first == last else u"{}-{}".format(first, last))
+    elif kind == 'duplicate': detail = u"{} already used on line {}".format(anomaly['number'], anomaly['first_line'])
+    elif kind == 'out_of_order': detail = u"expected {}, found {}".format(anomaly['expected'], anomaly['number'])
+    elif kind == 'mismatch': detail = u"tags {} / {} around middle number {}".format(anomaly['start_num'], anomaly['end_num'], anomaly['number'])
+    else: detail = anomaly['reason']
+    return u"Line {}: {} - {}: '{}'".format(anomaly['line'], kind, detail, anomaly['text'])
+
+def audit_footnote_sequence(text_unicode, tokens=None):
+    """Stage form of audit_footnotes: text unchanged, changes=0, info = the audit report."""
+    return StageResult(document_text(text_unicode), 0, audit_footnotes(text_unicode, tokens))
+
+def format_footnote_tag(number):
+    return "{{{{footnotenumber{0}}}}}{0}{{{{-footnotenumber{0}}}}}".format(number)
+
+# ======================
+# CORPOS {{footnoteN}}N texto{{-footnoteN}}
+# ======================
+# Numero no inicio do corpo (o mesmo N da tag, quando presente)
+BODY_NUMBER_PATTERN = re.compile(r"\s*(\d+)(?!\d)", RE_ASCII)
+
+def find_footnote_bodies(text_unicode, tokens=None):
+    """
+    Returns one dict per {{footnoteN}}...{{-footnoteN}} body, paired like the
+    viewer's regex (first {{-footnoteN}} with the same N): number, start, end,
+    open_end, close_start and number_span, the (start, end) of the leading
+    number of the body when it repeats N (else None).
+    """
+    if tokens is None: tokens = tokenize(text_unicode)
+    bodies = []
+    for open_token, close_token in pair_same_number(tokens, FOOTNOTE_BODY_OPEN, FOOTNOTE_BODY_CLOSE):
+        number = int(open_token.value)
+        match = BODY_NUMBER_PATTERN.match(text_unicode[open_token.end:close_token.start])
+        if match and int(match.group(1)) == number:
+            number_span = (open_token.end + match.start(1), open_token.end + match.end(1))
+        else:
+            number_span = None
+        bodies.append({'number': number, 'start': open_token.start, 'end': close_token.end,
+                       'open_end': open_token.end, 'close_start': close_token.start, 'number_span': number_span})
+    return bodies
+
+def footnote_number_mapping(matches_list):
+    """
+    Old middle number M -> the new numbers (1-based positions) of the footnotes
+    that carried it, in order, except that M itself comes first when the footnote
+    at position M already carried M: with a corrupted duplicate marker the body
+    M stays with the footnote that keeps its number.
+    """
+    mapping = {}
+    for i, footnote in enumerate(matches_list):
+        mapping.setdefault(int(footnote['middle_num']), []).append(i + 1)
+    for number, new_numbers in mapping.items():
+        if number in new_numbers and new_numbers[0] != number:
+            new_numbers.remove(number); new_numbers.insert(0, number)
+    return mapping
+
+def _numbered_bodies(bodies, mapping, footnote_count):
+    """[body, new number, orphan] per body; see renumbered_bodies."""
+    numbered = []; seen = {}
+    for body in bodies:
+        new_numbers = mapping.get(body['number'], ())
+        k = seen.get(body['number'], 0); seen[body['number']] = k + 1
+        numbered.append([body, new_numbers[k], False] if k < len(new_numbers) else [body, None, True])
+    # Um orfao so fica com o seu numero se nenhum outro corpo for renumerado para ele
+    taken = set(item[1] for item in numbered if not item[2]); moved = []
+    for item in numbered:
+        if not item[2]: continue
+        if item[0]['number'] in taken: moved.append(item)
+        else: item[1] = item[0]['number']; taken.add(item[1])
+    next_number = max(taken | set([footnote_count]))
+    for item in moved:
+        next_number += 1; item[1] = next_number
+    return numbered
+
+def renumbered_bodies(bodies, mapping, footnote_count):
+    """
+    (body, new number) for every body: the k-th body numbered M takes the k-th
+    new number of M. Orphan bodies (no footnote carries M, or more bodies
+    numbered M than footnotes) keep M while no other body is renumbered to it;
+    otherwise they move past the last footnote and the highest number in use.
+    No two bodies end up with the same number.
+    """
+    return [(body, number) for body, number, _ in _numbered_bodies(bodies, mapping, footnote_count)]
+
+def orphan_bodies(bodies, mapping, footnote_count):
+    """(body, new number) of the orphan bodies of renumbered_bodies (new number == old when kept)."""
+    return [(body, number) for body, number, orphan in _numbered_bodies(bodies, mapping, footnote_count) if orphan]
+
+def format_orphan_bodies(orphans):
+    """Report text for (old number, new number) pairs: "13 -> 32, 40 (kept)"."""
+    return u", ".join(u"{} (kept)".format(old) if old == new else u"{} -> {}".format(old, new) for old, new in orphans)
+
+def footnote_renumbering_plan(matches_list, bodies=()):
+    """
+    EditPlan rewriting footnote i as {{footnotenumber i}}i{{-footnotenumber i}}
+    (1-based) and, in the same plan, the tags and leading number of each body
+    of `bodies` (find_footnote_bodies) to its renumbered_bodies number. Raises
+    ValueError if two bodies would share a number.
+    """
+    plan = EditPlan()
+    for i, footnote in enumerate(matches_list):
+        replacement_text = format_footnote_tag(i + 1)
+        if footnote['text'] != replacement_text: plan.replace(footnote['start'], footnote['end'], replacement_text)
+    numbered = renumbered_bodies(bodies, footnote_number_mapping(matches_list), len(matches_list))
+    duplicates = sorted(number for number, count in Counter(number for _, number in numbered).items() if count > 1)
+    if duplicates: raise ValueError("Footnote bodies would share number(s) {}".format(', '.join(str(n) for n in duplicates)))
+    for body, number in numbered:
+        if number == body['number']: continue
+        plan.replace(body['start'], body['open_end'], u"{{{{footnote{}}}}}".format(number))
+        if body['number_span'] is not None: plan.replace(body['number_span'][0], body['number_span'][1], u"{}".format(number))
+        plan.replace(body['close_start'], body['end'], u"{{{{-footnote{}}}}}".format(number))
+    return plan
+
+def perform_footnote_renumbering(text_unicode, matches_list, bodies=None):
+    """Forces renumbering of footnotes (and their bodies) sequentially from 1. Returns the new text."""
+    if bodies is None: bodies = find_footnote_bodies(text_unicode)
+    return footnote_renumbering_plan(matches_list, bodies).apply(text_unicode)
+
+def fix_footnote_sequence(text_unicode, force=False, tokens=None, recorder=None):
+    """
+    Headless flow of run_renumber_flow(). When the original sequence is broken
+    the text is only renumbered with force=True (the "Ask Fix" answer); the
+    footnote bodies follow their footnotes. A `recorder` times footnotes.find /
+    check / renumber.
+    """
+    plan, info = plan_footnote_sequence(text_unicode, force, tokens, recorder)
+    if not plan: return StageResult(document_text(text_unicode), 0, info)
+    with timed(recorder, 'footnotes.renumber'):
+        return StageResult(plan.apply(text_unicode), len(plan), info)
+
+def plan_footnote_sequence(text_unicode, force=False, tokens=None, recorder=None):
+    """fix_footnote_sequence without the rebuild: returns (EditPlan, info); the plan is empty unless renumbered."""
+    stats = {'regex_calls': 0} if recorder is not None else None
+    if tokens is None: tokens = tokenize(text_unicode)
+    with timed(recorder, 'footnotes.find'):
+        matches_list = find_footnotes(text_unicode, tokens, stats=stats)
+        bodies = find_footnote_bodies(text_unicode, tokens)
+    plan, info = _footnote_plan(text_unicode, matches_list, bodies, force, recorder)
+    if recorder is not None:
+        recorder.count('footnotes.found', len(matches_list))
+        recorder.count('footnotes.bodies', len(bodies))
+        recorder.count('footnotes.sequence_breaks', 1 if info['sequence_break'] else 0)
+        recorder.count('footnotes.rewritten', len(plan))
+        recorder.add_counters('footnotes', stats)
+    return plan, info
+
+def _footnote_plan(text_unicode, matches_list, bodies, force, recorder):
+    info = {'found': len(matches_list), 'bodies': len(bodies), 'orphan_bodies': [], 'sequence_break': None, 'renumbered': False}
+    if not matches_list:
+        return EditPlan(), info
+    with timed(recorder, 'footnotes.check'): sequence_break_info = check_sequence_and_find_break(matches_list, text_unicode)
+    info['sequence_break'] = sequence_break_info
+    if sequence_break_info and not force:
+        return EditPlan(), info
+    with timed(recorder, 'footnotes.renumber'):
+        plan = footnote_renumbering_plan(matches_list, bodies)
+        info['orphan_bodies'] = [(body['number'], number) for body, number in orphan_bodies(bodies, footnote_number_mapping(matches_list), len(matches_list))]
+        info['renumbered'] = True
+    return plan, info
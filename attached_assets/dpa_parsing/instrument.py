@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+# =======================================================
+# INSTRUMENT - tempos e contadores por passo, um JSON por execucao
+# =======================================================
+# Os scripts relatavam o andamento com dezenas de
+# console.write (um por nota, um por ajuste), o que custa
+# tempo e nao deixa numero nenhum para comparar execucoes.
+# Um Recorder acompanha uma execucao:
+#   timer(nome)  -> tempo acumulado de cada passo
+#                   (align.pass1/2/2_5/3, levels.preprocess/
+#                   analysis/apply, footnotes.find/check/renumber)
+#   count / add_counters -> merges, splits, ajustes por
+#                   REGRA 0-4, chamadas de regex ...
+#   log          -> detalhe (uma linha por nota/ajuste), so
+#                   com verbose=True e guardado em memoria ate
+#                   flush_log (um unico write no console)
+#   to_json      -> o registro da execucao numa linha JSON
+#                   (append_to acrescenta num arquivo .jsonl;
+#                   emit escreve no console e no arquivo)
+# Sem Recorder (recorder=None, o padrao) os estagios rodam
+# como antes: timed() devolve um contexto vazio.
+# =======================================================
+from __future__ import unicode_literals
+
+import io
+import json
+import platform
+import time
+from collections import OrderedDict
+from timeit import default_timer
+
+
+class _Timer(object):
+    """Context manager adding the time spent inside it to recorder.timers[name]."""
+    __slots__ = ('recorder', 'name', 'started')
+
+    def __init__(self, recorder, name):
+        self.recorder = recorder; self.name = name; self.started = None
+
+    def __enter__(self):
+        self.started = default_timer()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.recorder.add_time(self.name, default_timer() - self.started)
+        return False
+
+
+class _NullTimer(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        return False
+
+NULL_TIMER = _NullTimer()
+
+def timed(recorder, name):
+    """recorder.timer(name), or a do-nothing context when recorder is None."""
+    if recorder is None: return NULL_TIMER
+    return recorder.timer(name)
+
+
+class Recorder(object):
+    """Named timers, counters and the (opt-in) verbose log of one run."""
+
+    def __init__(self, run=u"", verbose=False):
+        self.run = run
+        self.verbose = verbose
+        self.timers = OrderedDict()   # nome -> segundos, na ordem em que apareceram
+        self.counters = OrderedDict()
+        self._log = []
+
+    def timer(self, name):
+        return _Timer(self, name)
+
+    def add_time(self, name, seconds):
+        self.timers[name] = self.timers.get(name, 0.0) + seconds
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_counters(self, prefix, stats):
+        """Adds every integer entry of a stage's stats dict as "<prefix>.<key>"."""
+        for key in sorted(stats):
+            value = stats[key]
+            if isinstance(value, int) and not isinstance(value, bool): self.count(u"{}.{}".format(prefix, key), value)
+
+    def log(self, message, *args):
+        """Buffers message.format(*args) when verbose; formats nothing otherwise."""
+        if self.verbose: self._log.append(message.format(*args) if args else message)
+
+    def flush_log(self, write):
+        """Hands the buffered log to write() in one call (if there is any) and empties it."""
+        if self._log: write(u"".join(self._log))
+        self._log = []
+
+    def record(self, **extra):
+        """The run as a dict: run, time (UTC), python, timers_ms, counters and `extra`."""
+        data = OrderedDict([
+            ('run', self.run),
+            ('time', time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())),
+            ('python', platform.python_version()),
+        ])
+        data.update(sorted(extra.items()))
+        data['timers_ms'] = OrderedDict((name, round(seconds * 1000, 3)) for name, seconds in self.timers.items())
+        data['counters'] = OrderedDict(self.counters)
+        return data
+
+    def to_json(self, **extra):
+        """record(**extra) as one line of JSON (ASCII)."""
+        return u"{}".format(json.dumps(self.record(**extra), separators=(',', ':')))
+
+    def append_to(self, path, **extra):
+        """Appends to_json(**extra) as one line of a JSON Lines file."""
+        self._append(path, self.to_json(**extra))
+
+    def emit(self, write, path=None, **extra):
+        """Writes the record as one "METRICS {...}" line through write() and, with a path, appends it there too."""
+        line = self.to_json(**extra)
+        write(u"METRICS {}\n".format(line))
+        if path: self._append(path, line)
+
+    @staticmethod
+    def _append(path, line):
+        with io.open(path, 'a', encoding='utf-8') as handle:
+            handle.write(line + u"\n")
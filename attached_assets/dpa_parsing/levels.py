@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+# =======================================================
+# AJUSTAR NIVEIS (LEVELS) - motor (logica v4.10)
+# =======================================================
+# Mesma logica de correcao do LVL CORRECTION.py, sem Npp:
+# trabalha sobre o texto unicode (offsets em caracteres;
+# um bytedoc.ByteDocument serve no lugar do texto) e
+# devolve os ajustes como dados estruturados.
+# =======================================================
+from __future__ import unicode_literals
+
+import re
+
+from .common import StageResult, document_text, line_index
+from .editplan import EditPlan
+from .instrument import timed
+from .lexer import LEVEL_CLOSE, LEVEL_OPEN, TEXT_LEVEL_CLOSE, TEXT_LEVEL_OPEN, pair_any_close, tokenize
+from .vocabulary import DEFAULT_VOCABULARY
+from .worker import PROGRESS_STEP
+
+# --- Regexes, Keywords, Hierarquia ---
+# (LEVEL_PATTERN_B / TEXT_LEVEL_BLOCK_PATTERN_B foram substituidos pelo lexer)
+MARKER_CLEANUP_PATTERN_U = re.compile(r"^\s*\{\{\s*(\([ivxlcdm]+\)|\([a-zA-Z]+\)|\d+\.)\s*\}\}(.*)|^(.*)", re.IGNORECASE | re.DOTALL | re.UNICODE)
+ID_PATTERN = re.compile(r"^([a-zA-Z0-9]+(?:[\-\.][a-zA-Z0-9]+)*)")
+# TYPE_MAP: DEFAULT_VOCABULARY.level_types() (tabelas por idioma em vocabulary.py), lido a cada chamada
+HIERARCHY = {u'part': {u'title', u'chapter'}, u'title': {u'chapter', u'section', u'article'}, u'chapter': {u'section', u'article'}, u'section': {u'subsection', u'article'}, u'subsection': {u'article'},}
+
+# --- Funcoes Auxiliares ---
+def get_tag_type(content_unicode):
+    stripped = content_unicode.strip();
+    if not stripped: return u'unknown';
+    type_map = DEFAULT_VOCABULARY.level_types();
+    words = stripped.split(None, 2);
+    if len(words) > 1:
+        two_words = (words[0] + u" " + words[1]).lower().rstrip('.:');
+        tag_type = type_map.get(two_words);
+        if tag_type: return tag_type;
+    first_word = words[0].lower().rstrip('.:');
+    tag_type = type_map.get(first_word);
+    if tag_type: return tag_type;
+    return u'unknown';
+
+def _count_regex(stats):
+    if stats is not None: stats['regex_calls'] = stats.get('regex_calls', 0) + 1
+
+def extract_identifier(text_unicode, tag_type, stats=None):
+    text = text_unicode.strip(); lowered = text.lower(); keyword_end = 0;
+    # Palavra-chave mais longa do tipo pedido seguida de espaco (uma caminhada no trie)
+    for end, type_val in DEFAULT_VOCABULARY.level_type_matcher().prefixes(lowered):
+        if type_val == tag_type and lowered[end:end+1] == u' ': keyword_end = end + 1;
+    if keyword_end: text = text[keyword_end:].strip();
+    _count_regex(stats);
+    match = ID_PATTERN.match(text);
+    if match: return match.group(1);
+    return u"";
+
+def is_direct_sub_identifier(current_id, previous_id, stats=None):
+    if not current_id or not previous_id or current_id == previous_id: return False;
+    if current_id.startswith(previous_id):
+        suffix = current_id[len(previous_id):];
+        suffix_pattern = r"^[\s\-.]?(\d+|[a-zA-Z]+)";
+        _count_regex(stats);
+        match = re.match(suffix_pattern, suffix);
+        if match: return True;
+    return False;
+# --- Fim Funcoes Auxiliares ---
+
+# --- Pre-processamento: tags {{levelX}} e blocos {{text_level}} ---
+def find_level_tags(text_unicode, tokens=None):
+    """
+    Returns (all_level_tags_data, block_data_by_start) for a unicode document.
+    Pairs come from the lexer token stream (same shape as the old LEVEL_PATTERN_B /
+    TEXT_LEVEL_BLOCK_PATTERN_B regexes); pass `tokens` to reuse an existing scan.
+    """
+    if tokens is None: tokens = tokenize(text_unicode)
+    block_data_by_start = {}
+    for open_token, close_token in pair_any_close(tokens, TEXT_LEVEL_OPEN, TEXT_LEVEL_CLOSE):
+        block_data_by_start[open_token.start] = {'start': open_token.start, 'end': close_token.end, 'content_start': open_token.end, 'content_end': close_token.start}
+    all_level_tags_data = []
+    for i, (open_token, close_token) in enumerate(pair_any_close(tokens, LEVEL_OPEN, LEVEL_CLOSE)):
+        level_num = int(open_token.value)
+        content_unicode = text_unicode[open_token.end:close_token.start]
+        tag_type = get_tag_type(content_unicode)
+        all_level_tags_data.append({'index': i, 'start': open_token.start, 'end': close_token.end, 'original_level': level_num, 'original_content_unicode': content_unicode, 'type': tag_type, 'is_inside': False, 'containing_block_start': None})
+    assign_containing_blocks(all_level_tags_data, block_data_by_start)
+    return all_level_tags_data, block_data_by_start
+
+def assign_containing_blocks(all_level_tags_data, block_data_by_start):
+    """
+    Sweep-line: fills 'is_inside'/'containing_block_start' for every tag in one
+    ordered pass over tags and blocks (O(T + B) instead of tags x blocks).
+    Blocks {{text_level}} nao se sobrepoem, entao o unico candidato de uma tag
+    e o ultimo bloco cujo conteudo comeca antes dela.
+    """
+    blocks = sorted(block_data_by_start.values(), key=lambda b: b['content_start'])
+    block_count = len(blocks); b = -1
+    for level_data in sorted(all_level_tags_data, key=lambda t: t['start']):
+        match_start, match_end = level_data['start'], level_data['end']
+        while b + 1 < block_count and blocks[b + 1]['content_start'] <= match_start: b += 1
+        if b >= 0 and match_end <= blocks[b]['content_end'] and match_start < match_end:
+            level_data['is_inside'] = True; level_data['containing_block_start'] = blocks[b]['start']
+        else:
+            level_data['is_inside'] = False; level_data['containing_block_start'] = None
+
+# --- Funcao Principal de Ajuste (v4.10) ---
+def perform_level_adjustment_v4_10(all_level_tags_data, block_data_by_start, progress=None, stats=None):
+    """
+    `progress` (worker.Progress, optional) counts the tags analysed; raises
+    Cancelled when cancelled. `stats` (a dict, optional) receives regex_calls.
+    """
+    adjustments_to_make = []
+    if progress is not None: progress.start(len(all_level_tags_data), u"tags")
+    last_outer_tag_data = {'correct_level': -1, 'type': u'unknown', 'original_level': -1, 'identifier': u''}
+    internal_block_state = {}
+    outer_history = []          # (end, correct_level) das tags FORA, em ordem
+    block_outer_reference = {}  # block_start -> nivel corrigido da tag externa de referencia
+
+    for tag_number, current_level_data in enumerate(all_level_tags_data):
+        if progress is not None and tag_number % PROGRESS_STEP == 0: progress.update(tag_number)
+        current_start = current_level_data['start']
+        current_original_level = current_level_data['original_level']
+        current_content_unicode = current_level_data['original_content_unicode']
+        current_type = current_level_data['type']
+        current_identifier = extract_identifier(current_content_unicode, current_type, stats)
+        correct_level = current_original_level
+        final_content_unicode = current_content_unicode
+        content_cleaned = False
+        needs_update = False
+        rule = None
+        is_inside = current_level_data['is_inside']
+
+        if not is_inside: # FORA
+            previous_correct_level = last_outer_tag_data['correct_level']
+            previous_type = last_outer_tag_data['type']
+            previous_original_level = last_outer_tag_data['original_level']
+            previous_identifier = last_outer_tag_data['identifier']
+
+            if previous_correct_level != -1 and previous_type != u'unknown' and current_type != u'unknown':
+                # REGRA 0: Sub-ID Forcado
+                if current_type == previous_type and is_direct_sub_identifier(current_identifier, previous_identifier, stats):
+                    correct_level = previous_correct_level + 1; rule = 0
+                # REGRA 1: Original Level +1
+                elif current_original_level == previous_original_level + 1:
+                     correct_level = previous_correct_level + 1; rule = 1
+                # REGRA 2: Hierarquia Padrao (Filho)
+                elif previous_type in HIERARCHY and current_type in HIERARCHY.get(previous_type, {}):
+                     correct_level = previous_correct_level + 1; rule = 2
+                # REGRA 3: Mesmo Tipo (Nao Sub-ID)
+                elif current_type == previous_type:
+                     correct_level = previous_correct_level; rule = 3
+                # REGRA 4: Fallback
+                else:
+                     correct_level = current_original_level; rule = 4
+            else: # Primeira tag
+                 correct_level = current_original_level
+
+            outer_history.append((current_level_data['end'], correct_level))
+            last_outer_tag_data = {'correct_level': correct_level, 'type': current_type, 'original_level': current_original_level, 'identifier': current_identifier}
+            needs_update = (correct_level != current_original_level)
+
+        else: # DENTRO
+             actual_block_start = current_level_data.get('containing_block_start')
+             if actual_block_start is not None:
+                 # Tag externa mais proxima que termina ANTES do INICIO do bloco. As tags
+                 # externas estao em ordem e nao se sobrepoem (fins crescentes), entao
+                 # basta voltar pelo historico uma vez por bloco e guardar a referencia.
+                 if actual_block_start not in block_outer_reference:
+                     k = len(outer_history) - 1
+                     while k >= 0 and outer_history[k][0] > actual_block_start: k -= 1
+                     block_outer_reference[actual_block_start] = outer_history[k][1] if k >= 0 else None
+                 outer_corrected_level = block_outer_reference[actual_block_start]
+
+                 if outer_corrected_level is not None:
+                     block_state = internal_block_state.get(actual_block_start)
+                     if block_state is None: correct_level = outer_corrected_level + 1
+                     else:
+                         prev_orig_internal = block_state['prev_orig']; prev_corr_internal = block_state['prev_corr'];
+                         difference = current_original_level - prev_orig_internal; correct_level = prev_corr_internal + difference;
+                     internal_block_state[actual_block_start] = {'prev_orig': current_original_level, 'prev_corr': correct_level}
+                     # Limpeza
+                     final_content_unicode = current_content_unicode; content_cleaned = False;
+                     _count_regex(stats); match_cleanup = MARKER_CLEANUP_PATTERN_U.match(current_content_unicode);
+                     if match_cleanup:
+                         if match_cleanup.group(1) is not None: final_content_unicode = u"{} {}".format(match_cleanup.group(1), (match_cleanup.group(2) or u"").strip()); content_cleaned = True;
+                         elif match_cleanup.group(3): final_content_unicode = match_cleanup.group(3);
+                     needs_update = (correct_level != current_original_level) or content_cleaned;
+                 else: needs_update = False; correct_level = current_original_level; # Mantem original se nao achou ref
+             else: needs_update = False; correct_level = current_original_level; # Mantem original se nao achou bloco pai
+
+
+        if needs_update:
+            adjustments_to_make.append({'start': current_start, 'end': current_level_data['end'],'correct_level': correct_level,'final_content_unicode': final_content_unicode,'orig_level': current_original_level,'cleaned': content_cleaned, 'rule': rule})
+
+    if progress is not None: progress.update(len(all_level_tags_data))
+    return adjustments_to_make
+
+def format_level_tag(level, content_unicode):
+    return u"{{{{level{}}}}}{}{{{{-level{}}}}}".format(level, content_unicode, level)
+
+def level_adjustment_plan(adjustments_to_make):
+    """EditPlan replacing every adjusted {{levelX}}...{{-levelX}} span."""
+    plan = EditPlan()
+    for adj in adjustments_to_make:
+        plan.replace(adj['start'], adj['end'], format_level_tag(adj['correct_level'], adj['final_content_unicode']))
+    return plan
+
+def apply_level_adjustments(text_unicode, adjustments_to_make):
+    """Rebuilds the document with every adjustment applied (one pass, in order)."""
+    return level_adjustment_plan(adjustments_to_make).apply(text_unicode)
+
+def count_adjustment_rules(adjustments_to_make):
+    """{'rule_0': n, ... 'rule_4': n, 'in_block': n}: adjustments by REGRA (in_block = tags inside {{text_level}})."""
+    counts = dict((u"rule_{}".format(rule), 0) for rule in range(5)); counts['in_block'] = 0
+    for adj in adjustments_to_make:
+        counts[u"in_block" if adj['rule'] is None else u"rule_{}".format(adj['rule'])] += 1
+    return counts
+
+def record_level_counters(recorder, all_level_tags_data, block_data_by_start, adjustments_to_make, stats):
+    """levels.* counters of one run: tags, blocks, adjustments, adjustments by rule, regex calls."""
+    recorder.count('levels.tags', len(all_level_tags_data)); recorder.count('levels.blocks', len(block_data_by_start))
+    recorder.count('levels.adjustments', len(adjustments_to_make))
+    recorder.add_counters('levels', count_adjustment_rules(adjustments_to_make))
+    recorder.add_counters('levels', stats)
+
+def plan_level_adjustments(text_unicode, tokens=None, recorder=None):
+    """adjust_levels without the rebuild: returns (EditPlan, info)."""
+    stats = {'regex_calls': 0} if recorder is not None else None
+    with timed(recorder, 'levels.preprocess'):
+        all_level_tags_data, block_data_by_start = find_level_tags(text_unicode, tokens)
+    with timed(recorder, 'levels.analysis'):
+        adjustments_to_make = perform_level_adjustment_v4_10(all_level_tags_data, block_data_by_start, stats=stats)
+    with timed(recorder, 'levels.apply'):
+        lines = line_index(text_unicode)
+        for adj in adjustments_to_make:
+            adj['line'] = lines.line_of(adj['start'])
+        plan = level_adjustment_plan(adjustments_to_make)
+    if recorder is not None: record_level_counters(recorder, all_level_tags_data, block_data_by_start, adjustments_to_make, stats)
+    info = {'tags': len(all_level_tags_data), 'blocks': len(block_data_by_start), 'adjustments': adjustments_to_make}
+    return plan, info
+
+def adjust_levels(text_unicode, tokens=None, recorder=None):
+    """
+    Full headless flow: find tags, compute adjustments, apply. Returns a
+    StageResult. A `recorder` times levels.preprocess / analysis / apply.
+    """
+    plan, info = plan_level_adjustments(text_unicode, tokens, recorder)
+    with timed(recorder, 'levels.apply'):
+        new_text = plan.apply(text_unicode) if plan else document_text(text_unicode)
+    return StageResult(new_text, len(plan), info)
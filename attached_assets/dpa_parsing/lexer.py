@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+# =======================================================
+# LEXER - varredura unica das tags {{...}}
+# =======================================================
+# Uma so passada sobre o documento produz a lista de tokens
+# ({{levelN}}, {{-levelN}}, {{text_level}}, {{footnotenumberN}},
+# marcadores {{(a)}}/{{1.}} ...) com offsets em caracteres e em
+# bytes UTF-8. Todos os estagios consomem esta lista em vez de
+# rodar os seus proprios regex DOTALL sobre o texto inteiro.
+# tokenize_bytes faz a mesma varredura direto sobre os bytes
+# do documento (bytedoc.ByteDocument), sem decodifica-lo.
+# =======================================================
+from __future__ import unicode_literals
+
+import re
+from collections import deque, namedtuple
+
+from .common import RE_ASCII
+
+# --- Tipos de token ---
+LEVEL_OPEN = 'LEVEL_OPEN'                   # {{level2}}
+LEVEL_CLOSE = 'LEVEL_CLOSE'                 # {{-level2}}
+TEXT_LEVEL_OPEN = 'TEXT_LEVEL_OPEN'         # {{text_level}}
+TEXT_LEVEL_CLOSE = 'TEXT_LEVEL_CLOSE'       # {{-text_level}}
+FOOTNOTE_OPEN = 'FOOTNOTE_OPEN'             # {{footnotenumber3}}
+FOOTNOTE_CLOSE = 'FOOTNOTE_CLOSE'           # {{-footnotenumber3}}
+FOOTNOTE_BODY_OPEN = 'FOOTNOTE_BODY_OPEN'   # {{footnote3}}
+FOOTNOTE_BODY_CLOSE = 'FOOTNOTE_BODY_CLOSE' # {{-footnote3}}
+MARKER = 'MARKER'                           # {{(a)}}, {{1.}}, {{iv}} ...
+OTHER = 'OTHER'                             # qualquer outro {{...}}
+
+# Tags cujo formato tambem casa com o padrao de marcador de lista do
+# LEVEL IN 1 LINE (e por isso recebem a juncao "marcador + espaco").
+MARKER_SHAPED_KINDS = frozenset([MARKER, LEVEL_OPEN, FOOTNOTE_OPEN, FOOTNOTE_BODY_OPEN])
+# O que cada familia de estagios le da lista (tokenize_bytes(kinds=...)).
+LEVEL_KINDS = frozenset([LEVEL_OPEN, LEVEL_CLOSE, TEXT_LEVEL_OPEN, TEXT_LEVEL_CLOSE])
+FOOTNOTE_KINDS = frozenset([FOOTNOTE_OPEN, FOOTNOTE_CLOSE, FOOTNOTE_BODY_OPEN, FOOTNOTE_BODY_CLOSE])
+
+# kind: tipo acima; value: numero da tag (texto) ou o proprio marcador
+# start/end: offsets em caracteres; byte_start/byte_end: offsets UTF-8
+Token = namedtuple('Token', ['kind', 'value', 'start', 'end', 'byte_start', 'byte_end'])
+
+# Qualquer {{...}} sem chaves internas - o mesmo universo do '\{\{[^{}]+\}\}'
+# do FIX SEPARATION; nenhum dos padroes antigos aceita chaves no meio.
+# As alternativas ja classificam a tag na mesma varredura (ordem = prioridade).
+TAG_PATTERN = re.compile(r"""
+    \{\{(?:
+          (?P<close>-)?(?P<name>level|footnotenumber|footnote)(?P<number>\d+)
+        | (?P<text_close>-)?(?P<text_level>text_level)
+        | (?P<marker>\s*\(?\s*[a-zA-Z0-9ivxlcdmIVXLCDM\.]+\s*\)?\s*)
+        | (?P<other>[^{}]+)
+    )\}\}
+    """, re.VERBOSE | RE_ASCII)
+
+# O mesmo padrao sobre bytes: \s, \d e [^{}] valem para bytes ASCII, e nenhum
+# byte de um caractere UTF-8 multibyte e ASCII (nem '{' nem '}').
+TAG_PATTERN_B = re.compile(TAG_PATTERN.pattern.encode('ascii'), re.VERBOSE)
+
+_NAMED_KINDS = {
+    ('level', None): LEVEL_OPEN, ('level', '-'): LEVEL_CLOSE,
+    ('footnotenumber', None): FOOTNOTE_OPEN, ('footnotenumber', '-'): FOOTNOTE_CLOSE,
+    ('footnote', None): FOOTNOTE_BODY_OPEN, ('footnote', '-'): FOOTNOTE_BODY_CLOSE,
+}
+
+
+def _is_ascii(text):
+    try: return text.isascii()
+    except AttributeError: # Python < 3.7
+        try: text.encode('ascii'); return True
+        except UnicodeError: return False
+
+def _classify(match):
+    name = match.group('name')
+    if name: return _NAMED_KINDS[(name, match.group('close'))], match.group('number')
+    if match.group('text_level'): return (TEXT_LEVEL_CLOSE if match.group('text_close') else TEXT_LEVEL_OPEN), None
+    marker = match.group('marker')
+    if marker is not None: return MARKER, marker.strip()
+    return OTHER, match.group('other')
+
+_NAMED_KINDS_B = dict(((name.encode('ascii'), close), kind) for (name, close), kind in _NAMED_KINDS.items())
+
+def _classify_bytes(match, encoding):
+    close, name, number, text_close, text_level, marker, other = match.groups()
+    if name: return _NAMED_KINDS_B[(name, '-' if close else None)], number.decode('ascii')
+    if text_level: return (TEXT_LEVEL_CLOSE if text_close else TEXT_LEVEL_OPEN), None
+    if marker is not None: return MARKER, marker.strip().decode('ascii')
+    return OTHER, other.decode(encoding)
+
+def tokenize(text):
+    """Single linear scan of a unicode document. Returns the list of Tokens in order."""
+    scanned = getattr(text, 'tokens', None) # bytedoc.ByteDocument: varrido ao ser criado
+    if scanned is not None: return scanned
+    tokens = []
+    ascii_only = _is_ascii(text)
+    last_char = 0; last_byte = 0
+    for match in TAG_PATTERN.finditer(text):
+        start, end = match.span()
+        kind, value = _classify(match)
+        if ascii_only:
+            byte_start, byte_end = start, end
+        else:
+            # Os bytes so mudam no texto entre tags; a tag em si e ASCII ou curta.
+            byte_start = last_byte + len(text[last_char:start].encode('utf-8'))
+            byte_end = byte_start + len(match.group(0).encode('utf-8'))
+            last_char, last_byte = end, byte_end
+        tokens.append(Token(kind, value, start, end, byte_start, byte_end))
+    return tokens
+
+def tokenize_bytes(data, char_count, encoding='utf-8', kinds=None):
+    """
+    tokenize() over the encoded document `data` (bytes, or a buffer such as an
+    mmap). Character offsets are counted in the bytes between tags with
+    char_count(byte_start, byte_end) (bytedoc.OffsetMap.char_count). Only tag
+    values are decoded. With `kinds`, only tokens of those kinds are kept, each
+    with the token right after it (so "is the next tag its close?" still holds).
+    """
+    tokens = []
+    last_char = 0; last_byte = 0; keep_next = False
+    for match in TAG_PATTERN_B.finditer(data):
+        byte_start, byte_end = match.span()
+        kind, value = _classify_bytes(match, encoding)
+        start = last_char + char_count(last_byte, byte_start) if byte_start > last_byte else last_char
+        # So o {{...}} livre pode ter nao-ASCII; as outras tags sao ASCII pelo padrao
+        end = start + (len(value) + 4 if kind == OTHER else byte_end - byte_start)
+        last_char, last_byte = end, byte_end
+        if kinds is None: tokens.append(Token(kind, value, start, end, byte_start, byte_end)); continue
+        if keep_next or kind in kinds: tokens.append(Token(kind, value, start, end, byte_start, byte_end))
+        keep_next = kind in kinds
+    return tokens
+
+# ======================
+# PAREAMENTO
+# ======================
+def pair_any_close(tokens, open_kind, close_kind):
+    """
+    Pairs like '(OPEN)(.*?)(CLOSE)' with re.DOTALL: every OPEN takes the first
+    CLOSE after it (any number); OPENs inside a pair are just content.
+    """
+    pairs = []; pending = None
+    for token in tokens:
+        if token.kind == open_kind:
+            if pending is None: pending = token
+        elif token.kind == close_kind and pending is not None:
+            pairs.append((pending, token)); pending = None
+    return pairs
+
+def pair_same_number(tokens, open_kind, close_kind):
+    """
+    Pairs like '(OPEN(\\d+))(.*?)(CLOSE\\2)' with re.DOTALL: an OPEN takes the
+    first CLOSE with the same number; an OPEN without one is skipped. O(n) also
+    when closes are missing: the CLOSE indexes of each number wait in a queue
+    and, as the scan only moves forward, each one is dropped at most once.
+    """
+    closes = {}
+    for index, token in enumerate(tokens):
+        if token.kind == close_kind: closes.setdefault(token.value, deque()).append(index)
+    pairs = []; i = 0; count = len(tokens)
+    while i < count:
+        token = tokens[i]
+        if token.kind == open_kind:
+            waiting = closes.get(token.value)
+            while waiting and waiting[0] < i: waiting.popleft() # CLOSEs ja dentro de um par ou antes deste OPEN
+            if waiting:
+                i = waiting.popleft()
+                pairs.append((token, tokens[i]))
+        i += 1
+    return pairs
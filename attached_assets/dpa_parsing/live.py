@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+# =======================================================
+# LIVE - realinhamento incremental enquanto se edita
+# =======================================================
+# O Text Aligner ao vivo (TEXT ALIGNER LIVE.py) acompanha
+# as notificacoes MODIFIED do Scintilla: DirtyLines guarda
+# o intervalo de linhas alteradas desde o ultimo
+# alinhamento e realign_region refaz so a secao de topo que
+# o contem. Como em parallel.py, a secao vai de um titulo
+# de topo (PART, CHAPTER, ANNEX ...) ate o proximo: nenhum
+# passo (nem a janela de lookahead do Pass 2 / 2.5) olha
+# alem deles, e o resto do documento, ja alinhado, fica
+# como esta (o alinhamento e idempotente).
+# =======================================================
+from __future__ import unicode_literals
+
+from .aligner import LT_HEADING_UPPER, blank_lines_between
+from .parallel import align_chunk, is_safe_cut
+
+
+class DirtyLines(object):
+    """
+    Smallest line range [first, last] covering the edits reported so far,
+    kept valid while lines are added or removed above, inside or below it.
+    """
+
+    def __init__(self):
+        self.first = None
+        self.last = None
+
+    def __bool__(self):
+        return self.first is not None
+    __nonzero__ = __bool__ # Python 2
+
+    def clear(self):
+        self.first = self.last = None
+
+    def mark(self, line, lines_added=0):
+        """An edit at `line` that added (or, negative, removed) lines_added lines after it."""
+        if self.first is not None:
+            if lines_added < 0 and self.first > line: self.first = max(line, self.first + lines_added)
+            elif self.first > line: self.first += lines_added
+            if lines_added < 0 and self.last > line: self.last = max(line, self.last + lines_added)
+            elif self.last > line: self.last += lines_added
+        first, last = line, line + max(lines_added, 0)
+        if self.first is None or first < self.first: self.first = first
+        if self.last is None or last > self.last: self.last = last
+
+    def contains(self, line):
+        return self.first is not None and self.first <= line <= self.last
+
+
+def region_bounds(get_line, line_count, first, last):
+    """
+    (start, end): the lines [start, end) from the last top-level heading
+    before `first` (or 0) up to the first one after `last` (or line_count).
+    A heading at `first` itself does not end the search: the edit may have
+    touched the blank lines before it, which belong to the previous section.
+    """
+    start = min(first - 1, line_count - 1)
+    while start > 0 and not is_safe_cut(get_line(start)): start -= 1
+    end = last + 1
+    while end < line_count and not is_safe_cut(get_line(end)): end += 1
+    return max(start, 0), min(end, line_count)
+
+def realign_region(get_line, line_count, first, last, eol=u"\n"):
+    """
+    Re-runs the Text Aligner over the section(s) holding the lines first..last.
+    get_line(i) returns line i (unicode, with or without its EOL). Returns
+    (start, end, replacement, stats): replacement stands for the lines
+    [start, end), including the blank lines before the heading at `end` and
+    the EOL that ends the region when end < line_count.
+    """
+    if line_count <= 0: return 0, 0, u"", {}
+    start, end = region_bounds(get_line, line_count, first, last)
+    while True:
+        output_lines, first_type, _, last_type, stats = align_chunk([get_line(i) for i in range(start, end)])
+        if first_type is not None or start == 0: break
+        # Secao so com linhas em branco: os brancos antes do proximo titulo dependem da secao anterior
+        start, _ = region_bounds(get_line, line_count, start - 1, start - 1)
+    if end < line_count:
+        if last_type is not None: output_lines.extend([u""] * blank_lines_between(last_type, LT_HEADING_UPPER))
+        output_lines.append(u"") # EOL antes do titulo em `end`
+    return start, end, eol.join(output_lines), stats
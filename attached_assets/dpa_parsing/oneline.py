@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+# =======================================================
+# LEVEL IN 1 LINE - motor
+# =======================================================
+# JUNTA em uma unica linha:
+# 1. Blocos {{levelN}} com seu texto seguinte.
+# 2. Texto com sua tag final {{-levelN}}.
+# 3. Marcadores de lista {{([a|1|i]...)}} com seu texto seguinte.
+# Remove newlines/espacos APENAS nos pontos de juncao.
+# =======================================================
+# As tres passagens eram tres subn() sobre o texto inteiro:
+#   1. (\{\{level\d+\}\})(\s*\n\s*)(?=\S)                  -> \1
+#   2. (\S)(\s*\n\s*)(\{\{-level\d+\}\})                  -> \1\3
+#   3. (\{\{\s*\(?\s*[a-zA-Z0-9.]+\s*\)?\s*\}\})(\s*\n\s*)(?=\S) -> '\1 '
+# Agora cada passagem decide sobre os tokens do lexer e o texto e
+# reconstruido uma unica vez. \s aqui e so ASCII (o editor entregava bytes).
+# =======================================================
+from __future__ import unicode_literals
+
+from .common import StageResult
+from .editplan import EditPlan
+from .lexer import LEVEL_CLOSE, LEVEL_OPEN, MARKER_SHAPED_KINDS, tokenize
+
+ASCII_WHITESPACE = ' \t\n\r\x0b\x0c'
+DELETE = ''
+SINGLE_SPACE = ' '
+
+
+def _run_end(text, position):
+    """End of the (maximal) whitespace run starting at position."""
+    length = len(text)
+    while position < length and text[position] in ASCII_WHITESPACE: position += 1
+    return position
+
+def _run_start(text, position):
+    """Start of the (maximal) whitespace run ending at position."""
+    while position > 0 and text[position - 1] in ASCII_WHITESPACE: position -= 1
+    return position
+
+def plan_joins(text, tokens):
+    """
+    Decides the three join passes on the original text. Returns
+    (EditPlan, [count_pass1, count_pass2, count_pass3]).
+    """
+    length = len(text)
+    joins = {}; counts = [0, 0, 0]
+
+    # Passagem 1: {{levelN}} + whitespace com \n + nao-espaco -> remove o whitespace
+    for token in tokens:
+        if token.kind != LEVEL_OPEN: continue
+        run_end = _run_end(text, token.end)
+        if run_end < length and u'\n' in text[token.end:run_end]:
+            joins[token.end] = (run_end, DELETE); counts[0] += 1
+
+    # Passagem 2: nao-espaco + whitespace com \n + {{-levelN}} -> remove o whitespace.
+    # O (\S) consumido nao pode pertencer ao casamento anterior: um {{-levelN}}
+    # que acabou de ser juntado nao serve de (\S) para o seguinte.
+    previous = None; joined_previous = False
+    for token in tokens:
+        joined = False
+        if token.kind == LEVEL_CLOSE:
+            run_start = _run_start(text, token.start)
+            blocked = joined_previous and previous.end == run_start
+            if 0 < run_start < token.start and run_start not in joins and not blocked \
+               and u'\n' in text[run_start:token.start]:
+                joins[run_start] = (token.start, DELETE); counts[1] += 1
+                joined = True
+        previous = token; joined_previous = joined
+
+    # Passagem 3: marcador + whitespace com \n + nao-espaco -> '\1 '
+    for token in tokens:
+        if token.kind not in MARKER_SHAPED_KINDS or token.end in joins: continue
+        run_end = _run_end(text, token.end)
+        if run_end < length and u'\n' in text[token.end:run_end]:
+            joins[token.end] = (run_end, SINGLE_SPACE); counts[2] += 1
+
+    plan = EditPlan()
+    for run_start in sorted(joins):
+        run_end, replacement = joins[run_start]
+        plan.replace(run_start, run_end, replacement)
+    return plan, counts
+
+def join_tags_to_text(text, tokens=None):
+    """The three join passes. Returns a StageResult (changes = total substitutions)."""
+    if tokens is None: tokens = tokenize(text)
+    plan, counts = plan_joins(text, tokens)
+    info = {'start_joins': counts[0], 'end_joins': counts[1], 'marker_joins': counts[2]}
+    return StageResult(plan.apply(text), sum(counts), info)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+# =======================================================
+# PARALLEL ALIGN - Text Aligner em pedacos, em paralelo
+# =======================================================
+# Um documento grande e cortado em titulos de topo (PART,
+# CHAPTER, ANNEX ... = LT_HEADING_UPPER), cada pedaco passa
+# pelo Text Aligner num processo e os resultados sao
+# costurados de volta. O corte so acontece onde nenhum
+# passo enxerga atravessando a costura:
+#   Pass 1   - o tipo de um titulo nao depende da linha
+#              anterior (o contexto de preambulo so decide
+#              linhas cuja 1a palavra NAO e palavra-chave);
+#   Pass 2   - titulos estao em NON_MERGE_TYPES: nenhum
+#              marcador do pedaco anterior os absorve;
+#   Pass 2.5 - o titulo e MAJOR_STRUCTURAL e comeca com
+#              palavra-chave: nao vira descricao nem deixa
+#              a descricao antes dele ser juntada, igual a
+#              um fim de documento;
+#   Pass 3   - as linhas em branco da costura sao refeitas
+#              com blank_lines_between (ultimo tipo do
+#              pedaco anterior x primeiro tipo do seguinte).
+# Os processos recebem os language packs registrados aqui
+# (no "spawn" do Windows eles reimportam o pacote e so
+# veriam os packs embutidos).
+# O resultado e identico ao align_text sequencial (o texto
+# e os contadores; so regex_calls pode ser menor: o Pass 2.5
+# de um pedaco nao testa a linha depois do seu fim).
+# =======================================================
+from __future__ import unicode_literals
+
+import multiprocessing
+
+from .aligner import (ALIGN_STATS, LT_HEADING_UPPER, blank_lines_between, identify_line_type,
+                      iter_description_merges, iter_identified, iter_marker_merges, iter_spaced_lines)
+from .common import StageResult
+from .instrument import timed
+from .vocabulary import DEFAULT_VOCABULARY, install_language_packs, language_pack_snapshot
+
+# Pedacos menores que isto nao compensam o envio para outro processo.
+MIN_CHUNK_LINES = 2000
+# Pedacos por processo (equilibra capitulos de tamanhos diferentes).
+CHUNKS_PER_PROCESS = 4
+
+
+def is_safe_cut(line):
+    """True when the raw line may start a chunk: a top-level (UPPER) heading."""
+    # Filtro barato: linha comecando por uma palavra-chave de titulo. Perder um candidato
+    # so deixa um pedaco maior; quem decide o corte e identify_line_type.
+    return bool(DEFAULT_VOCABULARY.heading_start_pattern().match(line)) and identify_line_type(line) == LT_HEADING_UPPER
+
+def find_cuts(raw_lines, chunk_count, min_chunk_lines=MIN_CHUNK_LINES):
+    """
+    Start indices of the chunks (always beginning with 0): the first safe
+    cut at least len/chunk_count (and min_chunk_lines) lines after the last.
+    """
+    cuts = [0]
+    chunk_lines = max(min_chunk_lines, len(raw_lines) // max(chunk_count, 1), 1)
+    next_target = chunk_lines
+    while next_target < len(raw_lines):
+        index = next_target
+        while index < len(raw_lines) and not is_safe_cut(raw_lines[index]): index += 1
+        if index >= len(raw_lines): break
+        cuts.append(index)
+        next_target = index + chunk_lines
+    return cuts
+
+def align_chunk(raw_lines):
+    """
+    Worker: Text Aligner over one chunk. Returns (output_lines, first_type,
+    first_was_split, last_type, stats); the types are None for an empty chunk.
+    """
+    stats = dict((key, 0) for key in ALIGN_STATS)
+    line_records = iter_identified(raw_lines, stats)
+    line_records = iter_marker_merges(line_records, stats)
+    line_records = list(iter_description_merges(line_records, stats))
+    output_lines = list(iter_spaced_lines(line_records, stats))
+    if not line_records: return output_lines, None, False, None, stats
+    return output_lines, line_records[0].type, line_records[0].was_split, line_records[-1].type, stats
+
+def stitch_chunks(chunk_results):
+    """Joins align_chunk results in order, redoing the Pass 3 blank lines at each seam."""
+    output_lines = []
+    stats = dict((key, 0) for key in ALIGN_STATS)
+    last_type = None
+    for lines, first_type, first_was_split, chunk_last_type, chunk_stats in chunk_results:
+        for key in ALIGN_STATS: stats[key] += chunk_stats[key]
+        if first_type is None: continue
+        if last_type is not None:
+            blanks = blank_lines_between(last_type, first_type, first_was_split)
+            output_lines.extend([u""] * blanks)
+            stats['lines_out'] += blanks
+        output_lines.extend(lines)
+        last_type = chunk_last_type
+    return output_lines, stats
+
+def align_chunks(chunks, processes=1):
+    """
+    align_chunk over every chunk, in order; by a process pool when processes > 1.
+    The workers get this process's language packs, whatever the start method.
+    """
+    if processes <= 1 or len(chunks) <= 1: return [align_chunk(chunk) for chunk in chunks]
+    pool = multiprocessing.Pool(min(processes, len(chunks)), install_language_packs, (language_pack_snapshot(),))
+    try:
+        results = pool.map(align_chunk, chunks, chunksize=1)
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return results
+
+def align_text_parallel(text_unicode, processes=0, min_chunk_lines=MIN_CHUNK_LINES, recorder=None):
+    """
+    align_text with the document split at top-level headings and the chunks
+    aligned by `processes` workers (0 = one per CPU). Same StageResult as
+    align_text; documents without enough cuts run in this process. A
+    `recorder` times align.cut / align.chunks / align.stitch.
+    """
+    if processes <= 0: processes = multiprocessing.cpu_count()
+    raw_lines = text_unicode.splitlines()
+    with timed(recorder, 'align.cut'):
+        cuts = find_cuts(raw_lines, processes * CHUNKS_PER_PROCESS, min_chunk_lines)
+        chunks = [raw_lines[start:end] for start, end in zip(cuts, cuts[1:] + [len(raw_lines)])]
+    with timed(recorder, 'align.chunks'): results = align_chunks(chunks, processes)
+    with timed(recorder, 'align.stitch'): output_lines, stats = stitch_chunks(results)
+    if recorder is not None:
+        recorder.add_counters('align', stats); recorder.count('align.chunks', len(chunks))
+    return StageResult(u"\n".join(output_lines), stats['splits'] + stats['marker_merges'] + stats['description_merges'], stats)
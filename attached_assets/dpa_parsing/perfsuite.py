@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+# =======================================================
+# PERFSUITE - desempenho de cada estagio contra um baseline
+# =======================================================
+# Uso:
+#   python -m dpa_parsing.perfsuite                     (escalas 1, 10, 100)
+#   python -m dpa_parsing.perfsuite --scales 1,10,100,1000
+#   python -m dpa_parsing.perfsuite --save-baseline     (grava perf_baseline.json)
+# Cada estagio roda sobre a sua entrada real (align sobre
+# original.txt, os demais sobre parsed.txt) e sobre copias
+# N vezes maiores, com artigos e notas renumerados em cada
+# copia (a sequencia de notas continua valida). Mede MB/s,
+# linhas/s, tags/s e o pico de memoria (tracemalloc, so no
+# Python 3) e compara com o baseline gravado: vazao abaixo
+# ou memoria acima da tolerancia e REGRESSAO (saida 1).
+# =======================================================
+from __future__ import print_function, unicode_literals
+
+import argparse
+import io
+import json
+import os
+import re
+import sys
+import timeit
+
+try:
+    import tracemalloc
+except ImportError: # Python 2 (PythonScript)
+    tracemalloc = None
+
+from .bench import SAMPLE_DIR
+from .levels import find_level_tags, perform_level_adjustment_v4_10
+from .lexer import tokenize
+from .pipeline import STAGES, TOKEN_STAGES
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'perf_baseline.json')
+DEFAULT_SCALES = (1, 10, 100)
+DEFAULT_TOLERANCE = 0.30 # 30%: ruido de tempo entre execucoes na mesma maquina
+MEGABYTE = 1024.0 * 1024.0
+# Execucoes por medida (vale a melhor): as entradas pequenas oscilam mais.
+REPEATS = {1: 7, 10: 3}
+PYTHON_KEY = 'python{}'.format(sys.version_info[0])
+
+# (nome, arquivo de entrada); 'levels.analysis' = so perform_level_adjustment_v4_10
+SUITE = [
+    ('align', 'original.txt'),
+    ('oneline', 'parsed.txt'),
+    ('separate', 'parsed.txt'),
+    ('breaklines', 'parsed.txt'),
+    ('levels', 'parsed.txt'),
+    ('levels.analysis', 'parsed.txt'),
+    ('footnotes', 'parsed.txt'),
+]
+
+# ======================
+# ESCALA (copias renumeradas)
+# ======================
+ARTICLE_NUMBER = re.compile(r"\b(Article\s+)(\d+)")
+FOOTNOTE_NUMBER_TAG = re.compile(r"\{\{footnotenumber(\d+)\}\}(\d+)\{\{-footnotenumber(\d+)\}\}")
+FOOTNOTE_BODY_TAG = re.compile(r"(\{\{-?footnote)(\d+)(\}\})")
+
+def _max_number(pattern, text, group):
+    return max([int(match.group(group)) for match in pattern.finditer(text)] or [0])
+
+def renumbered_copy(text, article_offset, footnote_offset):
+    """`text` with every "Article N" and footnote number shifted by the offsets."""
+    if article_offset: text = ARTICLE_NUMBER.sub(lambda m: m.group(1) + str(int(m.group(2)) + article_offset), text)
+    if footnote_offset:
+        text = FOOTNOTE_NUMBER_TAG.sub(lambda m: u"{{{{footnotenumber{}}}}}{}{{{{-footnotenumber{}}}}}".format(
+            *(int(number) + footnote_offset for number in m.groups())), text)
+        text = FOOTNOTE_BODY_TAG.sub(lambda m: m.group(1) + str(int(m.group(2)) + footnote_offset) + m.group(3), text)
+    return text
+
+def scaled_sample(name, times):
+    """attached_assets/<name> repeated `times` times; copy k continues the article and footnote numbering."""
+    with io.open(os.path.join(SAMPLE_DIR, name), encoding='utf-8') as handle:
+        text = handle.read()
+    articles = _max_number(ARTICLE_NUMBER, text, 2)
+    footnotes = max(_max_number(FOOTNOTE_NUMBER_TAG, text, 2), _max_number(FOOTNOTE_BODY_TAG, text, 2))
+    return u"\n\n".join(renumbered_copy(text, copy * articles, copy * footnotes) for copy in range(times))
+
+# ======================
+# MEDICAO
+# ======================
+def stage_runner(name, text):
+    """A no-argument callable running one suite entry over `text` (tokenize included)."""
+    if name == 'levels.analysis':
+        all_level_tags_data, block_data_by_start = find_level_tags(text)
+        return lambda: perform_level_adjustment_v4_10(all_level_tags_data, block_data_by_start)
+    stage = STAGES[name]
+    if name in TOKEN_STAGES: return lambda: stage(text, tokens=tokenize(text))
+    return lambda: stage(text)
+
+def measure(name, text, repeat, memory=True):
+    """One result row: seconds (best of `repeat`), throughput and peak memory (MB, or None)."""
+    run = stage_runner(name, text)
+    seconds = min(timeit.repeat(run, number=1, repeat=repeat))
+    peak = None
+    if memory and tracemalloc is not None:
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1] / MEGABYTE
+        finally:
+            tracemalloc.stop()
+    size_mb = len(text.encode('utf-8')) / MEGABYTE
+    lines = text.count(u"\n") + 1
+    tags = len(tokenize(text))
+    return {'seconds': seconds, 'mb': size_mb, 'mb_per_s': size_mb / seconds, 'lines_per_s': lines / seconds,
+            'tags_per_s': tags / seconds, 'peak_mb': peak}
+
+def run_suite(scales, memory=True, report=None):
+    """{"<stage>@x<scale>": row} for every suite entry and scale; report(key, row) after each one."""
+    results = {}
+    for times in scales:
+        samples = {}
+        for name, sample in SUITE:
+            if sample not in samples: samples[sample] = scaled_sample(sample, times)
+            key = u"{}@x{}".format(name, times)
+            results[key] = measure(name, samples[sample], repeat=REPEATS.get(times, 1), memory=memory)
+            if report is not None: report(key, results[key])
+    return results
+
+def format_row(key, row, baseline_row=None):
+    text = u"  {:<22} {:>8.2f} MB {:>9.1f} ms {:>8.2f} MB/s {:>10.0f} lines/s {:>10.0f} tags/s".format(
+        key, row['mb'], row['seconds'] * 1000, row['mb_per_s'], row['lines_per_s'], row['tags_per_s'])
+    text += u"   peak {:>7.1f} MB".format(row['peak_mb']) if row['peak_mb'] is not None else u"   peak     n/a"
+    if baseline_row: text += u"   ({:+.0f}% vs baseline)".format((row['mb_per_s'] / baseline_row['mb_per_s'] - 1) * 100)
+    return text
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Regression messages: throughput below or peak memory above the baseline by more than `tolerance`."""
+    regressions = []
+    for key in sorted(results):
+        row = results[key]; base = baseline.get(key)
+        if not base: continue
+        if row['mb_per_s'] < base['mb_per_s'] * (1 - tolerance):
+            regressions.append(u"{}: {:.2f} MB/s vs baseline {:.2f} MB/s ({:+.0f}%)".format(
+                key, row['mb_per_s'], base['mb_per_s'], (row['mb_per_s'] / base['mb_per_s'] - 1) * 100))
+        if row['peak_mb'] is not None and base.get('peak_mb') and row['peak_mb'] > base['peak_mb'] * (1 + tolerance):
+            regressions.append(u"{}: peak {:.1f} MB vs baseline {:.1f} MB ({:+.0f}%)".format(
+                key, row['peak_mb'], base['peak_mb'], (row['peak_mb'] / base['peak_mb'] - 1) * 100))
+    return regressions
+
+def _read_json(path):
+    if not os.path.exists(path): return {}
+    with io.open(path, encoding='utf-8') as handle:
+        return json.load(handle)
+
+def _write_json(path, data):
+    with io.open(path, 'w', encoding='utf-8') as handle:
+        handle.write(json.dumps(data, indent=1, sort_keys=True, separators=(',', ': ')) + u"\n")
+
+def load_baseline(path):
+    """Baseline results of this Python major version (Python 2 and 3 keep separate numbers)."""
+    return _read_json(path).get(PYTHON_KEY, {})
+
+def save_baseline(path, results):
+    data = _read_json(path)
+    data[PYTHON_KEY] = results
+    _write_json(path, data)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m dpa_parsing.perfsuite',
+                                     description='Per-stage throughput and memory on original.txt / parsed.txt scale-ups, checked against a baseline.')
+    parser.add_argument('--scales', default=','.join(str(scale) for scale in DEFAULT_SCALES),
+                        help='comma-separated replication factors (default: %(default)s)')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline JSON (default: dpa_parsing/perf_baseline.json)')
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed slowdown / memory growth as a fraction (default: %(default)s)')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc peak-memory runs')
+    parser.add_argument('--json', metavar='PATH', help='also write the results to PATH')
+    args = parser.parse_args(argv)
+
+    baseline = load_baseline(args.baseline)
+    scales = [int(scale) for scale in args.scales.split(',')]
+    print(u"dpa_parsing perfsuite, scales {}{}".format(scales, u"" if baseline else u" (no baseline)"))
+    results = run_suite(scales, memory=not args.no_memory,
+                        report=lambda key, row: print(format_row(key, row, baseline.get(key))))
+    if args.json: _write_json(args.json, results)
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(u"Baseline saved to {}".format(args.baseline))
+        return 0
+    if not baseline: return 0
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(u"\nPERFORMANCE REGRESSION ({} > {:.0f}% tolerance):".format(len(regressions), args.tolerance * 100), file=sys.stderr)
+        for message in regressions: print(u"  " + message, file=sys.stderr)
+        return 1
+    print(u"\nNo regression beyond {:.0f}% tolerance.".format(args.tolerance * 100))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
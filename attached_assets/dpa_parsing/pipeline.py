@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+# =======================================================
+# PIPELINE - varios estagios sobre um unico documento
+# =======================================================
+# No fluxo real os seis scripts rodam em sequencia e cada
+# um faz getText/decode/encode/setText. O Pipeline decodifica
+# uma vez, passa o mesmo Document de estagio em estagio
+# (com os tokens do lexer reaproveitados enquanto o texto
+# nao muda), mede o tempo de cada estagio e so codifica e
+# escreve no fim. Com um instrument.Recorder, o tempo de
+# cada estagio, do tokenize e dos passos internos (align,
+# levels, footnotes) vai para o registro da execucao.
+# =======================================================
+from __future__ import unicode_literals
+
+from collections import OrderedDict, namedtuple
+from functools import partial
+from timeit import default_timer
+
+from .aligner import align_text
+from .breaklines import insert_breakline_markers
+from .cache import cached_align_text
+from .common import LineIndex, decode_document, encode_document
+from .footnotes import audit_footnote_sequence, fix_footnote_sequence
+from .instrument import timed
+from .levels import adjust_levels
+from .lexer import tokenize
+from .oneline import join_tags_to_text
+from .parallel import align_text_parallel
+from .separation import join_then_force_separate
+
+# Estagios na ordem do fluxo de trabalho real.
+STAGES = OrderedDict([
+    ('align', align_text),                      # Text Aligner.py
+    ('oneline', join_tags_to_text),             # LEVEL IN 1 LINE.py
+    ('separate', join_then_force_separate),     # FIX SEPARATION LVL-AutoPasring.py
+    ('breaklines', insert_breakline_markers),   # Break-LevelX.py
+    ('levels', adjust_levels),                  # LVL CORRECTION.py
+    ('footnotes', fix_footnote_sequence),       # FIX FOOTNOTE SEQUENCE.py
+    ('audit', audit_footnote_sequence),         # so relatorio: todas as anomalias das notas
+])
+# Estagios que aceitam tokens= (reaproveitam a varredura do lexer)
+TOKEN_STAGES = frozenset(['oneline', 'separate', 'breaklines', 'levels', 'footnotes', 'audit'])
+# Estagios que aceitam recorder= (tempos por passo e contadores)
+INSTRUMENTED_STAGES = frozenset(['align', 'levels', 'footnotes'])
+
+def build_stages(align_workers=None, cache=None):
+    """
+    STAGES with "align" swapped for align_text_parallel (align_workers
+    processes) and/or cached_align_text (cache = a SectionCache) when asked.
+    """
+    if align_workers is None and cache is None: return STAGES
+    stages = OrderedDict(STAGES)
+    if cache is not None:
+        stages['align'] = partial(cached_align_text, cache=cache, processes=1 if align_workers is None else align_workers)
+    else:
+        stages['align'] = partial(align_text_parallel, processes=align_workers)
+    return stages
+
+# name: estagio; result: StageResult; seconds: tempo de parede do estagio
+StageRun = namedtuple('StageRun', ['name', 'result', 'seconds'])
+
+
+class Document(object):
+    """
+    The unicode text shared by the stages, with its source encoding and the
+    data derived from it (lexer tokens, LineIndex), rebuilt only after the
+    text actually changes.
+    """
+
+    def __init__(self, text, encoding='utf-8'):
+        self.encoding = encoding
+        self._text = text
+        self._tokens = None
+        self._lines = None
+
+    @classmethod
+    def from_bytes(cls, byte_string):
+        text, encoding = decode_document(byte_string)
+        return cls(text, encoding)
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, new_text):
+        # Os estagios devolvem o mesmo objeto quando nada muda
+        if new_text is self._text: return
+        self._text = new_text
+        self._tokens = None; self._lines = None
+
+    @property
+    def tokens(self):
+        if self._tokens is None: self._tokens = tokenize(self._text)
+        return self._tokens
+
+    @property
+    def lines(self):
+        if self._lines is None: self._lines = LineIndex(self._text)
+        return self._lines
+
+    def to_bytes(self):
+        return encode_document(self._text, self.encoding)
+
+
+class Pipeline(object):
+    """
+    Ordered stages run over one Document. run() returns a StageRun per stage.
+    With a `recorder` (instrument.Recorder) every stage is timed under its name.
+    """
+
+    def __init__(self, stage_names, force_footnotes=False, stages=STAGES, recorder=None):
+        self.stages = stages
+        self.recorder = recorder
+        unknown = [name for name in stage_names if name not in self.stages]
+        if unknown: raise ValueError("Unknown stage(s): {}".format(', '.join(unknown)))
+        self.stage_names = list(stage_names)
+        self.force_footnotes = force_footnotes
+
+    def run_stage(self, name, document):
+        started = default_timer() # inclui o tokenize, quando o estagio precisa de um novo
+        kwargs = {}
+        if name in TOKEN_STAGES:
+            with timed(self.recorder, 'tokenize'): kwargs['tokens'] = document.tokens
+        if name == 'footnotes': kwargs['force'] = self.force_footnotes
+        if self.recorder is not None and name in INSTRUMENTED_STAGES: kwargs['recorder'] = self.recorder
+        result = self.stages[name](document.text, **kwargs)
+        seconds = default_timer() - started
+        if self.recorder is not None: self.recorder.add_time(name, seconds)
+        document.text = result.text
+        return StageRun(name, result, seconds)
+
+    def run(self, document):
+        return [self.run_stage(name, document) for name in self.stage_names]
+
+
+def format_timings(runs):
+    """One line per stage: name, changes and milliseconds (plus the total)."""
+    lines = [u"{:<12} changes={:<6} {:>9.1f} ms".format(run.name, run.result.changes, run.seconds * 1000) for run in runs]
+    lines.append(u"{:<12} {:<14} {:>9.1f} ms".format(u"total", u"", sum(run.seconds for run in runs) * 1000))
+    return u"\n".join(lines)
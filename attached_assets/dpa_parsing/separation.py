@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# =======================================================
+# FIX SEPARATION LVL - motor
+# =======================================================
+# COMBINA TRES OPERACOES EM SEQUENCIA:
+# 1. JUNTA tags/marcadores ao texto (mesmas passagens do LEVEL IN 1 LINE).
+# 2. FORCA SEPARACAO: cada tag {{...}} isolada por quebras de linha.
+# 3. ADICIONA BLANKS: UMA linha em branco entre cada linha/tag,
+#    removendo linhas totalmente vazias.
+# =======================================================
+from __future__ import unicode_literals
+
+import re
+
+from .common import StageResult
+from .lexer import tokenize
+from .oneline import join_tags_to_text, plan_joins
+
+# Adiciona \n ANTES de QUALQUER {{...}} se nao houver \n antes.
+SEPARATE_BEFORE_PATTERN = re.compile(r'(?<!\n)(\{\{[^{}]+\}\})')
+# Adiciona \n DEPOIS de QUALQUER {{...}} se nao houver \n depois.
+SEPARATE_AFTER_PATTERN = re.compile(r'(\{\{[^{}]+\}\})(?!\n)')
+# Quebras reconhecidas por bytes.splitlines() (o editor entregava bytes).
+LINE_BREAK_PATTERN = re.compile(r'\r\n|\r|\n')
+
+
+# ======================
+# VERSAO EM UMA PASSADA
+# ======================
+# As Fases 2 e 3 juntas equivalem a: cortar o texto da Fase 1 em cada quebra
+# de linha e em cada borda de tag {{...}}, descartar os pedacos vazios e
+# juntar com "\n\n". As juncoes da Fase 1 so trocam whitespace ENTRE uma tag
+# e o texto vizinho, entao as tags do texto juntado sao os proprios tokens
+# do original: basta percorrer o original uma vez, aplicando as juncoes nos
+# intervalos entre tags e emitindo as linhas finais pelo caminho.
+def iter_separated_lines(text, tokens, plan):
+    """
+    Yields the non-empty output lines of Phases 1-3 in one left-to-right walk
+    over the original text: `tokens` from the lexer, `plan` from plan_joins().
+    """
+    edits = plan.edits(); edit_count = len(edits); e = 0
+    pending = [] # pedacos da linha corrente
+    position = 0
+    for token in tokens + [None]:
+        gap_end = token.start if token is not None else len(text)
+        # Intervalo entre tags, com as juncoes da Fase 1 aplicadas
+        pieces = []
+        while e < edit_count and edits[e].start < gap_end:
+            edit = edits[e]
+            pieces.append(text[position:edit.start]); pieces.append(edit.replacement)
+            position = edit.end; e += 1
+        pieces.append(text[position:gap_end])
+        for piece in pieces:
+            parts = LINE_BREAK_PATTERN.split(piece)
+            pending.append(parts[0])
+            for part in parts[1:]:
+                line = ''.join(pending)
+                if line: yield line
+                pending = [part]
+        line = ''.join(pending)
+        if line: yield line
+        pending = []
+        if token is None: break
+        # A tag vira linha(s) propria(s); [^{}]+ pode conter quebras
+        for part in LINE_BREAK_PATTERN.split(text[token.start:token.end]):
+            if part: yield part
+        position = token.end
+
+def join_then_force_separate(text, tokens=None):
+    """Phases 1-3 of format_join_then_force_separate_final() in one pass. Returns a StageResult."""
+    if tokens is None: tokens = tokenize(text)
+    plan, counts = plan_joins(text, tokens)
+    processed_lines = list(iter_separated_lines(text, tokens, plan))
+    final_text = "\n\n".join(processed_lines)
+    joins = sum(counts)
+    # changes = juncoes da Fase 1; so separacao/espacamento conta como 1
+    changes = 0 if final_text == text else max(joins, 1)
+    return StageResult(final_text, changes, {'joins': joins, 'lines': len(processed_lines)})
+
+
+# ======================
+# VERSAO EM FASES (referencia)
+# ======================
+def join_then_force_separate_phased(text):
+    """The original five rewrites (3 join passes, 2 re.sub, split/join); reference for the one-pass version."""
+    # FASE 1: JUNTAR TAGS/MARCADORES AO TEXTO
+    joined = join_tags_to_text(text)
+
+    # FASE 2: FORCAR SEPARACAO DE TODAS AS TAGS {{...}}
+    text_sep1 = SEPARATE_BEFORE_PATTERN.sub(r'\n\1', joined.text)
+    text_sep2 = SEPARATE_AFTER_PATTERN.sub(r'\1\n', text_sep1)
+
+    # FASE 3: ADICIONAR LINHAS EM BRANCO FINAIS
+    # Filtra APENAS linhas que sao literalmente strings vazias ('').
+    processed_lines = [line for line in LINE_BREAK_PATTERN.split(text_sep2) if line != '']
+    final_text = "\n\n".join(processed_lines)
+
+    changes = 0 if final_text == text else max(joined.changes, 1)
+    return StageResult(final_text, changes, {'joins': joined.changes, 'lines': len(processed_lines)})
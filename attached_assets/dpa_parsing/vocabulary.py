@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+# =======================================================
+# VOCABULARY - palavras-chave multilingues compiladas
+# =======================================================
+# As tabelas de palavras-chave (titulos do Text Aligner e
+# TYPE_MAP do LVL CORRECTION) ficam aqui, separadas por
+# idioma em "language packs". Cada pack so e carregado
+# quando um Vocabulary o pede, e os matchers (tries de
+# prefixo) sao compilados uma vez, no primeiro uso:
+# casar uma palavra-chave custa O(tamanho do prefixo da
+# linha), nao O(numero de palavras-chave), e um idioma a
+# mais nao deixa a classificacao mais lenta.
+# Os estagios consultam DEFAULT_VOCABULARY a cada chamada
+# (nada fica congelado na importacao); register_language_pack
+# invalida as tabelas compiladas, e o pack novo vale ja na
+# proxima classificacao.
+# =======================================================
+from __future__ import unicode_literals
+
+import hashlib
+import json
+import re
+from collections import OrderedDict
+
+# ======================
+# LANGUAGE PACKS
+# ======================
+# heading_upper   -> titulos em MAIUSCULAS (PART, CHAPTER ...)
+# heading_title   -> titulos em Title Case (Article, Section ...)
+# heading_either  -> aceitos nas duas formas
+# level_types     -> palavra-chave (minuscula) -> tipo de nivel do LVL CORRECTION
+PACK_EN = {
+    'heading_upper': [u"PART", u"BOOK", u"ANNEX", u"APPENDIX", u"SCHEDULE", u"PREAMBLE", u"CHAPTER", u"DIVISION", u"SUBPART"],
+    'heading_title': [u"Title", u"Section", u"Subsection", u"Article", u"Clause", u"Regulation", u"Rule", u"Order", u"Paragraph"],
+    'heading_either': [u"SECTION", u"ARTICLE", u"TITLE", u"Chapter", u"Division"],
+    'level_types': {u'part': u'part', u'title': u'title', u'chapter': u'chapter', u'section': u'section',
+                    u'sub-section': u'subsection', u'subsection': u'subsection', u'sub section': u'subsection',
+                    u'SUB-SECTION': u'subsection', u'SUB SECTION': u'subsection', u'article': u'article',
+                    u'preamble': u'preamble', u'annex': u'annex', u'appendix': u'appendix', u'schedule': u'schedule'},
+}
+PACK_ES = {
+    'heading_upper': [u"PARTE", u"LIBRO", u"ANEXO", u"APÉNDICE", u"PREÁMBULO", u"CAPÍTULO", u"DIVISIÓN", u"SUBPARTE"],
+    'heading_title': [u"Título", u"Sección", u"Subsección", u"Artículo", u"Cláusula", u"Reglamento", u"Regla", u"Orden", u"Párrafo", u"Apartado"],
+    'heading_either': [u"TÍTULO", u"SECCIÓN", u"ARTÍCULO"],
+    'level_types': {u'parte': u'part', u'título': u'title', u'capítulo': u'chapter', u'sección': u'section',
+                    u'subsección': u'subsection', u'artículo': u'article', u'preámbulo': u'preamble',
+                    u'anexo': u'annex', u'apéndice': u'appendix'},
+}
+PACK_PT = {
+    'heading_upper': [u"PARTE", u"LIVRO", u"ANEXO", u"APÊNDICE", u"PREÂMBULO", u"CAPÍTULO", u"DIVISÃO", u"SUBPARTE"],
+    'heading_title': [u"Título", u"Secção", u"Seção", u"Subsecção", u"Subseção", u"Artigo", u"Cláusula", u"Regulamento", u"Regra", u"Ordem", u"Parágrafo", u"Art."],
+    'heading_either': [u"SECÇÃO", u"ARTIGO"],
+    'level_types': {u'parte': u'part', u'título': u'title', u'capítulo': u'chapter', u'secção': u'section',
+                    u'seção': u'section', u'subseção': u'subsection', u'artigo': u'article', u'art.': u'article',
+                    u'preâmbulo': u'preamble', u'anexo': u'annex', u'apêndice': u'appendix'},
+}
+PACK_FR = {
+    'heading_upper': [u"PARTIE", u"LIVRE", u"ANNEXE", u"APPENDICE", u"PRÉAMBULE", u"CHAPITRE", u"DIVISION", u"SOUS-PARTIE"],
+    'heading_title': [u"Titre", u"Section", u"Sous-section", u"Article", u"Clause", u"Règlement", u"Règle", u"Ordonnance", u"Paragraphe"],
+    'heading_either': [],
+    'level_types': {u'livre': u'part', u'titre': u'title', u'chapitre': u'chapter', u'sous-section': u'subsection',
+                    u'article': u'article', u'préambule': u'preamble', u'annexe': u'annex', u'appendice': u'appendix'},
+}
+PACK_DE = {
+    'heading_upper': [u"TEIL", u"BUCH", u"ANHANG", u"ANLAGE", u"KAPITEL", u"UNTERTEIL"],
+    'heading_title': [u"Titel", u"Abschnitt", u"Unterabschnitt", u"Artikel", u"Klausel", u"Regelung", u"Verordnung", u"Regel", u"Anordnung", u"Paragraph", u"Absatz"],
+    'heading_either': [],
+    'level_types': {u'teil': u'part', u'kapitel': u'chapter', u'abschnitt': u'section', u'unterabschnitt': u'subsection',
+                    u'artikel': u'article', u'anhang': u'annex', u'anlage': u'schedule'},
+}
+
+# code -> pack (dict) ou funcao sem argumentos que devolve o pack.
+# Packs externos (ex.: lidos de um JSON) entram com register_language_pack().
+LANGUAGE_PACKS = OrderedDict([('en', PACK_EN), ('es', PACK_ES), ('pt', PACK_PT), ('fr', PACK_FR), ('de', PACK_DE)])
+PACK_FIELDS = ('heading_upper', 'heading_title', 'heading_either', 'level_types')
+_loaded_packs = {}
+_generation = 0 # muda a cada registro: tabelas compiladas antes dele sao descartadas
+
+
+def register_language_pack(code, pack_or_loader):
+    """
+    Registers (or replaces) a language pack; a callable is only called on first
+    use. Every Vocabulary rebuilds its tables on its next lookup.
+    """
+    global _generation
+    LANGUAGE_PACKS[code] = pack_or_loader
+    _loaded_packs.pop(code, None)
+    _generation += 1
+
+def load_language_pack(code):
+    if code not in _loaded_packs:
+        if code not in LANGUAGE_PACKS: raise KeyError("Unknown language pack: {}".format(code))
+        pack = LANGUAGE_PACKS[code]
+        if callable(pack): pack = pack()
+        _loaded_packs[code] = dict((field, pack.get(field) or ({} if field == 'level_types' else [])) for field in PACK_FIELDS)
+    return _loaded_packs[code]
+
+def language_pack_snapshot():
+    """[(code, pack), ...] of every registered pack, loaded (picklable: goes to worker processes)."""
+    return [(code, load_language_pack(code)) for code in LANGUAGE_PACKS]
+
+def install_language_packs(snapshot):
+    """
+    Pool initializer: registers the packs of a language_pack_snapshot(). A
+    worker started by "spawn" (Windows) re-imports this module and would only
+    know the built-in packs.
+    """
+    for code, pack in snapshot: register_language_pack(code, pack)
+
+
+# ======================
+# TRIE DE PREFIXOS
+# ======================
+_VALUE = None # chave do valor terminal (as outras chaves sao caracteres)
+
+class KeywordTrie(object):
+    """Character trie answering "which keywords are prefixes of this text?" in one walk."""
+
+    def __init__(self, items=()):
+        self._root = {}
+        self._size = 0
+        for keyword, value in items: self.add(keyword, value)
+
+    def __len__(self):
+        return self._size
+
+    def add(self, keyword, value):
+        node = self._root
+        for char in keyword: node = node.setdefault(char, {})
+        if _VALUE not in node: self._size += 1
+        node[_VALUE] = value
+
+    def prefixes(self, text, start=0):
+        """Yields (end, value) for every keyword equal to text[start:end], shortest first."""
+        node = self._root
+        for index in range(start, len(text)):
+            node = node.get(text[index])
+            if node is None: return
+            if _VALUE in node: yield index + 1, node[_VALUE]
+
+    def longest_prefix(self, text, start=0):
+        """(end, value) of the longest keyword starting at `start`, or None."""
+        best = None
+        for match in self.prefixes(text, start): best = match
+        return best
+
+
+# ======================
+# VOCABULARY
+# ======================
+class Vocabulary(object):
+    """
+    Keyword tables merged from a set of language packs (all registered packs
+    when `languages` is None). Packs are loaded and the tries compiled lazily,
+    and again after register_language_pack.
+    """
+
+    def __init__(self, languages=None):
+        self._languages = tuple(languages) if languages is not None else None
+        self._cache = {}
+        self._generation = _generation
+
+    @property
+    def languages(self):
+        return self._languages if self._languages is not None else tuple(LANGUAGE_PACKS)
+
+    def _cached(self, key, build):
+        if self._generation != _generation: self._cache = {}; self._generation = _generation
+        try: return self._cache[key]
+        except KeyError:
+            value = self._cache[key] = build()
+            return value
+
+    def keywords(self, field):
+        """Concatenated keyword list of `field` over the packs, in language order."""
+        def build():
+            words = []
+            for code in self.languages: words.extend(load_language_pack(code)[field])
+            return words
+        return self._cached(field, build)
+
+    def level_types(self):
+        """Merged keyword -> level type map (the TYPE_MAP of LVL CORRECTION)."""
+        def build():
+            merged = {}
+            for code in self.languages: merged.update(load_language_pack(code)['level_types'])
+            return merged
+        return self._cached('level_types', build)
+
+    def heading_matcher(self):
+        """Trie of the lower-cased heading keywords; values are the keywords themselves."""
+        def build():
+            words = self.keywords('heading_upper') + self.keywords('heading_title') + self.keywords('heading_either')
+            return KeywordTrie((word.lower(), word.lower()) for word in words)
+        return self._cached('heading_matcher', build)
+
+    def level_type_matcher(self):
+        """Trie of the level_types keywords; values are the level types."""
+        return self._cached('level_type_matcher', lambda: KeywordTrie(self.level_types().items()))
+
+    def heading_keywords(self):
+        """(upper, title, all): lower-cased heading keyword sets (heading_either counts in both)."""
+        def build():
+            either = self.keywords('heading_either')
+            upper = frozenset(word.lower() for word in self.keywords('heading_upper') + either)
+            title = frozenset(word.lower() for word in self.keywords('heading_title') + either)
+            return upper, title, upper | title
+        return self._cached('heading_keywords', build)
+
+    def heading_start_pattern(self):
+        """Regex matching a line that starts with a heading keyword (any case), longest first."""
+        def build():
+            keywords = sorted(self.heading_keywords()[2], key=len, reverse=True)
+            return re.compile(r"\s*(?:{})(?=\s|-|$)".format(u"|".join(re.escape(keyword) for keyword in keywords)), re.IGNORECASE | re.UNICODE)
+        return self._cached('heading_start_pattern', build)
+
+    def fingerprint(self):
+        """sha1 of the language codes and their keyword tables; changes with any registered pack."""
+        def build():
+            tables = [[code, [load_language_pack(code)[field] for field in PACK_FIELDS]] for code in self.languages]
+            return hashlib.sha1(json.dumps(tables, sort_keys=True).encode('utf-8')).hexdigest()
+        return self._cached('fingerprint', build)
+
+# Vocabulario usado pelos estagios: todos os packs registrados, consultados a cada chamada.
+DEFAULT_VOCABULARY = Vocabulary()
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# =======================================================
+# WORKER - analise em segundo plano, com progresso
+# =======================================================
+# LVL CORRECTION e FIX FOOTNOTE SEQUENCE faziam toda a
+# varredura no thread do script, com o editor parado e um
+# console.write por tag. Agora a analise roda num
+# BackgroundTask (thread separado): o motor atualiza um
+# Progress (tags processadas / total) a cada PROGRESS_STEP
+# itens e para com Cancelled quando o cancelamento e
+# pedido. O thread do script so acompanha o progresso
+# (wait_for_task) e faz a escrita final no editor.
+# "Stop Script" do PythonScript (KeyboardInterrupt no thread
+# do script) cancela a tarefa.
+# =======================================================
+from __future__ import unicode_literals
+
+import threading
+import traceback
+
+# Itens entre duas atualizacoes do Progress (e checagens de cancelamento).
+PROGRESS_STEP = 256
+# Segundos entre dois relatorios de progresso.
+REPORT_INTERVAL = 0.5
+
+
+class Cancelled(Exception):
+    """Raised inside a task once its Progress has been cancelled."""
+
+
+class Progress(object):
+    """
+    Work counter shared between a task and the thread watching it. Plain
+    attributes: writes and reads are atomic under the GIL.
+    """
+
+    def __init__(self):
+        self.label = u""
+        self.total = 0
+        self.done = 0
+        self.cancelled = False
+
+    def start(self, total, label):
+        """Begins a phase of `total` items."""
+        self.label = label; self.total = total; self.done = 0
+        self.check()
+
+    def update(self, done):
+        self.done = done
+        self.check()
+
+    def check(self):
+        if self.cancelled: raise Cancelled()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def describe(self):
+        if not self.total: return u"{}...".format(self.label or u"working")
+        return u"{}: {}/{} ({:.0f}%)".format(self.label, self.done, self.total, 100.0 * self.done / self.total)
+
+
+class BackgroundTask(object):
+    """
+    Runs func(*args, progress=Progress, **kwargs) on a daemon thread. After
+    it finishes exactly one of result / error (traceback text) / cancelled is set.
+    """
+
+    def __init__(self, func, *args, **kwargs):
+        self.progress = Progress()
+        self.result = None
+        self.error = None
+        self.cancelled = False
+        self._call = (func, args, kwargs)
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True # nao segura o Notepad++ ao fechar
+
+    def _run(self):
+        func, args, kwargs = self._call
+        try: self.result = func(*args, progress=self.progress, **kwargs)
+        except Cancelled: self.cancelled = True
+        except Exception: self.error = traceback.format_exc()
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        """True once the task has finished."""
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def cancel(self):
+        self.progress.cancel()
+
+
+def wait_for_task(task, report=None, interval=REPORT_INTERVAL):
+    """
+    Blocks the calling (script) thread until `task` finishes, calling
+    report(progress) every `interval` seconds while it runs. A KeyboardInterrupt
+    cancels the task. Returns the task.
+    """
+    try:
+        while not task.wait(interval):
+            if report is not None: report(task.progress)
+    except KeyboardInterrupt:
+        task.cancel()
+        task.wait()
+    return task